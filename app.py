@@ -1,9 +1,19 @@
 import streamlit as st
-from graph.workflow import create_workflow
-from state.app_state import YouTubeVideoState
-from nodes.generate_quiz_node import generate_quiz_node
+from graph.workflow import RESTORED_NODE, stream_workflow
+from graph.checkpoint import make_thread_id
+from graph.memo import NodeMemo
+from tools.tracing import Trace
+from state.app_state import YouTubeVideoState, merge_dicts
+from nodes.generate_quiz_node import QUIZ_STREAM_KEY, generate_quiz_node
+from nodes.generate_summary_node import SUMMARY_STREAM_TAG, extract_partial_summary
+from nodes.quiz_prefetch import QuizPrefetcher
+from tools.youtube_tool import extract_video_id
 import asyncio
 import os
+import uuid
+
+# Show the collapsible per-step timings panel under the results; set SHOW_TIMINGS=0 to hide it
+SHOW_TIMINGS = os.getenv("SHOW_TIMINGS", "1").strip().lower() not in ("0", "false", "off", "no")
 
 def _inject_global_styles():
     """Inject global CSS for a modern, clean UI."""
@@ -75,6 +85,9 @@ def main():
         st.session_state.llm_provider = "Groq"
     if "api_key" not in st.session_state:
         st.session_state.api_key = ""
+    if "node_memo" not in st.session_state:
+        # Outputs of earlier runs in this session; nodes whose inputs are unchanged are skipped
+        st.session_state.node_memo = NodeMemo()
     # Display app description
     with st.container():
         st.markdown("""
@@ -123,6 +136,7 @@ def main():
             if provider == "Hugging Face" and not api_key.strip().startswith("hf_"):
                 st.warning("Hugging Face tokens must start with 'hf_'. Please paste a valid token with API Inference 'Read' permission.")
                 return
+            _cancel_quiz_prefetch()
             st.session_state.video_url = video_url
             st.session_state.results = None
             st.session_state.quiz_started = False
@@ -132,9 +146,6 @@ def main():
             
             try:
                 with st.spinner("Processing video and generating content... This may take a minute."):
-                    # Create workflow
-                    app = create_workflow()
-                    
                     # Initial state
                     initial_state = YouTubeVideoState(
                         video_url=video_url,
@@ -153,9 +164,13 @@ def main():
                         error=""
                     )
                     
-                    # Run the workflow
-                    results = app.invoke(initial_state)
+                    # Run the workflow, rendering each section as soon as its node finishes; a rerun
+                    # for the same video, provider and session resumes from its checkpoint
+                    thread_id = make_thread_id(extract_video_id(video_url) or video_url, provider.lower(), _session_id())
+                    trace = Trace("process_video")
+                    results = _run_with_progress(initial_state, thread_id, trace)
                     st.session_state.results = results
+                    st.session_state.trace = trace
                     st.session_state.processing = False
                     
                     # Check for errors
@@ -173,10 +188,114 @@ def main():
     # Display results if available
     if st.session_state.results:
         display_results(st.session_state.results)
+        if SHOW_TIMINGS and st.session_state.get("trace"):
+            display_timings(st.session_state.trace)
         
     # We don't need this section anymore as quiz is displayed in the tabs
 
 
+def _session_id():
+    """Stable per-browser session ID, kept in the URL so it survives page reloads."""
+    sid = st.query_params.get("sid")
+    if not sid:
+        sid = uuid.uuid4().hex
+        st.query_params["sid"] = sid
+    return sid
+
+
+def _run_with_progress(initial_state, thread_id=None, trace=None):
+    """Run the workflow and render each section as soon as the node producing it finishes.
+
+    The title appears after process_video, the summary streams token by token and is finalized
+    after generate_summary, quiz questions are previewed as the generator emits them, and
+    resources and quiz each render when their branch completes. Values restored from a
+    checkpoint render all at once before the remaining nodes run. Returns the final state.
+    """
+    title_placeholder = st.empty()
+    summary_placeholder = st.empty()
+    key_points_placeholder = st.empty()
+    resources_placeholder = st.empty()
+    quiz_placeholder = st.empty()
+    placeholders = [title_placeholder, summary_placeholder, key_points_placeholder, resources_placeholder, quiz_placeholder]
+
+    streamed_text = ""
+    shown_summary = ""
+    summary_done = False
+    streamed_questions = 0
+    first_question = ""
+    results = dict(initial_state)
+    for mode, payload in stream_workflow(initial_state, stream_mode=["messages", "updates", "custom"], thread_id=thread_id, node_memo=st.session_state.node_memo, trace=trace):
+        if mode == "custom":
+            question = payload.get(QUIZ_STREAM_KEY) if isinstance(payload, dict) else None
+            if question:
+                streamed_questions += 1
+                if streamed_questions == 1:
+                    first_question = question["question"]
+                quiz_placeholder.info(f"❓ Generating quiz… {streamed_questions} question(s) ready. First up: {first_question}")
+            continue
+        if mode == "messages":
+            chunk, metadata = payload
+            if summary_done or SUMMARY_STREAM_TAG not in (metadata.get("tags") or []):
+                continue
+            content = chunk.content if isinstance(chunk.content, str) else ""
+            streamed_text += content
+            partial = extract_partial_summary(streamed_text)
+            if partial and partial != shown_summary:
+                shown_summary = partial
+                summary_placeholder.markdown(f"<div class='card summary-card'>{partial}▌</div>", unsafe_allow_html=True)
+            continue
+
+        for node, values in payload.items():
+            if not isinstance(values, dict):
+                continue
+            usage = merge_dicts(results.get("token_usage"), values.get("token_usage"))
+            results.update(values)
+            results["token_usage"] = usage
+            if node == RESTORED_NODE:
+                if values.get("video_title"):
+                    title_placeholder.subheader(f"📺 {values['video_title']}")
+                if values.get("summary"):
+                    summary_done = True
+                    summary_placeholder.markdown(f"<div class='card summary-card'>{values['summary']}</div>", unsafe_allow_html=True)
+                continue
+            if node == "process_video" and values.get("video_title"):
+                title_placeholder.subheader(f"📺 {values['video_title']}")
+            elif node in ("generate_summary", "generate_content"):
+                summary_done = True
+                if values.get("summary"):
+                    summary_placeholder.markdown(f"<div class='card summary-card'>{values['summary']}</div>", unsafe_allow_html=True)
+                if values.get("key_points"):
+                    key_points_placeholder.markdown("\n".join(f"- {point}" for point in values["key_points"]))
+            elif node == "generate_resources":
+                resources = values.get("related_resources") or []
+                if resources:
+                    resources_placeholder.markdown(
+                        "**📚 Related Resources**\n\n" + "\n".join(f"- [{r.get('title', 'Untitled')}]({r.get('url', '#')})" for r in resources)
+                    )
+                else:
+                    resources_placeholder.info("No related resources found for this video.")
+            if node in ("generate_quiz", "generate_content"):
+                count = len(values.get("quiz_questions") or [])
+                if count:
+                    quiz_placeholder.success(f"❓ Quiz ready: {count} questions")
+                else:
+                    quiz_placeholder.info("Quiz not available yet.")
+
+    # The full tabbed results view replaces the progressive preview
+    for placeholder in placeholders:
+        placeholder.empty()
+    return results
+
+
+def display_timings(trace):
+    """Collapsible table of the spans recorded while processing: nodes, tool calls and LLM calls."""
+    rows = trace.rows()
+    if not rows:
+        return
+    with st.expander("⏱️ Timings", expanded=False):
+        st.dataframe(rows, use_container_width=True, hide_index=True)
+
+
 def display_results(results):
     """Display the video summary and key points."""
     # Check for errors first
@@ -290,6 +409,46 @@ def display_results(results):
                         st.error(regen['error'])
 
 
+def _quiz_state(results):
+    """Build the state used to generate another quiz set for the current video."""
+    transcript = results.get('video_transcript') or st.session_state.results.get('video_transcript', '')
+    return YouTubeVideoState(
+        video_url=st.session_state.video_url,
+        llm_provider=st.session_state.llm_provider.lower(),
+        api_key=st.session_state.api_key,
+        groq_api_key="",
+        video_title=results.get('video_title', ''),
+        video_transcript=transcript,
+        summary=results.get('summary', ''),
+        key_points=results.get('key_points', []),
+        quiz_questions=results.get('quiz_questions', []),
+        related_resources=results.get('related_resources', []),
+        current_question_index=0,
+        user_answers={},
+        quiz_score=0,
+        error=results.get('error', ''),
+    )
+
+
+def _get_quiz_prefetcher(results):
+    """Return the background quiz prefetcher for the current video, replacing one for another video."""
+    video_key = f"{st.session_state.video_url}|{st.session_state.llm_provider}"
+    prefetcher = st.session_state.get("quiz_prefetcher")
+    if prefetcher is None or prefetcher.video_key != video_key:
+        _cancel_quiz_prefetch()
+        prefetcher = QuizPrefetcher(video_key, _quiz_state(results))
+        st.session_state.quiz_prefetcher = prefetcher
+    prefetcher.ensure_started()
+    return prefetcher
+
+
+def _cancel_quiz_prefetch():
+    prefetcher = st.session_state.get("quiz_prefetcher")
+    if prefetcher is not None:
+        prefetcher.cancel()
+        st.session_state.quiz_prefetcher = None
+
+
 def display_quiz(results):
     """Display the quiz and handle user answers."""
     # Skip if there are no quiz questions
@@ -299,6 +458,9 @@ def display_quiz(results):
     # Skip if quiz hasn't started (handled in the tabs now)
     if not st.session_state.quiz_started:
         return
+
+    # Generate the next quiz set in the background while this one is being taken
+    _get_quiz_prefetcher(results)
         
     # Initialize quiz state if needed
     if "current_question" not in st.session_state:
@@ -316,27 +478,13 @@ def display_quiz(results):
         colA, colB = st.columns([1,1])
         with colA:
             if st.button("Restart Quiz (New Questions)"):
-                # Regenerate a completely new quiz set using current transcript
-                transcript = results.get('video_transcript') or st.session_state.results.get('video_transcript', '')
-                regen_state = YouTubeVideoState(
-                    video_url=st.session_state.video_url,
-                    llm_provider=st.session_state.llm_provider.lower(),
-                    api_key=st.session_state.api_key,
-                    groq_api_key="",
-                    video_title=results.get('video_title', ''),
-                    video_transcript=transcript,
-                    summary=results.get('summary', ''),
-                    key_points=results.get('key_points', []),
-                    quiz_questions=results.get('quiz_questions', []),
-                    related_resources=results.get('related_resources', []),
-                    current_question_index=0,
-                    user_answers={},
-                    quiz_score=0,
-                    error=results.get('error', ''),
-                )
-                regen = generate_quiz_node(regen_state)
-                if regen.get('quiz_questions'):
-                    st.session_state.results['quiz_questions'] = regen['quiz_questions']
+                # Serve the set prefetched in the background; generate synchronously only if none is ready
+                new_questions = _get_quiz_prefetcher(results).take()
+                if not new_questions:
+                    regen = generate_quiz_node(_quiz_state(results))
+                    new_questions = regen.get('quiz_questions')
+                if new_questions:
+                    st.session_state.results['quiz_questions'] = new_questions
                 # Reset quiz state
                 st.session_state.current_question = 0
                 st.session_state.score = 0
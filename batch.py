@@ -0,0 +1,160 @@
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, Iterable, List, Optional, Set
+from graph.workflow import get_workflow
+from llm.rate_limiter import get_rate_limiter_stats
+from llm.structured_output import get_structured_output_stats
+from state.app_state import YouTubeVideoState, merge_dicts
+from tools.youtube_tool import extract_playlist_id, extract_video_id, get_playlist_video_urls
+
+
+def read_inputs(path: str) -> List[str]:
+    """Read video URLs and playlist IDs/URLs (one per line, '#' comments allowed)."""
+    with open(path, "r", encoding="utf-8") as fh:
+        return [line.strip() for line in fh if line.strip() and not line.strip().startswith("#")]
+
+
+def expand_inputs(entries: Iterable[str]) -> List[str]:
+    """Expand playlists into their video URLs and drop duplicate videos, keeping input order."""
+    urls: List[str] = []
+    seen: Set[str] = set()
+    for entry in entries:
+        playlist_id = extract_playlist_id(entry)
+        if playlist_id:
+            try:
+                candidates = get_playlist_video_urls(playlist_id)
+            except Exception as e:
+                print(f"Skipping playlist {playlist_id}: {str(e)}", file=sys.stderr)
+                continue
+        else:
+            candidates = [entry]
+        for url in candidates:
+            try:
+                key = extract_video_id(url)
+            except Exception:
+                key = url
+            if key not in seen:
+                seen.add(key)
+                urls.append(url)
+    return urls
+
+
+def load_completed(path: str, retry_failed: bool) -> Set[str]:
+    """Return URLs already present in an existing output file (only successful ones with retry_failed)."""
+    completed: Set[str] = set()
+    if not os.path.exists(path):
+        return completed
+    with open(path, "r", encoding="utf-8") as fh:
+        for line in fh:
+            try:
+                record = json.loads(line)
+            except Exception:
+                continue  # e.g. a line truncated by an interrupted run
+            if record.get("url") and not (retry_failed and record.get("error")):
+                completed.add(record["url"])
+    return completed
+
+
+def process_url(app, url: str, provider: str, api_key: str) -> Dict[str, Any]:
+    """Run the workflow for one video and return the JSONL record, with per-node completion times."""
+    started = time.monotonic()
+    timings: Dict[str, float] = {}
+    final_state: Dict[str, Any] = {}
+    try:
+        initial_state = YouTubeVideoState(
+            video_url=url,
+            llm_provider=provider,
+            api_key=api_key,
+            groq_api_key="",
+            video_title="",
+            video_transcript="",
+            summary="",
+            key_points=[],
+            quiz_questions=[],
+            related_resources=[],
+            current_question_index=0,
+            user_answers={},
+            quiz_score=0,
+            error=""
+        )
+        final_state = dict(initial_state)
+        for update in app.stream(initial_state, stream_mode="updates"):
+            for node, values in update.items():
+                timings[node] = round(time.monotonic() - started, 3)
+                if values:
+                    usage = merge_dicts(final_state.get("token_usage"), values.get("token_usage"))
+                    final_state.update(values)
+                    final_state["token_usage"] = usage
+        error = final_state.get("error") or ""
+    except Exception as e:
+        error = f"Error processing video: {str(e)}"
+    timings["total"] = round(time.monotonic() - started, 3)
+
+    return {
+        "url": url,
+        "title": final_state.get("video_title", ""),
+        "summary": final_state.get("summary", ""),
+        "key_points": final_state.get("key_points", []),
+        "quiz_questions": final_state.get("quiz_questions", []),
+        "related_resources": final_state.get("related_resources", []),
+        "token_usage": final_state.get("token_usage", {}),
+        "timings": timings,
+        "error": error,
+    }
+
+
+def run_batch(urls: List[str], output_path: str, *, workers: int, provider: str, api_key: str) -> int:
+    """Process URLs on a worker pool, appending one JSON line per video as soon as it finishes."""
+    app = get_workflow()
+    write_lock = threading.Lock()
+    failures = 0
+    with open(output_path, "a", encoding="utf-8") as out, ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(process_url, app, url, provider, api_key): url for url in urls}
+        for done_count, future in enumerate(as_completed(futures), 1):
+            record = future.result()
+            if record["error"]:
+                failures += 1
+            with write_lock:
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                out.flush()
+            status = "error" if record["error"] else "ok"
+            print(f"[{done_count}/{len(urls)}] {status} {record['url']} ({record['timings']['total']}s)", file=sys.stderr)
+    return failures
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Process YouTube videos and playlists headlessly and write results as JSONL.")
+    parser.add_argument("input", help="File with one YouTube URL, playlist URL or playlist ID per line")
+    parser.add_argument("-o", "--output", default="results.jsonl", help="JSONL output file (default: results.jsonl)")
+    parser.add_argument("-w", "--workers", type=int, default=4, help="Number of videos processed concurrently (default: 4)")
+    parser.add_argument("--provider", default=os.getenv("LLM_PROVIDER", "groq"), help="LLM provider: groq, openai or huggingface")
+    parser.add_argument("--resume", action="store_true", help="Skip videos already present in the output file")
+    parser.add_argument("--retry-failed", action="store_true", help="With --resume, process videos whose previous record has an error again")
+    args = parser.parse_args(argv)
+
+    # The key comes from the environment (GROQ_API_KEY, OPENAI_API_KEY, ...) and is never written to the output
+    api_key = os.getenv("LLM_API_KEY", "")
+
+    urls = expand_inputs(read_inputs(args.input))
+    if args.resume:
+        completed = load_completed(args.output, args.retry_failed)
+        urls = [url for url in urls if url not in completed]
+        print(f"Resuming: {len(completed)} already done, {len(urls)} remaining", file=sys.stderr)
+    elif os.path.exists(args.output) and os.path.getsize(args.output) > 0:
+        parser.error(f"{args.output} already exists; pass --resume to continue it or choose another --output")
+
+    if not urls:
+        return 0
+    failures = run_batch(urls, args.output, workers=max(1, args.workers), provider=args.provider.lower(), api_key=api_key)
+    print(f"Structured output: {json.dumps(get_structured_output_stats())}", file=sys.stderr)
+    print(f"Rate limits: {json.dumps(get_rate_limiter_stats())}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,297 @@
+import re
+import json
+import time
+import random
+import asyncio
+import threading
+from contextlib import contextmanager
+from types import SimpleNamespace
+from typing import Any, Dict, Iterator, List, Optional
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+
+# Speech rate and caption granularity of the generated transcripts
+WORDS_PER_MINUTE = 150
+SNIPPET_SECONDS = 3.0
+# Video IDs of generated videos encode their length: "bench000060" is a one-hour video
+VIDEO_ID_PREFIX = "bench"
+
+_WORDS = (
+    "gradient descent network layer weight bias loss function training data model error update step "
+    "learning rate batch epoch feature vector matrix signal memory cache latency thread process queue "
+    "request response token prompt parser schema question answer option summary example definition"
+).split()
+
+
+def video_url(minutes: int) -> str:
+    return f"https://www.youtube.com/watch?v={VIDEO_ID_PREFIX}{minutes:06d}"
+
+
+def _minutes_of(video_id: str) -> int:
+    match = re.fullmatch(rf"{VIDEO_ID_PREFIX}(\d{{6}})", video_id or "")
+    return int(match.group(1)) if match else 1
+
+
+def fake_snippets(minutes: int, seed: int = 0) -> List[SimpleNamespace]:
+    """Deterministic caption snippets (``text``/``start``/``duration``) for a video of ``minutes``."""
+    rng = random.Random(f"{seed}:{minutes}")
+    words_per_snippet = max(1, round(WORDS_PER_MINUTE * SNIPPET_SECONDS / 60))
+    count = max(1, int(minutes * 60 / SNIPPET_SECONDS))
+    return [
+        SimpleNamespace(
+            text=" ".join(rng.choice(_WORDS) for _ in range(words_per_snippet)),
+            start=i * SNIPPET_SECONDS,
+            duration=SNIPPET_SECONDS,
+        )
+        for i in range(count)
+    ]
+
+
+class BackendProfile:
+    """Injected behaviour of one fake backend: base latency (seconds), random jitter and failure rate."""
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, failure_rate: float = 0.0, malformed_rate: float = 0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        # LLM only: share of responses cut off mid-document, to exercise the repair and fallback paths
+        self.malformed_rate = malformed_rate
+
+    def to_dict(self) -> Dict[str, float]:
+        return {"latency": self.latency, "jitter": self.jitter, "failure_rate": self.failure_rate, "malformed_rate": self.malformed_rate}
+
+
+class FakeBackends:
+    """Deterministic stand-ins for the LLM, transcript API, yt-dlp and Tavily, sharing one seeded RNG.
+
+    Profiles are keyed "llm", "transcript", "title" and "search"; ``calls`` and ``failures``
+    count what each backend served.
+    """
+
+    def __init__(self, profiles: Optional[Dict[str, BackendProfile]] = None, seed: int = 0):
+        self.profiles = {name: BackendProfile() for name in ("llm", "transcript", "title", "search")}
+        self.profiles.update(profiles or {})
+        self.seed = seed
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls: Dict[str, int] = {name: 0 for name in self.profiles}
+        self.failures: Dict[str, int] = {name: 0 for name in self.profiles}
+
+    def _draw(self, backend: str) -> Dict[str, Any]:
+        profile = self.profiles[backend]
+        with self._lock:
+            self.calls[backend] += 1
+            delay = profile.latency + (self._rng.uniform(0, profile.jitter) if profile.jitter else 0.0)
+            fail = profile.failure_rate > 0 and self._rng.random() < profile.failure_rate
+            malformed = profile.malformed_rate > 0 and self._rng.random() < profile.malformed_rate
+            if fail:
+                self.failures[backend] += 1
+        return {"delay": delay, "fail": fail, "malformed": malformed}
+
+    def call(self, backend: str) -> Dict[str, Any]:
+        draw = self._draw(backend)
+        if draw["delay"]:
+            time.sleep(draw["delay"])
+        if draw["fail"]:
+            raise RuntimeError(f"Injected {backend} failure")
+        return draw
+
+    async def acall(self, backend: str) -> Dict[str, Any]:
+        draw = self._draw(backend)
+        if draw["delay"]:
+            await asyncio.sleep(draw["delay"])
+        if draw["fail"]:
+            raise RuntimeError(f"Injected {backend} failure")
+        return draw
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {name: {"calls": self.calls[name], "failures": self.failures[name]} for name in self.profiles}
+
+
+def _transcript_words(prompt: str, count: int) -> List[str]:
+    words = [w.lower() for w in re.findall(r"[A-Za-z]{3,}", prompt[-4000:])]
+    return (words or _WORDS)[:count] or _WORDS[:count]
+
+
+def _question(i: int, words: List[str]) -> Dict[str, Any]:
+    topic = words[i % len(words)]
+    return {
+        "question": f"Question {i + 1}: what does the video say about {topic}?",
+        "options": [f"{topic} option {letter}" for letter in "ABCD"],
+        "answer_index": i % 4,
+    }
+
+
+def fake_response(prompt: str) -> str:
+    """Answer a project prompt in the format it asks for, using words from the prompt's transcript."""
+    words = _transcript_words(prompt, 60)
+    sentence = " ".join(words[:12]).capitalize() + "."
+    count_match = re.search(r"(\d+) questions total|Create (\d+) concept-check", prompt)
+    count = int(next(g for g in count_match.groups() if g)) if count_match else 10
+    summary = " ".join([sentence] * 4)
+    key_points = [f"{w.capitalize()} is explained with an example." for w in words[:6]]
+    if '"questions"' in prompt and '"summary"' in prompt:
+        return json.dumps({"summary": summary, "key_points": key_points, "questions": [_question(i, words) for i in range(count)]})
+    if '"questions"' in prompt:
+        return json.dumps({"questions": [_question(i, words) for i in range(count)]})
+    if '"summary"' in prompt:
+        return json.dumps({"summary": summary, "key_points": key_points})
+    if "Format each item exactly as" in prompt:
+        return "\n".join(
+            f"Question {i + 1}: what does the video say about {words[i % len(words)]}?\n"
+            + "\n".join(f"{letter}. option {letter}" for letter in "ABCD")
+            + f"\nAnswer: {'ABCD'[i % 4]}"
+            for i in range(count)
+        )
+    if "Bullets:" in prompt:
+        return "\n".join(f"- {point}" for point in key_points)
+    return summary
+
+
+class FakeChatModel(BaseChatModel):
+    """Chat model that answers from fake_response with injected latency, failures and truncation."""
+
+    backends: Any = None
+    chunk_chars: int = 32
+
+    @property
+    def _llm_type(self) -> str:
+        return "benchmark-fake"
+
+    def _text(self, messages: List[Any], malformed: bool) -> str:
+        prompt = messages[-1].content if messages else ""
+        text = fake_response(prompt if isinstance(prompt, str) else str(prompt))
+        return text[: len(text) * 2 // 3] if malformed else text
+
+    @staticmethod
+    def _usage(messages: List[Any], text: str) -> Dict[str, int]:
+        prompt_chars = sum(len(str(m.content)) for m in messages)
+        return {"input_tokens": prompt_chars // 4, "output_tokens": len(text) // 4, "total_tokens": (prompt_chars + len(text)) // 4}
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        draw = self.backends.call("llm")
+        text = self._text(messages, draw["malformed"])
+        message = AIMessage(content=text, usage_metadata=self._usage(messages, text))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        draw = await self.backends.acall("llm")
+        text = self._text(messages, draw["malformed"])
+        message = AIMessage(content=text, usage_metadata=self._usage(messages, text))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _pieces(self, messages: List[Any], malformed: bool) -> Iterator[ChatGenerationChunk]:
+        text = self._text(messages, malformed)
+        for start in range(0, len(text), self.chunk_chars):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=text[start:start + self.chunk_chars]))
+        yield ChatGenerationChunk(message=AIMessageChunk(content="", usage_metadata=self._usage(messages, text)))
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        draw = self.backends.call("llm")
+        for chunk in self._pieces(messages, draw["malformed"]):
+            if run_manager and chunk.text:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        draw = await self.backends.acall("llm")
+        for chunk in self._pieces(messages, draw["malformed"]):
+            if run_manager and chunk.text:
+                await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+
+
+class _FakeTranscript:
+    language_code = "en"
+    is_generated = False
+    is_translatable = False
+
+    def __init__(self, backends: FakeBackends, video_id: str):
+        self._backends = backends
+        self._video_id = video_id
+
+    def fetch(self) -> List[SimpleNamespace]:
+        self._backends.call("transcript")
+        return fake_snippets(_minutes_of(self._video_id), self._backends.seed)
+
+
+def _transcript_api(backends: FakeBackends):
+    class FakeTranscriptApi:
+        def list(self, video_id: str) -> List[_FakeTranscript]:
+            return [_FakeTranscript(backends, video_id)]
+
+    return FakeTranscriptApi
+
+
+def _yt_dlp(backends: FakeBackends) -> SimpleNamespace:
+    class FakeYoutubeDL:
+        def __init__(self, options: Optional[Dict[str, Any]] = None):
+            self.options = options or {}
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+        def extract_info(self, url: str, download: bool = False) -> Dict[str, Any]:
+            backends.call("title")
+            video_id = url.rsplit("=", 1)[-1]
+            return {"id": video_id, "title": f"Benchmark lecture ({_minutes_of(video_id)} min)"}
+
+    return SimpleNamespace(YoutubeDL=FakeYoutubeDL)
+
+
+class FakeSearch:
+    """Tavily stand-in returning five ranked results per query."""
+
+    def __init__(self, backends: FakeBackends):
+        self._backends = backends
+
+    def _results(self, query: str) -> List[Dict[str, Any]]:
+        slug = re.sub(r"\W+", "-", query.lower()).strip("-")
+        return [
+            {"url": f"https://example.org/{slug}/{i}", "title": f"{query} resource {i}", "content": f"About {query}. " * 20, "score": 1.0 - i / 10}
+            for i in range(5)
+        ]
+
+    def invoke(self, query: str) -> List[Dict[str, Any]]:
+        self._backends.call("search")
+        return self._results(query)
+
+    async def ainvoke(self, query: str) -> List[Dict[str, Any]]:
+        await self._backends.acall("search")
+        return self._results(query)
+
+
+# Modules that bind get_llm at import time
+_LLM_MODULES = ("nodes.generate_summary_node", "nodes.generate_quiz_node", "nodes.generate_combined_node")
+
+
+@contextmanager
+def installed(backends: FakeBackends) -> Iterator[FakeBackends]:
+    """Route the project's LLM, transcript, title and search calls to ``backends`` until exit."""
+    import importlib
+
+    def fake_get_llm(**kwargs):
+        return FakeChatModel(backends=backends)
+
+    patches = [(importlib.import_module(name), "get_llm", fake_get_llm) for name in _LLM_MODULES]
+    youtube_tool = importlib.import_module("tools.youtube_tool")
+    search_tool = importlib.import_module("tools.search_tool")
+    patches += [
+        (youtube_tool, "YouTubeTranscriptApi", _transcript_api(backends)),
+        (youtube_tool, "yt_dlp", _yt_dlp(backends)),
+        (search_tool, "get_search_tool", lambda: FakeSearch(backends)),
+    ]
+    saved = [(module, attr, getattr(module, attr)) for module, attr, _ in patches]
+    for module, attr, value in patches:
+        setattr(module, attr, value)
+    try:
+        yield backends
+    finally:
+        for module, attr, value in saved:
+            setattr(module, attr, value)
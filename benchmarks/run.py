@@ -0,0 +1,294 @@
+import os
+import sys
+import json
+import time
+import tempfile
+import argparse
+import platform
+import statistics
+import subprocess
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Benchmarks measure the pipeline itself, so every cache starts empty and stays off; set before project imports
+os.environ.setdefault("YTLEARN_CACHE_DIR", tempfile.mkdtemp(prefix="ytlearn-bench-"))
+for _name, _value in {
+    "LLM_CACHE": "off",
+    "TRANSCRIPT_CACHE_MAX_MB": "0",
+    "SEARCH_CACHE_MAX_MB": "0",
+    "QUESTION_BANK_MAX_MB": "0",
+    "RESULTS_CACHE_MAX_MB": "0",
+    "WORKFLOW_CHECKPOINTS": "0",
+    "TRACE_EXPORT_PATH": "",
+}.items():
+    os.environ.setdefault(_name, _value)
+
+from benchmarks.fakes import BackendProfile, FakeBackends, fake_response, fake_snippets, installed, video_url
+from graph.workflow import create_workflow
+from nodes.generate_quiz_node import _json_quiz_prompt, _line_quiz_prompt, parse_line_quiz, try_parse_json
+from nodes.generate_summary_node import _build_summary_prompt, _safe_json_extract
+from state.app_state import YouTubeVideoState
+from tools.tracing import Trace, activate, get_tracing_handler, span
+from tools.transcript_store import TranscriptSegments
+
+
+# Bump when the result layout changes so comparisons only run between compatible files
+RESULTS_SCHEMA = 1
+DEFAULT_DURATIONS = "1,10,60,180,300"
+
+
+def _initial_state(minutes: int, provider: str) -> YouTubeVideoState:
+    return YouTubeVideoState(
+        video_url=video_url(minutes),
+        llm_provider=provider,
+        api_key="benchmark",
+        groq_api_key="",
+        video_title="",
+        video_transcript="",
+        summary="",
+        key_points=[],
+        quiz_questions=[],
+        related_resources=[],
+        current_question_index=0,
+        user_answers={},
+        quiz_score=0,
+        error="",
+    )
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _latency_summary(values: List[float]) -> Dict[str, float]:
+    return {
+        "mean_ms": round(statistics.fmean(values), 2),
+        "p50_ms": round(_percentile(values, 50), 2),
+        "p95_ms": round(_percentile(values, 95), 2),
+        "min_ms": round(min(values), 2),
+        "max_ms": round(max(values), 2),
+    }
+
+
+def _node_timings(trace: Trace) -> Dict[str, Tuple[float, float]]:
+    """Per node: (total ms, self ms), where self excludes the LLM and tool calls the node waited on."""
+    spans = list(trace.spans)
+    children: Dict[str, float] = {}
+    for s in spans:
+        if s.parent_id and s.kind in ("llm", "tool"):
+            children[s.parent_id] = children.get(s.parent_id, 0.0) + (s.duration_ms or 0.0)
+    return {
+        s.name[len("node."):]: (s.duration_ms or 0.0, max(0.0, (s.duration_ms or 0.0) - children.get(s.span_id, 0.0)))
+        for s in spans if s.kind == "node"
+    }
+
+
+def bench_workflow(minutes: int, repeats: int, provider: str, pipeline_mode: Optional[str]) -> Dict[str, Any]:
+    """End-to-end ``create_workflow().invoke`` latency and per-node time for one transcript length."""
+    app = create_workflow(pipeline_mode)
+    state = _initial_state(minutes, provider)
+    handler = get_tracing_handler()
+    latencies: List[float] = []
+    nodes: Dict[str, Dict[str, List[float]]] = {}
+    errors = 0
+    for _ in range(repeats):
+        trace = Trace("benchmark")
+        started = time.perf_counter()
+        with activate(trace), span("workflow", "workflow"):
+            result = app.invoke(state, config={"callbacks": [handler]})
+        latencies.append((time.perf_counter() - started) * 1000)
+        errors += bool(result.get("error"))
+        for node, (total, own) in _node_timings(trace).items():
+            timings = nodes.setdefault(node, {"total": [], "self": []})
+            timings["total"].append(total)
+            timings["self"].append(own)
+    return {
+        "runs": repeats,
+        "errors": errors,
+        "transcript_chars": len(result.get("video_transcript") or ""),
+        "latency": _latency_summary(latencies),
+        "nodes": {
+            node: {"total_p50_ms": round(_percentile(t["total"], 50), 2), "self_p50_ms": round(_percentile(t["self"], 50), 2)}
+            for node, t in sorted(nodes.items())
+        },
+    }
+
+
+def _throughput(func: Callable[[str], Any], text: str, seconds: float) -> Dict[str, float]:
+    func(text)  # Warm up regex and JSON caches
+    ops = 0
+    started = time.perf_counter()
+    deadline = started + seconds
+    while True:
+        func(text)
+        ops += 1
+        now = time.perf_counter()
+        if now >= deadline:
+            break
+    elapsed = now - started
+    return {
+        "input_chars": len(text),
+        "ops_per_sec": round(ops / elapsed, 1),
+        "mb_per_sec": round(ops * len(text.encode("utf-8")) / elapsed / 1e6, 2),
+    }
+
+
+def bench_parsers(seconds: float) -> Dict[str, Dict[str, float]]:
+    """Throughput of the quiz and summary response parsers on clean and near-valid responses."""
+    transcript = " ".join(s.text for s in fake_snippets(10))
+    quiz_json = fake_response(_json_quiz_prompt(transcript, "0", 20))
+    summary_json = fake_response(_build_summary_prompt(transcript, "Transcript"))
+    line_quiz = fake_response(_line_quiz_prompt(transcript, "0", 20))
+    cases = {
+        "try_parse_json.valid": (try_parse_json, quiz_json),
+        "try_parse_json.truncated": (try_parse_json, "Here is the quiz:\n" + quiz_json[: len(quiz_json) * 2 // 3]),
+        "_safe_json_extract.valid": (_safe_json_extract, summary_json),
+        "_safe_json_extract.near_valid": (_safe_json_extract, "```json\n" + summary_json.replace('"]', '",]') + "\n```"),
+        "parse_line_quiz": (parse_line_quiz, line_quiz),
+    }
+    return {name: _throughput(func, text, seconds) for name, (func, text) in cases.items()}
+
+
+def bench_memory(minutes: int, provider: str, pipeline_mode: Optional[str]) -> Dict[str, Any]:
+    """Peak traced allocations for building the transcript store and for one full workflow run."""
+    snippets = fake_snippets(minutes)
+    tracemalloc.start()
+    try:
+        segments = TranscriptSegments.from_snippets(snippets)
+        text_chars = len(segments.text)
+        _, transcript_peak = tracemalloc.get_traced_memory()
+        del segments
+        tracemalloc.reset_peak()
+        create_workflow(pipeline_mode).invoke(_initial_state(minutes, provider))
+        _, workflow_peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        "snippets": len(snippets),
+        "transcript_chars": text_chars,
+        "transcript_peak_bytes": transcript_peak,
+        "workflow_peak_bytes": workflow_peak,
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def _flatten(data: Any, prefix: str = "") -> Dict[str, float]:
+    flat: Dict[str, float] = {}
+    if isinstance(data, dict):
+        for key, value in data.items():
+            flat.update(_flatten(value, f"{prefix}.{key}" if prefix else str(key)))
+    elif isinstance(data, (int, float)) and not isinstance(data, bool):
+        flat[prefix] = float(data)
+    return flat
+
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], tolerance: float) -> List[str]:
+    """Metrics that got worse than ``baseline`` by more than ``tolerance`` (0.15 = 15%).
+
+    Only timings (``*_ms``), memory (``*_bytes``) and throughput (``ops_per_sec``) are compared.
+    """
+    if baseline.get("schema") != current.get("schema"):
+        return [f"schema changed ({baseline.get('schema')} -> {current.get('schema')}); not comparable"]
+    old = _flatten({k: baseline.get(k) for k in ("workflow", "parsers", "memory")})
+    new = _flatten({k: current.get(k) for k in ("workflow", "parsers", "memory")})
+    regressions = []
+    for key, value in sorted(new.items()):
+        before = old.get(key)
+        if not before:
+            continue
+        if key.endswith("_ms") or key.endswith("_bytes"):
+            change = value / before - 1
+        elif key.endswith("ops_per_sec"):
+            change = before / value - 1 if value else float("inf")
+        else:
+            continue
+        if change > tolerance:
+            regressions.append(f"{key}: {before:g} -> {value:g} ({change:+.0%})")
+    return regressions
+
+
+def _profile(latency: float, jitter: float, failure_rate: float, malformed_rate: float = 0.0) -> BackendProfile:
+    return BackendProfile(latency=latency, jitter=jitter, failure_rate=failure_rate, malformed_rate=malformed_rate)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the workflow offline against fake LLM, transcript, yt-dlp and Tavily backends.")
+    parser.add_argument("-o", "--output", help="Write results as JSON to this file (default: stdout)")
+    parser.add_argument("--durations", default=DEFAULT_DURATIONS, help=f"Video lengths in minutes (default: {DEFAULT_DURATIONS})")
+    parser.add_argument("--repeats", type=int, default=3, help="Workflow runs per video length (default: 3)")
+    parser.add_argument("--provider", default="groq", help="Provider whose context window and JSON mode are used (default: groq)")
+    parser.add_argument("--pipeline-mode", choices=["separate", "combined"], help="Pipeline mode (default: PIPELINE_MODE)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for jitter and failure injection (default: 0)")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Seconds added to every LLM call")
+    parser.add_argument("--llm-failure-rate", type=float, default=0.0, help="Share of LLM calls that raise")
+    parser.add_argument("--llm-malformed-rate", type=float, default=0.0, help="Share of LLM responses cut off mid-document")
+    parser.add_argument("--transcript-latency", type=float, default=0.0, help="Seconds added to every transcript fetch")
+    parser.add_argument("--title-latency", type=float, default=0.0, help="Seconds added to every yt-dlp title lookup")
+    parser.add_argument("--search-latency", type=float, default=0.0, help="Seconds added to every Tavily query")
+    parser.add_argument("--tool-failure-rate", type=float, default=0.0, help="Share of transcript, title and search calls that raise")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Up to this many random seconds added to every injected latency")
+    parser.add_argument("--parser-seconds", type=float, default=0.5, help="Time spent per parser throughput case (default: 0.5)")
+    parser.add_argument("--skip-memory", action="store_true", help="Skip the tracemalloc memory pass")
+    parser.add_argument("--baseline", help="Earlier results file; exit with status 1 when a metric regressed")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed regression against --baseline (default: 0.15)")
+    args = parser.parse_args(argv)
+
+    durations = [int(d) for d in args.durations.split(",") if d.strip()]
+    backends = FakeBackends({
+        "llm": _profile(args.llm_latency, args.jitter, args.llm_failure_rate, args.llm_malformed_rate),
+        "transcript": _profile(args.transcript_latency, args.jitter, args.tool_failure_rate),
+        "title": _profile(args.title_latency, args.jitter, args.tool_failure_rate),
+        "search": _profile(args.search_latency, args.jitter, args.tool_failure_rate),
+    }, seed=args.seed)
+
+    results: Dict[str, Any] = {
+        "schema": RESULTS_SCHEMA,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {
+            "durations_minutes": durations,
+            "repeats": args.repeats,
+            "provider": args.provider,
+            "pipeline_mode": args.pipeline_mode or os.getenv("PIPELINE_MODE", "separate"),
+            "seed": args.seed,
+            "backends": {name: profile.to_dict() for name, profile in backends.profiles.items()},
+        },
+    }
+    with installed(backends):
+        results["workflow"] = {}
+        for minutes in durations:
+            results["workflow"][f"{minutes}min"] = bench_workflow(minutes, max(1, args.repeats), args.provider, args.pipeline_mode)
+            print(f"workflow {minutes}min: p50 {results['workflow'][f'{minutes}min']['latency']['p50_ms']} ms", file=sys.stderr)
+        results["parsers"] = bench_parsers(args.parser_seconds)
+        if not args.skip_memory:
+            results["memory"] = {f"{minutes}min": bench_memory(minutes, args.provider, args.pipeline_mode) for minutes in durations}
+    results["backend_calls"] = backends.stats()
+
+    payload = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            fh.write(payload + "\n")
+    else:
+        print(payload)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as fh:
+            regressions = compare(json.load(fh), results, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
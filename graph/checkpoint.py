@@ -0,0 +1,240 @@
+import os
+import hashlib
+import sqlite3
+import asyncio
+import threading
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple
+from tools.cache import get_cache_root
+
+try:
+    import aiosqlite
+    from langgraph.checkpoint.sqlite import SqliteSaver
+    from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+    from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+except ImportError:  # Optional: without langgraph-checkpoint-sqlite runs are not checkpointed
+    aiosqlite = None
+    SqliteSaver = None
+    AsyncSqliteSaver = None
+    JsonPlusSerializer = None
+
+
+# Persist workflow checkpoints so reruns resume; set WORKFLOW_CHECKPOINTS=0 to disable
+CHECKPOINTS_ENABLED = os.getenv("WORKFLOW_CHECKPOINTS", "1").strip().lower() not in ("0", "false", "off", "no")
+CHECKPOINT_DB = os.getenv("WORKFLOW_CHECKPOINT_DB") or os.path.join(get_cache_root(), "checkpoints.sqlite")
+
+# Node that produces each output; a node whose output is missing after an errored run is retried
+NODE_OUTPUTS = {
+    "process_video": "video_transcript",
+    "generate_summary": "summary",
+    "generate_content": "summary",
+    "generate_quiz": "quiz_questions",
+    "generate_resources": "related_resources",
+}
+NODE_ORDER = ["process_video", "generate_summary", "generate_content", "generate_quiz", "generate_resources"]
+# State fields that are never written to disk; they are put back from the current run's input on load
+SECRET_FIELDS = ("api_key", "groq_api_key")
+
+# Secrets of the run being resumed, set by (a)resume_point in the calling task's context
+_run_secrets: ContextVar[Dict[str, str]] = ContextVar("checkpoint_run_secrets", default={})
+
+_sync_saver = None
+_async_saver = None
+_saver_lock = threading.Lock()
+
+
+def checkpoints_available() -> bool:
+    return CHECKPOINTS_ENABLED and SqliteSaver is not None
+
+
+def make_thread_id(video_id: str, provider: str, session_id: str) -> str:
+    """Checkpoint thread for one video, provider and browser session (the key itself never holds secrets)."""
+    digest = hashlib.sha256(f"{video_id}|{provider}|{session_id}".encode("utf-8")).hexdigest()[:24]
+    return f"{video_id}:{digest}"
+
+
+def _map_secrets(value: Any, secrets: Optional[Dict[str, str]] = None) -> Any:
+    # Blank SECRET_FIELDS at any depth (e.g. inside the input dict held by __start__), or put back ``secrets``
+    if isinstance(value, dict):
+        return {
+            key: (secrets or {}).get(key, "") if key in SECRET_FIELDS else _map_secrets(item, secrets)
+            for key, item in value.items()
+        }
+    if isinstance(value, list):
+        return [_map_secrets(item, secrets) for item in value]
+    if type(value) is tuple:
+        return tuple(_map_secrets(item, secrets) for item in value)
+    return value
+
+
+def _strip_secrets(values: Any) -> Any:
+    return _map_secrets(values)
+
+
+def _strip_writes(writes):
+    # Covers both the input dict written to __start__ and the per-channel writes it fans out to
+    return [(channel, "" if channel in SECRET_FIELDS else _strip_secrets(value)) for channel, value in writes]
+
+
+def _restore_secrets(checkpoint_tuple):
+    secrets = _run_secrets.get()
+    if checkpoint_tuple is None or not secrets:
+        return checkpoint_tuple
+    checkpoint = dict(checkpoint_tuple.checkpoint)
+    checkpoint["channel_values"] = _map_secrets(checkpoint.get("channel_values", {}), secrets)
+    pending = [
+        (task_id, channel, secrets.get(channel, value) if channel in SECRET_FIELDS else _map_secrets(value, secrets))
+        for task_id, channel, value in (checkpoint_tuple.pending_writes or [])
+    ]
+    return checkpoint_tuple._replace(checkpoint=checkpoint, pending_writes=pending)
+
+
+def remember_secrets(state: Dict[str, Any]) -> None:
+    """Make this run's API keys available to checkpoints loaded later in the same task."""
+    _run_secrets.set({field: state[field] for field in SECRET_FIELDS if state.get(field)})
+
+
+class _RedactingSaverMixin:
+    """Keeps API keys out of the checkpoint database: they are blanked on write and restored on read."""
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        checkpoint = {**checkpoint, "channel_values": _strip_secrets(checkpoint.get("channel_values", {}))}
+        return super().put(config, checkpoint, metadata, new_versions)
+
+    def put_writes(self, config, writes, *args, **kwargs):
+        return super().put_writes(config, _strip_writes(writes), *args, **kwargs)
+
+    def get_tuple(self, config):
+        return _restore_secrets(super().get_tuple(config))
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        checkpoint = {**checkpoint, "channel_values": _strip_secrets(checkpoint.get("channel_values", {}))}
+        return await super().aput(config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config, writes, *args, **kwargs):
+        return await super().aput_writes(config, _strip_writes(writes), *args, **kwargs)
+
+    async def aget_tuple(self, config):
+        return _restore_secrets(await super().aget_tuple(config))
+
+
+if SqliteSaver is not None:
+    class RedactingSqliteSaver(_RedactingSaverMixin, SqliteSaver):
+        pass
+
+    class RedactingAsyncSqliteSaver(_RedactingSaverMixin, AsyncSqliteSaver):
+        # The async saver implements the sync methods by blocking on its loop; keep those untouched
+        put = AsyncSqliteSaver.put
+        put_writes = AsyncSqliteSaver.put_writes
+        get_tuple = AsyncSqliteSaver.get_tuple
+
+
+def _serde():
+    # Allow the transcript segment store explicitly so strict msgpack mode can restore it too
+    try:
+        return JsonPlusSerializer(allowed_msgpack_modules=[("tools.transcript_store", "TranscriptSegments")])
+    except TypeError:  # Older langgraph-checkpoint without allowlists
+        return None
+
+
+def _ensure_db_dir() -> None:
+    directory = os.path.dirname(CHECKPOINT_DB)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+
+def get_checkpointer():
+    """Process-wide SQLite checkpointer for sync ``invoke``/``stream`` runs, or None when unavailable."""
+    global _sync_saver
+    if not checkpoints_available():
+        return None
+    with _saver_lock:
+        if _sync_saver is None:
+            _ensure_db_dir()
+            conn = sqlite3.connect(CHECKPOINT_DB, check_same_thread=False)
+            _sync_saver = RedactingSqliteSaver(conn, serde=_serde())
+        return _sync_saver
+
+
+async def aget_checkpointer():
+    """Async SQLite checkpointer bound to the running loop (the workflow's shared background loop)."""
+    global _async_saver
+    if not checkpoints_available() or aiosqlite is None:
+        return None
+    loop = asyncio.get_running_loop()
+    if _async_saver is None or _async_saver.loop is not loop:
+        _ensure_db_dir()
+        conn = await aiosqlite.connect(CHECKPOINT_DB)
+        _async_saver = RedactingAsyncSqliteSaver(conn, serde=_serde())
+    return _async_saver
+
+
+def _first_failed_node(values: Dict[str, Any], graph_nodes: List[str]) -> Optional[str]:
+    if not values.get("error"):
+        return None
+    for node in NODE_ORDER:
+        if node in graph_nodes and not values.get(NODE_OUTPUTS[node]):
+            return node
+    return None
+
+
+Plan = Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]], Dict[str, Any]]
+
+
+def _resume_plan(snapshot, graph_nodes: List[str], config: Dict[str, Any], initial_state: Dict[str, Any]) -> Tuple[Optional[Plan], Optional[str]]:
+    """Decide from a thread's latest snapshot how to (re)run it; shared by resume_point and aresume_point.
+
+    Returns ``(plan, None)`` when the snapshot alone decides, or ``(None, failed_node)`` when the
+    run must fork from the checkpoint just before ``failed_node`` (found in the state history).
+    """
+    values = _strip_secrets(dict(snapshot.values or {}))
+    if not values:
+        return (initial_state, config, {}), None
+    if snapshot.next:
+        return (None, config, values), None
+
+    failed = _first_failed_node(values, graph_nodes)
+    if failed is None:
+        if values.get("error"):
+            # Could not tell which node failed: start over
+            return (initial_state, config, {}), None
+        return (None, None, values), None
+    if failed == "process_video":
+        return (initial_state, config, {}), None
+    return None, failed
+
+
+def _fork_plan(earlier) -> Plan:
+    return None, earlier.config, _strip_secrets(dict(earlier.values or {}))
+
+
+async def aresume_point(app, config: Dict[str, Any], initial_state: Dict[str, Any]) -> Plan:
+    """Decide how to (re)run a checkpointed thread.
+
+    Returns ``(input, config, restored)``: ``input`` is the state to start from (None resumes from
+    ``config``'s checkpoint) and ``restored`` holds the values already computed. A finished
+    thread returns ``config=None`` (nothing to run). An interrupted run continues from its
+    last completed node. A run that ended with an error forks from the checkpoint just before
+    its first failed node, so e.g. a failed ``generate_resources`` reruns without refetching
+    the transcript or regenerating the summary.
+    """
+    remember_secrets(initial_state)
+    plan, failed = _resume_plan(await app.aget_state(config), list(app.nodes), config, initial_state)
+    if plan is not None:
+        return plan
+    async for earlier in app.aget_state_history(config):
+        if failed in earlier.next:
+            return _fork_plan(earlier)
+    return initial_state, config, {}
+
+
+def resume_point(app, config: Dict[str, Any], initial_state: Dict[str, Any]) -> Plan:
+    """Sync variant of aresume_point for apps compiled with get_checkpointer()."""
+    remember_secrets(initial_state)
+    plan, failed = _resume_plan(app.get_state(config), list(app.nodes), config, initial_state)
+    if plan is not None:
+        return plan
+    for earlier in app.get_state_history(config):
+        if failed in earlier.next:
+            return _fork_plan(earlier)
+    return initial_state, config, {}
@@ -0,0 +1,115 @@
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+from langchain_core.runnables import RunnableLambda
+from tools.tracing import set_attribute, span
+
+
+# Node outputs kept per memo (one memo per app session); 0 disables memoization
+NODE_MEMO_SIZE = int(os.getenv("NODE_MEMO_SIZE", 32))
+# Key in config["configurable"] under which the workflow passes the run's NodeMemo
+MEMO_CONFIG_KEY = "node_memo"
+
+
+def _json_default(value: Any) -> Any:
+    if hasattr(value, "_asdict"):
+        return value._asdict()
+    return repr(value)
+
+
+def fingerprint(state: Dict[str, Any], fields: Sequence[str]) -> str:
+    """Hash of the state fields a node reads; equal fingerprints mean the node would see the same input."""
+    payload = json.dumps({field: state.get(field) for field in fields}, sort_keys=True, ensure_ascii=False, default=_json_default)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class NodeMemo:
+    """LRU of node outputs keyed by (node name, input fingerprint).
+
+    Outputs that carry an "error" are never stored, so a failed node always runs again.
+    """
+
+    def __init__(self, max_entries: int = NODE_MEMO_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str], Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, node: str, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            output = self._entries.get((node, key))
+            if output is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end((node, key))
+            self.hits += 1
+            return dict(output)
+
+    def put(self, node: str, key: str, output: Dict[str, Any]) -> None:
+        if self.max_entries <= 0 or not isinstance(output, dict) or output.get("error"):
+            return
+        with self._lock:
+            self._entries[(node, key)] = dict(output)
+            self._entries.move_to_end((node, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+def _memo_from(config: Optional[Dict[str, Any]]) -> Optional[NodeMemo]:
+    memo = ((config or {}).get("configurable") or {}).get(MEMO_CONFIG_KEY)
+    return memo if isinstance(memo, NodeMemo) and memo.max_entries > 0 else None
+
+
+def _noted(output: Any) -> Any:
+    # Nodes report failures in their output instead of raising; surface them on the node span
+    if isinstance(output, dict) and output.get("error"):
+        set_attribute("error", str(output["error"])[:200])
+    return output
+
+
+def memoized_node(name: str, func: Callable, afunc: Callable, inputs: Sequence[str]) -> RunnableLambda:
+    """Wrap a node so it is skipped when its declared ``inputs`` are unchanged since it last succeeded.
+
+    The memo comes from the run's config (``configurable["node_memo"]``); runs without one call
+    the node as usual. Every call is recorded as a "node" span when tracing is active.
+    """
+
+    def _run(state, config=None):
+        with span(f"node.{name}", "node"):
+            memo = _memo_from(config)
+            if memo is None:
+                return _noted(func(state))
+            key = fingerprint(state, inputs)
+            output = memo.get(name, key)
+            set_attribute("memo_hit", output is not None)
+            if output is None:
+                output = func(state)
+                memo.put(name, key, output)
+            return _noted(output)
+
+    async def _arun(state, config=None):
+        with span(f"node.{name}", "node"):
+            memo = _memo_from(config)
+            if memo is None:
+                return _noted(await afunc(state))
+            key = fingerprint(state, inputs)
+            output = memo.get(name, key)
+            set_attribute("memo_hit", output is not None)
+            if output is None:
+                output = await afunc(state)
+                memo.put(name, key, output)
+            return _noted(output)
+
+    return RunnableLambda(_run, afunc=_arun, name=name)
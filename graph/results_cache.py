@@ -0,0 +1,138 @@
+import os
+import sys
+import copy
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from llm.llm_config import resolve_model, resolve_provider
+from tools.youtube_tool import extract_video_id
+
+
+# Bump when prompts or node outputs change shape, so results of the previous pipeline are not served
+PIPELINE_VERSION = "1"
+# Process-wide cache of finished workflow results, shared by every session
+RESULTS_CACHE_MAX_BYTES = int(float(os.getenv("RESULTS_CACHE_MAX_MB", 64)) * 1024 * 1024)
+RESULTS_CACHE_TTL_SECONDS = float(os.getenv("RESULTS_CACHE_TTL_SECONDS", 6 * 3600))
+
+# The only state fields that are shared; credentials and per-user quiz progress never are
+SHARED_FIELDS = (
+    "video_title",
+    "video_transcript",
+    "transcript_segments",
+    "summary",
+    "key_points",
+    "quiz_questions",
+    "related_resources",
+    "search_timings",
+    "token_usage",
+)
+
+
+def _estimate_bytes(value: Any) -> int:
+    """Rough in-memory size of a result: containers, strings and slotted objects such as TranscriptSegments."""
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(_estimate_bytes(k) + _estimate_bytes(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(_estimate_bytes(item) for item in value)
+    slots = getattr(type(value), "__slots__", ())
+    if slots:
+        return sys.getsizeof(value) + sum(_estimate_bytes(getattr(value, name, None)) for name in slots)
+    return sys.getsizeof(value)
+
+
+def results_key(state: Dict[str, Any], pipeline_mode: str) -> Optional[str]:
+    """Cache key for a run: video ID, provider with its resolved model, and pipeline version (never the API key)."""
+    try:
+        video_id = extract_video_id(state.get("video_url") or "")
+    except Exception:
+        return None
+    if not video_id:
+        return None
+    provider = resolve_provider(state.get("llm_provider") or "groq")
+    return f"{video_id}|{provider}:{resolve_model(provider, None)}|{pipeline_mode}-v{PIPELINE_VERSION}"
+
+
+class ResultsCache:
+    """In-memory LRU of finished results with a TTL and a byte cap.
+
+    Only SHARED_FIELDS are stored, and successful results only. Entries are copied on the way in
+    and out so one session's edits (e.g. a regenerated quiz) never leak into another's.
+    """
+
+    def __init__(self, max_bytes: int = RESULTS_CACHE_MAX_BYTES, ttl_seconds: Optional[float] = RESULTS_CACHE_TTL_SECONDS):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, int, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def get(self, key: Optional[str]) -> Optional[Dict[str, Any]]:
+        if not key or not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl_seconds and time.time() - entry[0] > self.ttl_seconds:
+                self._drop(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            values = entry[2]
+        return copy.deepcopy(values)
+
+    def put(self, key: Optional[str], state: Dict[str, Any]) -> None:
+        """Store the shareable part of a finished run; errored or incomplete runs are ignored."""
+        if not key or not self.enabled or state.get("error") or not state.get("summary"):
+            return
+        values = copy.deepcopy({field: state[field] for field in SHARED_FIELDS if field in state})
+        size = _estimate_bytes(values)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (time.time(), size, values)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._drop(oldest)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+                "evictions": self.evictions,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+    def _drop(self, key: str) -> None:
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+
+_results_cache = ResultsCache()
+
+
+def get_results_cache() -> ResultsCache:
+    return _results_cache
@@ -1,30 +1,252 @@
+import os
+import queue
+import asyncio
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
 from langgraph.graph import StateGraph, END
-from state.app_state import YouTubeVideoState
-from nodes.process_video_node import process_video_node
-from nodes.generate_summary_node import generate_summary_node
-from nodes.generate_quiz_node import generate_quiz_node
-from nodes.generate_resources_node import generate_resources_node
-
-def create_workflow():
-    """Create and return the LangGraph workflow."""
+from state.app_state import YouTubeVideoState, merge_dicts
+from nodes.process_video_node import PROCESS_VIDEO_INPUTS, process_video_node, aprocess_video_node
+from nodes.generate_summary_node import SUMMARY_INPUTS, generate_summary_node, agenerate_summary_node
+from nodes.generate_quiz_node import QUIZ_INPUTS, generate_quiz_node, agenerate_quiz_node
+from nodes.generate_resources_node import RESOURCES_INPUTS, generate_resources_node, agenerate_resources_node
+from nodes.generate_combined_node import COMBINED_INPUTS, generate_combined_node, agenerate_combined_node
+from graph.checkpoint import aget_checkpointer, aresume_point
+from graph.memo import MEMO_CONFIG_KEY, NodeMemo, memoized_node
+from graph.results_cache import get_results_cache, results_key
+from tools.tracing import Trace, activate, get_tracing_handler, new_trace, set_attribute, span
+
+
+# "separate" runs summary and quiz as their own LLM calls; "combined" asks for both in one document
+PIPELINE_MODE = os.getenv("PIPELINE_MODE", "separate").strip().lower()
+# Pseudo node name under which values restored from a checkpoint are streamed
+RESTORED_NODE = "__checkpoint__"
+
+def create_workflow(pipeline_mode: Optional[str] = None, checkpointer=None):
+    """Create and return the LangGraph workflow.
+
+    Every node has a sync and an async implementation, so the compiled graph supports both
+    ``invoke`` and ``ainvoke``; with ``ainvoke`` the LLM and resources branches overlap.
+    In "combined" mode a single generate_content node replaces generate_summary and generate_quiz.
+    With a ``checkpointer`` (see graph/checkpoint.py) every completed node is persisted per thread.
+    Nodes are skipped when the state fields they read are unchanged and the run passes a NodeMemo
+    (see graph/memo.py), so e.g. a provider switch only reruns the LLM nodes.
+    """
+    mode = (pipeline_mode or PIPELINE_MODE).strip().lower()
+
     # Define the workflow
     workflow = StateGraph(YouTubeVideoState)
-    
+
     # Add nodes
-    workflow.add_node("process_video", process_video_node)
-    workflow.add_node("generate_summary", generate_summary_node)
-    workflow.add_node("generate_quiz", generate_quiz_node)
-    workflow.add_node("generate_resources", generate_resources_node)
-    
+    workflow.add_node("process_video", memoized_node("process_video", process_video_node, aprocess_video_node, PROCESS_VIDEO_INPUTS))
+    workflow.add_node("generate_resources", memoized_node("generate_resources", generate_resources_node, agenerate_resources_node, RESOURCES_INPUTS))
+    if mode == "combined":
+        workflow.add_node("generate_content", memoized_node("generate_content", generate_combined_node, agenerate_combined_node, COMBINED_INPUTS))
+    else:
+        workflow.add_node("generate_summary", memoized_node("generate_summary", generate_summary_node, agenerate_summary_node, SUMMARY_INPUTS))
+        workflow.add_node("generate_quiz", memoized_node("generate_quiz", generate_quiz_node, agenerate_quiz_node, QUIZ_INPUTS))
+
     # Add edges
-    workflow.add_edge("process_video", "generate_summary")
-    workflow.add_edge("generate_summary", "generate_quiz")
-    workflow.add_edge("generate_summary", "generate_resources")
-    
+    if mode == "combined":
+        # Resources only need the title, so they are searched while the content is generated
+        workflow.add_edge("process_video", "generate_content")
+        workflow.add_edge("process_video", "generate_resources")
+    else:
+        workflow.add_edge("process_video", "generate_summary")
+        workflow.add_edge("generate_summary", "generate_quiz")
+        workflow.add_edge("generate_summary", "generate_resources")
+
     # Set entry point
     workflow.set_entry_point("process_video")
-    
+
     # Compile the workflow
-    app = workflow.compile()
-    
-    return app
\ No newline at end of file
+    app = workflow.compile(checkpointer=checkpointer)
+
+    return app
+
+
+_compiled: Dict[Tuple[str, bool], Tuple[Any, Any]] = {}
+_compiled_lock = threading.Lock()
+
+
+def get_workflow(pipeline_mode: Optional[str] = None, checkpointer=None):
+    """Process-wide compiled graph for a pipeline mode and checkpointer, built on first use.
+
+    Compiled graphs hold no per-run state, so every session and run can share one instead of
+    rebuilding the StateGraph per click. A new checkpointer (e.g. after the loop restarted)
+    replaces the graph compiled with the previous one.
+    """
+    mode = (pipeline_mode or PIPELINE_MODE).strip().lower()
+    slot = (mode, checkpointer is not None)
+    with _compiled_lock:
+        cached = _compiled.get(slot)
+        if cached is None or cached[0] is not checkpointer:
+            cached = (checkpointer, create_workflow(mode, checkpointer=checkpointer))
+            _compiled[slot] = cached
+        return cached[1]
+
+
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_loop_lock = threading.Lock()
+
+
+def _get_event_loop() -> asyncio.AbstractEventLoop:
+    """Return the process-wide background event loop, starting it on first use.
+
+    Pooled LLM clients keep async connections bound to the loop that opened them, so all
+    pipelines share one long-lived loop instead of creating one per ``asyncio.run``.
+    """
+    global _loop
+    with _loop_lock:
+        if _loop is None or _loop.is_closed():
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="workflow-event-loop", daemon=True).start()
+        return _loop
+
+
+def run_async(coro) -> Any:
+    """Run a coroutine on the shared background event loop and block until it finishes."""
+    return asyncio.run_coroutine_threadsafe(coro, _get_event_loop()).result()
+
+
+def _with_memo(config: Optional[Dict[str, Any]], node_memo: Optional[NodeMemo]) -> Optional[Dict[str, Any]]:
+    if node_memo is None:
+        return config
+    config = dict(config or {})
+    config["configurable"] = {**config.get("configurable", {}), MEMO_CONFIG_KEY: node_memo}
+    return config
+
+
+def _with_tracing(config: Optional[Dict[str, Any]], trace: Optional[Trace]) -> Optional[Dict[str, Any]]:
+    # The callback reaches every LLM call made inside the nodes and records it as a span
+    if trace is None:
+        return config
+    config = dict(config or {})
+    config["callbacks"] = [*(config.get("callbacks") or []), get_tracing_handler()]
+    return config
+
+
+async def _aprepare(initial_state: YouTubeVideoState, thread_id: Optional[str], node_memo: Optional[NodeMemo] = None):
+    """Compile the graph and work out where to start: ``(app, input, config, restored values)``.
+
+    A result for the same video, provider and pipeline in the shared results cache is served
+    as-is. Otherwise, without a thread ID (or without the SQLite checkpointer) every call is a
+    fresh run. A returned config of None with restored values means there is nothing to run.
+    """
+    cached = get_results_cache().get(results_key(initial_state, PIPELINE_MODE))
+    set_attribute("results_cache_hit", bool(cached))
+    if cached:
+        return get_workflow(), None, None, cached
+    checkpointer = await aget_checkpointer() if thread_id else None
+    if checkpointer is None:
+        return get_workflow(), initial_state, _with_memo(None, node_memo), {}
+    app = get_workflow(checkpointer=checkpointer)
+    config = {"configurable": {"thread_id": thread_id}}
+    run_input, run_config, restored = await aresume_point(app, config, initial_state)
+    set_attribute("checkpoint_restored", bool(restored))
+    if run_config is None:
+        return app, run_input, None, restored
+    return app, run_input, _with_memo(run_config, node_memo), restored
+
+
+def _fold_chunk(state: Dict[str, Any], chunk: Any, stream_mode: Union[str, Sequence[str]]) -> None:
+    """Apply a streamed "values" or "updates" chunk to ``state`` to rebuild the final result."""
+    mode, payload = (stream_mode, chunk) if isinstance(stream_mode, str) else chunk
+    if mode == "values" and isinstance(payload, dict):
+        state.update(payload)
+    elif mode == "updates" and isinstance(payload, dict):
+        for values in payload.values():
+            if isinstance(values, dict):
+                usage = merge_dicts(state.get("token_usage"), values.get("token_usage"))
+                state.update(values)
+                state["token_usage"] = usage
+
+
+def _restored_chunks(restored: Dict[str, Any], stream_mode: Union[str, Sequence[str]]) -> List[Any]:
+    """Present checkpointed values as stream chunks so callers see them like a node's output."""
+    if not restored:
+        return []
+    modes = [stream_mode] if isinstance(stream_mode, str) else list(stream_mode)
+    chunks = []
+    for mode in modes:
+        if mode == "updates":
+            payload = {RESTORED_NODE: restored}
+        elif mode == "values":
+            payload = restored
+        else:
+            continue
+        chunks.append(payload if isinstance(stream_mode, str) else (mode, payload))
+    return chunks
+
+
+async def arun_workflow(initial_state: YouTubeVideoState, thread_id: Optional[str] = None, node_memo: Optional[NodeMemo] = None, trace: Optional[Trace] = None) -> Dict[str, Any]:
+    """Run the workflow with ``ainvoke`` so independent branches overlap on one event loop.
+
+    With a ``thread_id`` the run is checkpointed and a repeat call resumes instead of recomputing;
+    with a ``node_memo`` nodes whose inputs did not change since a previous run are skipped.
+    Spans are recorded into ``trace`` (or a new one when TRACE_EXPORT_PATH is set) and exported.
+    """
+    trace = trace or new_trace()
+    try:
+        with activate(trace), span("workflow", "workflow"):
+            app, run_input, config, restored = await _aprepare(initial_state, thread_id, node_memo)
+            if config is None and restored:
+                return {**initial_state, **restored}
+            result = await app.ainvoke(run_input, config=_with_tracing(config, trace))
+            get_results_cache().put(results_key(initial_state, PIPELINE_MODE), result)
+            return result
+    finally:
+        if trace is not None:
+            trace.export()
+
+
+def run_workflow(initial_state: YouTubeVideoState, thread_id: Optional[str] = None, node_memo: Optional[NodeMemo] = None, trace: Optional[Trace] = None) -> Dict[str, Any]:
+    """Blocking entry point for sync callers such as Streamlit; many calls can be in flight at once."""
+    return run_async(arun_workflow(initial_state, thread_id, node_memo, trace))
+
+
+def stream_workflow(initial_state: YouTubeVideoState, stream_mode: Union[str, Sequence[str]] = "updates", thread_id: Optional[str] = None, node_memo: Optional[NodeMemo] = None, trace: Optional[Trace] = None) -> Iterator[Any]:
+    """Run the workflow with ``astream`` on the shared loop and yield its chunks to a sync caller.
+
+    With several stream modes (e.g. ``["messages", "values"]``) each chunk is a ``(mode, payload)``
+    tuple; "messages" carries LLM tokens as they are generated. Values restored from the shared
+    results cache or (with a ``thread_id``) a checkpoint come first as an update from
+    ``RESTORED_NODE``, followed by the chunks of whatever still has to run. Spans are recorded
+    into ``trace`` as in arun_workflow.
+    """
+    chunks: "queue.Queue[Any]" = queue.Queue()
+    finished = object()
+    run_trace = trace or new_trace()
+
+    async def _pump():
+        try:
+            with activate(run_trace), span("workflow", "workflow"):
+                app, run_input, config, restored = await _aprepare(initial_state, thread_id, node_memo)
+                for chunk in _restored_chunks(restored, stream_mode):
+                    chunks.put(("chunk", chunk))
+                if config is None and restored:
+                    return
+                final = {**initial_state, **restored}
+                async for chunk in app.astream(run_input, config=_with_tracing(config, run_trace), stream_mode=stream_mode):
+                    _fold_chunk(final, chunk, stream_mode)
+                    chunks.put(("chunk", chunk))
+                get_results_cache().put(results_key(initial_state, PIPELINE_MODE), final)
+        except Exception as e:
+            chunks.put(("error", e))
+        finally:
+            if run_trace is not None:
+                run_trace.export()
+            chunks.put(finished)
+
+    future = asyncio.run_coroutine_threadsafe(_pump(), _get_event_loop())
+    try:
+        while True:
+            item = chunks.get()
+            if item is finished:
+                break
+            kind, payload = item
+            if kind == "error":
+                raise payload
+            yield payload
+    finally:
+        # Stop the run if the consumer goes away early
+        future.cancel()
@@ -0,0 +1,130 @@
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import httpx
+from llm.rate_limiter import AsyncRateLimitedTransport, RateLimitedTransport
+
+
+def key_fingerprint(api_key: str) -> str:
+    """Return a short, non-reversible fingerprint of an API key for use in registry keys."""
+    return hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:16]
+
+
+class ClientPool:
+    """Process-wide registry of LLM clients keyed by (provider, model, API key fingerprint).
+
+    Clients idle for longer than ``idle_ttl_seconds`` are dropped on the next lookup, and the
+    least recently used client is evicted once ``max_clients`` is exceeded.
+    """
+
+    def __init__(self, *, idle_ttl_seconds: float = 900, max_clients: int = 64):
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self.max_clients = max_clients
+        self._clients: "OrderedDict[Tuple[str, str, str], Tuple[Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+        self.evicted = 0
+
+    def get_or_create(self, key: Tuple[str, str, str], factory: Callable[[], Any]) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            self._evict_idle(now)
+            entry = self._clients.get(key)
+            if entry is not None:
+                self._clients[key] = (entry[0], now)
+                self._clients.move_to_end(key)
+                self.reused += 1
+                return entry[0]
+        # Build outside the lock; a concurrent duplicate is harmless and the first one wins
+        client = factory()
+        with self._lock:
+            entry = self._clients.get(key)
+            if entry is not None:
+                self.reused += 1
+                return entry[0]
+            self._clients[key] = (client, now)
+            self.created += 1
+            while len(self._clients) > self.max_clients:
+                self._clients.popitem(last=False)
+                self.evicted += 1
+            return client
+
+    def clear(self) -> None:
+        with self._lock:
+            self._clients.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "clients": len(self._clients),
+                "created": self.created,
+                "reused": self.reused,
+                "evicted": self.evicted,
+            }
+
+    def _evict_idle(self, now: float) -> None:
+        if not self.idle_ttl_seconds:
+            return
+        stale = [key for key, (_, last_used) in self._clients.items() if now - last_used > self.idle_ttl_seconds]
+        for key in stale:
+            del self._clients[key]
+            self.evicted += 1
+
+
+_pool = ClientPool(
+    idle_ttl_seconds=float(os.getenv("LLM_CLIENT_IDLE_TTL_SECONDS", 900)),
+    max_clients=int(os.getenv("LLM_CLIENT_POOL_SIZE", 64)),
+)
+_http_client: Optional[httpx.Client] = None
+_async_http_client: Optional[httpx.AsyncClient] = None
+_http_lock = threading.Lock()
+
+
+def get_client_pool() -> ClientPool:
+    return _pool
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", 50)),
+        max_keepalive_connections=int(os.getenv("LLM_HTTP_MAX_KEEPALIVE", 20)),
+        keepalive_expiry=60.0,
+    )
+
+
+def get_shared_http_client() -> httpx.Client:
+    """Return the process-wide HTTP client whose keep-alive pool is shared by OpenAI/Groq clients.
+
+    API keys are sent per request by the SDKs, so one connection pool safely serves every key.
+    Requests are rate-limited per provider and key (see llm.rate_limiter).
+    """
+    global _http_client
+    with _http_lock:
+        if _http_client is None:
+            _http_client = httpx.Client(
+                timeout=httpx.Timeout(120.0, connect=10.0),
+                transport=RateLimitedTransport(httpx.HTTPTransport(limits=_limits())),
+            )
+        return _http_client
+
+
+def get_shared_async_http_client() -> httpx.AsyncClient:
+    """Async counterpart of get_shared_http_client; shares its rate limits."""
+    global _async_http_client
+    with _http_lock:
+        if _async_http_client is None:
+            _async_http_client = httpx.AsyncClient(
+                timeout=httpx.Timeout(120.0, connect=10.0),
+                transport=AsyncRateLimitedTransport(httpx.AsyncHTTPTransport(limits=_limits())),
+            )
+        return _async_http_client
+
+
+def get_client_pool_stats() -> Dict[str, Any]:
+    """Return how many LLM clients were created, reused and evicted."""
+    return _pool.stats()
@@ -0,0 +1,225 @@
+import os
+import time
+import json
+import sqlite3
+import hashlib
+import warnings
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Sequence
+from langchain_core._api import LangChainBetaWarning
+from langchain_core.caches import BaseCache
+from langchain_core.load import dumps, loads
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, Generation, GenerationChunk
+from tools.cache import get_cache_root
+from tools.tracing import add_count
+
+
+# The only classes revived from cached entries (which may come from a file on disk): generations and AI messages
+CACHED_TYPES = [Generation, GenerationChunk, ChatGeneration, ChatGenerationChunk, AIMessage, AIMessageChunk]
+# loads() is marked beta; with an explicit allowlist its use here is deliberate, so don't warn on every cache hit
+warnings.filterwarnings("ignore", message="The function `loads` is in beta", category=LangChainBetaWarning)
+
+
+class ResponseCache:
+    """Two-tier LLM response store: an in-memory LRU in front of an optional SQLite table.
+
+    Values are serialized LangChain generations. Entries older than ``ttl_seconds`` are
+    treated as misses in both tiers.
+    """
+
+    def __init__(self, *, max_entries: int = 512, ttl_seconds: Optional[float] = None, sqlite_path: Optional[str] = None, sqlite_max_entries: int = 20000):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.sqlite_path = sqlite_path
+        self.sqlite_max_entries = sqlite_max_entries
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self.memory_hits = 0
+        self.sqlite_hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self.bytes_saved = 0
+        if sqlite_path:
+            self._open_sqlite(sqlite_path)
+
+    @staticmethod
+    def make_key(provider: str, model: str, temperature: float, max_tokens: int, prompt: str, llm_string: str = "") -> str:
+        """Build the cache key from the call parameters and a hash of the prompt."""
+        prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        # llm_string carries per-call bindings (stop sequences, response formats, ...)
+        params_hash = hashlib.sha256(llm_string.encode("utf-8")).hexdigest()[:16]
+        return json.dumps([provider, model, float(temperature), int(max_tokens), prompt_hash, params_hash])
+
+    def get(self, key: str, prompt_bytes: int = 0) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                value, created_at = entry
+                if not self._expired(created_at, now):
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    self.bytes_saved += prompt_bytes + len(value)
+                    return value
+                del self._memory[key]
+
+            if self._conn is not None:
+                row = self._conn.execute("SELECT value, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+                if row is not None and not self._expired(row[1], now):
+                    self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+                    self._conn.commit()
+                    self._remember(key, row[0], row[1])
+                    self.sqlite_hits += 1
+                    self.bytes_saved += prompt_bytes + len(row[0])
+                    return row[0]
+
+            self.misses += 1
+            return None
+
+    def put(self, key: str, value: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._remember(key, value, now)
+            if self._conn is not None:
+                try:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO responses (key, value, created_at, last_access) VALUES (?, ?, ?, ?)",
+                        (key, value, now, now),
+                    )
+                    self._prune_sqlite(now)
+                    self._conn.commit()
+                except sqlite3.Error as e:
+                    print(f"Error writing LLM cache: {str(e)}")
+
+    def record_bypass(self) -> None:
+        with self._lock:
+            self.bypassed += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM responses")
+                self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            hits = self.memory_hits + self.sqlite_hits
+            lookups = hits + self.misses
+            return {
+                "hits": hits,
+                "memory_hits": self.memory_hits,
+                "sqlite_hits": self.sqlite_hits,
+                "misses": self.misses,
+                "bypassed": self.bypassed,
+                "hit_rate": (hits / lookups) if lookups else 0.0,
+                "bytes_saved": self.bytes_saved,
+                "memory_entries": len(self._memory),
+            }
+
+    def _expired(self, created_at: float, now: float) -> bool:
+        return bool(self.ttl_seconds) and (now - created_at) > self.ttl_seconds
+
+    def _remember(self, key: str, value: str, created_at: float) -> None:
+        self._memory[key] = (value, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _open_sqlite(self, path: str) -> None:
+        try:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL, last_access REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)")
+            self._conn.commit()
+        except sqlite3.Error as e:
+            print(f"Error opening LLM cache database, using memory only: {str(e)}")
+            self._conn = None
+
+    def _prune_sqlite(self, now: float) -> None:
+        if self.ttl_seconds:
+            self._conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,))
+        count = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        if count > self.sqlite_max_entries:
+            self._conn.execute(
+                "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY last_access ASC LIMIT ?)",
+                (count - self.sqlite_max_entries,),
+            )
+
+
+class BoundLLMCache(BaseCache):
+    """LangChain cache adapter that keys a shared ResponseCache by the resolved LLM parameters."""
+
+    def __init__(self, store: ResponseCache, *, provider: str, model: str, temperature: float, max_tokens: int):
+        self.store = store
+        self.provider = provider
+        self.model = model
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+
+    def _key(self, prompt: str, llm_string: str) -> str:
+        return ResponseCache.make_key(self.provider, self.model, self.temperature, self.max_tokens, prompt, llm_string)
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[Sequence[Any]]:
+        raw = self.store.get(self._key(prompt, llm_string), prompt_bytes=len(prompt.encode("utf-8")))
+        if raw is None:
+            return None
+        add_count("llm_cache_hits")
+        try:
+            return loads(raw, allowed_objects=CACHED_TYPES)
+        except Exception:
+            return None
+
+    def update(self, prompt: str, llm_string: str, return_val: Sequence[Any]) -> None:
+        try:
+            self.store.put(self._key(prompt, llm_string), dumps(list(return_val)))
+        except Exception as e:
+            print(f"Error caching LLM response: {str(e)}")
+
+    def clear(self, **kwargs: Any) -> None:
+        self.store.clear()
+
+
+_store: Optional[ResponseCache] = None
+_store_lock = threading.Lock()
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """Return the process-wide response cache configured by LLM_CACHE, or None when disabled.
+
+    LLM_CACHE: "memory" (default), "sqlite" (memory LRU + SQLite on disk) or "off".
+    """
+    global _store
+    mode = os.getenv("LLM_CACHE", "memory").strip().lower()
+    if mode in ("off", "none", "0", "false"):
+        return None
+    with _store_lock:
+        if _store is None:
+            sqlite_path = None
+            if mode == "sqlite":
+                sqlite_path = os.getenv("LLM_CACHE_PATH") or os.path.join(get_cache_root(), "llm_cache.sqlite")
+            _store = ResponseCache(
+                max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", 512)),
+                ttl_seconds=float(os.getenv("LLM_CACHE_TTL_SECONDS", 24 * 3600)),
+                sqlite_path=sqlite_path,
+            )
+        return _store
+
+
+def record_cache_bypass() -> None:
+    """Count a call that explicitly skipped the cache (e.g. quiz generation with a VARIATION_TOKEN)."""
+    store = get_response_cache()
+    if store is not None:
+        store.record_bypass()
+
+
+def get_llm_cache_stats() -> Dict[str, Any]:
+    """Return hit rates and bytes saved by the LLM response cache."""
+    store = get_response_cache()
+    return store.stats() if store is not None else {"enabled": False}
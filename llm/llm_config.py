@@ -4,11 +4,74 @@ from dotenv import load_dotenv
 from langchain_groq import ChatGroq
 from langchain_openai import ChatOpenAI
 from langchain_huggingface import HuggingFaceEndpoint
+from llm.llm_cache import BoundLLMCache, get_response_cache, record_cache_bypass
+from llm.client_pool import get_client_pool, get_shared_async_http_client, get_shared_http_client, key_fingerprint
+from llm.rate_limiter import CHARS_PER_TOKEN, acall_with_retry, astream_with_retry, call_with_retry, get_limiter, stream_with_retry
 
 load_dotenv()
 
-def get_llm(*, model: Optional[str] = None, temperature: Optional[float] = None, max_tokens: Optional[int] = None, api_key: Optional[str] = None, provider: Optional[str] = None):
-    """Initialize and return a configured chat LLM for the selected provider.
+_client_pool = get_client_pool()
+
+DEFAULT_MAX_TOKENS = 2048
+
+
+class RateLimitedHuggingFaceEndpoint(HuggingFaceEndpoint):
+    """HuggingFaceEndpoint whose calls go through the key's rate limiter and are retried on 429.
+
+    The endpoint has no injectable HTTP client, so limiting happens here rather than in the
+    shared transport used for OpenAI and Groq. Streams are retried until their first chunk.
+    """
+
+    rate_limit_key: str = ""
+
+    def _limited(self, prompt: str):
+        cost = len(prompt) // CHARS_PER_TOKEN + int(self.max_new_tokens or 0)
+        return get_limiter("huggingface", self.rate_limit_key), cost
+
+    def _call(self, prompt, stop=None, run_manager=None, **kwargs):
+        call = super()._call
+        if self.streaming:  # The base class then reads self._stream, which is already limited
+            return call(prompt, stop, run_manager, **kwargs)
+        return call_with_retry(*self._limited(prompt), lambda: call(prompt, stop, run_manager, **kwargs))
+
+    async def _acall(self, prompt, stop=None, run_manager=None, **kwargs):
+        call = super()._acall
+        if self.streaming:
+            return await call(prompt, stop, run_manager, **kwargs)
+        return await acall_with_retry(*self._limited(prompt), lambda: call(prompt, stop, run_manager, **kwargs))
+
+    def _stream(self, prompt, stop=None, run_manager=None, **kwargs):
+        stream = super()._stream
+        return stream_with_retry(*self._limited(prompt), lambda: stream(prompt, stop, run_manager, **kwargs))
+
+    def _astream(self, prompt, stop=None, run_manager=None, **kwargs):
+        stream = super()._astream
+        return astream_with_retry(*self._limited(prompt), lambda: stream(prompt, stop, run_manager, **kwargs))
+
+
+def resolve_provider(provider: Optional[str] = None) -> str:
+    """Normalize the provider name (argument, then LLM_PROVIDER, then "groq")."""
+    chosen = (provider or os.getenv("LLM_PROVIDER") or "groq").strip().lower()
+    # Normalize common variants (e.g., "hugging face" → "huggingface")
+    chosen = chosen.replace(" ", "").replace("-", "").replace("_", "")
+    return "huggingface" if chosen == "hf" else chosen
+
+
+def resolve_model(provider: Optional[str] = None, model: Optional[str] = None) -> str:
+    """Return the model get_llm uses for this provider when no override is given."""
+    chosen = resolve_provider(provider)
+    return model or (
+        "gpt-4o-mini" if chosen == "openai" else
+        "Qwen/Qwen3-8B" if chosen == "huggingface" else
+        "qwen/qwen3-32b"
+    )
+
+def get_llm(*, model: Optional[str] = None, temperature: Optional[float] = None, max_tokens: Optional[int] = None, api_key: Optional[str] = None, provider: Optional[str] = None, cache: bool = True):
+    """Return a configured chat LLM for the selected provider.
+
+    The underlying client (and its HTTP connection pool) is reused across calls and sessions
+    for the same provider, model and API key; temperature, max_tokens and caching are applied
+    to a cheap per-call copy.
 
     Parameters
     ----------
@@ -18,51 +81,80 @@ def get_llm(*, model: Optional[str] = None, temperature: Optional[float] = None,
         Optional temperature override. Defaults to 0.7.
     max_tokens: Optional[int]
         Optional max_tokens override. Defaults to 2048.
+    cache: bool
+        Serve identical prompts from the response cache (see LLM_CACHE). Pass False for
+        calls that must vary between runs.
     """
     try:
-        chosen = (provider or os.getenv("LLM_PROVIDER") or "groq").strip().lower()
-        # Normalize common variants (e.g., "hugging face" → "huggingface")
-        chosen = chosen.replace(" ", "").replace("-", "").replace("_", "")
-        resolved_model = model or (
-            "gpt-4o-mini" if chosen == "openai" else
-            "Qwen/Qwen3-8B" if chosen == "huggingface" else
-            "qwen/qwen3-32b"
-        )
+        chosen = resolve_provider(provider)
+        resolved_model = resolve_model(chosen, model)
         resolved_temperature = 0.7 if temperature is None else float(temperature)
-        resolved_max_tokens = 2048 if max_tokens is None else int(max_tokens)
+        resolved_max_tokens = DEFAULT_MAX_TOKENS if max_tokens is None else int(max_tokens)
+
+        # cache=False disables any global LangChain cache too; None keeps LangChain's default
+        response_cache = None
+        store = get_response_cache()
+        if not cache:
+            response_cache = False
+            record_cache_bypass()
+        elif store is not None:
+            response_cache = BoundLLMCache(
+                store,
+                provider=chosen,
+                model=resolved_model,
+                temperature=resolved_temperature,
+                max_tokens=resolved_max_tokens,
+            )
 
         if chosen == "openai":
             key = api_key or os.getenv("OPENAI_API_KEY")
             if not key:
                 raise ValueError("OPENAI_API_KEY not found. Provide it in the UI or environment.")
-            return ChatOpenAI(
-                model=resolved_model,
-                api_key=key,
-                temperature=resolved_temperature,
-                max_tokens=resolved_max_tokens,
+            base = _client_pool.get_or_create(
+                ("openai", resolved_model, key_fingerprint(key)),
+                lambda: ChatOpenAI(
+                    model=resolved_model,
+                    api_key=key,
+                    http_client=get_shared_http_client(),
+                    http_async_client=get_shared_async_http_client(),
+                    max_retries=0,  # 429s are retried by the rate-limited transport
+                ),
             )
-        elif chosen in ("huggingface", "hf"):
+            overrides = {"max_tokens": resolved_max_tokens}
+        elif chosen == "huggingface":
             key = api_key or os.getenv("HUGGINGFACEHUB_API_TOKEN")
             if not key:
                 raise ValueError("HUGGINGFACEHUB_API_TOKEN not found. Provide it in the UI or environment.")
             if not key.startswith("hf_"):
                 raise ValueError("Invalid Hugging Face token format. It should start with 'hf_'.")
-            return HuggingFaceEndpoint(
-                repo_id=resolved_model,
-                task="text-generation",
-                huggingfacehub_api_token=key,
-                temperature=resolved_temperature,
-                max_new_tokens=resolved_max_tokens,
+            base = _client_pool.get_or_create(
+                ("huggingface", resolved_model, key_fingerprint(key)),
+                lambda: RateLimitedHuggingFaceEndpoint(
+                    repo_id=resolved_model,
+                    task="text-generation",
+                    huggingfacehub_api_token=key,
+                    rate_limit_key=key_fingerprint(key),
+                ),
             )
+            overrides = {"max_new_tokens": resolved_max_tokens}
         else:  # groq default
             key = api_key or os.getenv("GROQ_API_KEY")
             if not key:
                 raise ValueError("GROQ_API_KEY not found. Provide it in the UI or environment.")
-            return ChatGroq(
-                model=resolved_model,
-                groq_api_key=key,
-                temperature=resolved_temperature,
-                max_tokens=resolved_max_tokens,
+            base = _client_pool.get_or_create(
+                ("groq", resolved_model, key_fingerprint(key)),
+                lambda: ChatGroq(
+                    model=resolved_model,
+                    groq_api_key=key,
+                    http_client=get_shared_http_client(),
+                    http_async_client=get_shared_async_http_client(),
+                    max_retries=0,  # 429s are retried by the rate-limited transport
+                ),
             )
+            overrides = {"max_tokens": resolved_max_tokens}
+
+        # Shallow copy shares the pooled SDK/HTTP clients; only the per-call settings differ
+        overrides.update({"temperature": resolved_temperature, "cache": response_cache})
+        return base.model_copy(update=overrides)
     except Exception as e:
         raise Exception(f"Error initializing LLM: {str(e)}")
\ No newline at end of file
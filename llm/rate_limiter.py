@@ -0,0 +1,494 @@
+import os
+import json
+import time
+import random
+import asyncio
+import threading
+from email.utils import parsedate_to_datetime
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, Optional, Tuple
+
+import httpx
+from tools.tracing import add_count
+
+
+# Requests per minute per provider and API key (LLM_RPM_<PROVIDER> overrides, 0 = unlimited)
+DEFAULT_RPM = {"groq": 30, "openai": 500, "huggingface": 60}
+# Tokens per minute; 0 = learn it from the provider's x-ratelimit-limit-tokens header (LLM_TPM_<PROVIDER> overrides)
+DEFAULT_TPM = {"groq": 0, "openai": 0, "huggingface": 0}
+# API hosts whose requests go through the limiter; other hosts are limited under their host name
+PROVIDER_HOSTS = {"api.groq.com": "groq", "api.openai.com": "openai"}
+# 429 handling: retries per request and the exponential backoff range (seconds)
+MAX_RETRIES = int(os.getenv("LLM_RATE_LIMIT_RETRIES", 4))
+BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE_SECONDS", 1.0))
+BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX_SECONDS", 60))
+# Upper bound of the adaptive in-flight limit per provider and key; a 429 halves the current limit
+MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 8))
+
+CHARS_PER_TOKEN = 4
+_POLL_SECONDS = 0.05
+
+
+def _limit(prefix: str, provider: str, defaults: Dict[str, int]) -> int:
+    value = os.getenv(f"{prefix}_{provider.upper()}")
+    return int(value) if value else defaults.get(provider, 0)
+
+
+def retry_after_seconds(headers: Any) -> Optional[float]:
+    """Parse a Retry-After header given in seconds or as an HTTP date."""
+    value = (headers or {}).get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except Exception:
+        return None
+
+
+def backoff_delay(attempt: int, retry_after: Optional[float] = None) -> float:
+    """Full-jitter exponential backoff, never shorter than the server's Retry-After."""
+    delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+    if retry_after is not None:
+        delay = max(delay, retry_after + random.uniform(0, BACKOFF_BASE / 2))
+    return min(delay, max(BACKOFF_MAX, retry_after or 0.0))
+
+
+class TokenBucket:
+    """Per-minute budget refilled continuously; ``reserve`` books a cost and returns how long to wait for it.
+
+    A rate of 0 means unlimited. Costs larger than the whole bucket only wait for a full bucket.
+    """
+
+    def __init__(self, per_minute: float):
+        self._lock = threading.Lock()
+        self.set_rate(per_minute)
+
+    def set_rate(self, per_minute: float) -> None:
+        with self._lock:
+            self.capacity = float(per_minute)
+            self.rate = float(per_minute) / 60.0
+            self.tokens = float(per_minute)
+            self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, cost: float) -> float:
+        with self._lock:
+            if self.rate <= 0:
+                return 0.0
+            self._refill(time.monotonic())
+            self.tokens -= min(cost, self.capacity)
+            return -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+    def observe_remaining(self, remaining: float) -> None:
+        """Trust the provider's own count when it is lower than ours."""
+        with self._lock:
+            if self.rate > 0:
+                self._refill(time.monotonic())
+                self.tokens = min(self.tokens, remaining)
+
+
+class KeyLimiter:
+    """Request and token buckets plus an adaptive in-flight limit for one provider and API key."""
+
+    def __init__(self, provider: str):
+        self.provider = provider
+        self.requests = TokenBucket(_limit("LLM_RPM", provider, DEFAULT_RPM))
+        self.tokens = TokenBucket(_limit("LLM_TPM", provider, DEFAULT_TPM))
+        self.learned_tpm = self.tokens.rate > 0
+        self.concurrency = MAX_CONCURRENCY
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._waiting = 0
+        self._successes = 0
+        self._blocked_until = 0.0
+        self.throttled_seconds = 0.0
+        self.throttled_requests = 0
+        self.rate_limited = 0
+        self.retries = 0
+
+    # Admission
+
+    def _try_enter(self) -> bool:
+        with self._lock:
+            if self._in_flight < self.concurrency and time.monotonic() >= self._blocked_until:
+                self._in_flight += 1
+                return True
+            return False
+
+    def _booked_wait(self, cost: int) -> float:
+        return max(self.requests.reserve(1), self.tokens.reserve(cost))
+
+    def _record_wait(self, waited: float) -> None:
+        if waited <= 0.001:
+            return
+        with self._lock:
+            self.throttled_seconds += waited
+            self.throttled_requests += 1
+        add_count("llm_throttle_ms", int(waited * 1000))
+
+    def acquire(self, cost: int) -> None:
+        """Block until a request of ``cost`` tokens may be sent."""
+        started = time.monotonic()
+        with self._lock:
+            self._waiting += 1
+        try:
+            wait = self._booked_wait(cost)
+            if wait:
+                time.sleep(wait)
+            while not self._try_enter():
+                time.sleep(_POLL_SECONDS)
+        finally:
+            with self._lock:
+                self._waiting -= 1
+        self._record_wait(time.monotonic() - started)
+
+    async def aacquire(self, cost: int) -> None:
+        started = time.monotonic()
+        with self._lock:
+            self._waiting += 1
+        try:
+            wait = self._booked_wait(cost)
+            if wait:
+                await asyncio.sleep(wait)
+            while not self._try_enter():
+                await asyncio.sleep(_POLL_SECONDS)
+        finally:
+            with self._lock:
+                self._waiting -= 1
+        self._record_wait(time.monotonic() - started)
+
+    def release(self) -> None:
+        with self._lock:
+            self._in_flight = max(0, self._in_flight - 1)
+
+    # Feedback
+
+    def on_success(self, headers: Any = None) -> None:
+        """Grow the in-flight limit by one after a full window of successes (additive increase)."""
+        with self._lock:
+            self._successes += 1
+            if self._successes >= self.concurrency and self.concurrency < MAX_CONCURRENCY:
+                self.concurrency += 1
+                self._successes = 0
+        self._observe_headers(headers)
+
+    def on_rate_limited(self, headers: Any, attempt: int) -> float:
+        """Halve the in-flight limit, pause this key for the backoff delay and return that delay."""
+        delay = backoff_delay(attempt, retry_after_seconds(headers))
+        with self._lock:
+            self.rate_limited += 1
+            self.concurrency = max(1, self.concurrency // 2)
+            self._successes = 0
+            self._blocked_until = max(self._blocked_until, time.monotonic() + delay)
+        add_count("llm_rate_limited")
+        self._observe_headers(headers)
+        return delay
+
+    def on_retry(self, delay: float) -> None:
+        """Count a retry; its backoff sleep is throttle time like any other wait."""
+        with self._lock:
+            self.retries += 1
+        self._record_wait(delay)
+
+    def _observe_headers(self, headers: Any) -> None:
+        # OpenAI and Groq report the per-minute token limit and what is left of it
+        if not headers:
+            return
+        try:
+            limit = headers.get("x-ratelimit-limit-tokens")
+            if limit and not self.learned_tpm:
+                self.tokens.set_rate(float(limit))
+                self.learned_tpm = True
+            remaining = headers.get("x-ratelimit-remaining-tokens")
+            if remaining is not None:
+                self.tokens.observe_remaining(float(remaining))
+        except (TypeError, ValueError):
+            pass
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "provider": self.provider,
+                "queue_depth": self._waiting,
+                "in_flight": self._in_flight,
+                "concurrency_limit": self.concurrency,
+                "requests_per_minute": round(self.requests.capacity),
+                "tokens_per_minute": round(self.tokens.capacity),
+                "throttled_requests": self.throttled_requests,
+                "throttled_seconds": round(self.throttled_seconds, 3),
+                "rate_limited": self.rate_limited,
+                "retries": self.retries,
+            }
+
+
+_limiters: Dict[Tuple[str, str], KeyLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(provider: str, key_id: str) -> KeyLimiter:
+    """Limiter for a provider and API key fingerprint (see client_pool.key_fingerprint)."""
+    with _limiters_lock:
+        limiter = _limiters.get((provider, key_id))
+        if limiter is None:
+            limiter = _limiters[(provider, key_id)] = KeyLimiter(provider)
+        return limiter
+
+
+def get_rate_limiter_stats() -> Dict[str, Dict[str, Any]]:
+    """Queue depth, in-flight limit, throttle time and 429 counts per provider and key fingerprint."""
+    with _limiters_lock:
+        limiters = dict(_limiters)
+    return {f"{provider}:{key_id[:8]}": limiter.stats() for (provider, key_id), limiter in limiters.items()}
+
+
+def _limiter_for(request: httpx.Request) -> KeyLimiter:
+    # Imported here: client_pool builds its HTTP clients with the transports below
+    from llm.client_pool import key_fingerprint
+
+    provider = PROVIDER_HOSTS.get(request.url.host, request.url.host)
+    auth = request.headers.get("authorization", "")
+    return get_limiter(provider, key_fingerprint(auth.split(" ", 1)[-1]))
+
+
+def estimate_request_tokens(request: httpx.Request) -> int:
+    """Prompt characters / 4 plus the requested output tokens, which providers count against the budget too."""
+    try:
+        body = json.loads(request.content or b"{}")
+    except Exception:
+        return len(request.content or b"") // CHARS_PER_TOKEN
+    if not isinstance(body, dict):
+        return 0
+    prompt_chars = sum(len(str(m.get("content", ""))) for m in body.get("messages") or [] if isinstance(m, dict))
+    output = body.get("max_completion_tokens") or body.get("max_tokens") or 0
+    return prompt_chars // CHARS_PER_TOKEN + int(output)
+
+
+class _ReleasingStream(httpx.SyncByteStream):
+    """Keeps the in-flight slot until a (streamed) response body is closed."""
+
+    def __init__(self, stream: Any, limiter: KeyLimiter):
+        self._stream = stream
+        self._limiter = limiter
+        self._released = False
+
+    def __iter__(self):
+        yield from self._stream
+
+    def close(self) -> None:
+        try:
+            self._stream.close()
+        finally:
+            if not self._released:
+                self._released = True
+                self._limiter.release()
+
+
+class _AsyncReleasingStream(httpx.AsyncByteStream):
+    def __init__(self, stream: Any, limiter: KeyLimiter):
+        self._stream = stream
+        self._limiter = limiter
+        self._released = False
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self) -> None:
+        try:
+            await self._stream.aclose()
+        finally:
+            if not self._released:
+                self._released = True
+                self._limiter.release()
+
+
+class RateLimitedTransport(httpx.BaseTransport):
+    """httpx transport that rate-limits requests per provider and API key and retries 429s with backoff."""
+
+    def __init__(self, transport: httpx.BaseTransport):
+        self._transport = transport
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        limiter = _limiter_for(request)
+        request.read()  # The body is replayed on retries
+        cost = estimate_request_tokens(request)
+        attempt = 0
+        while True:
+            limiter.acquire(cost)
+            try:
+                response = self._transport.handle_request(request)
+            except BaseException:
+                limiter.release()
+                raise
+            if response.status_code != 429 or attempt >= MAX_RETRIES:
+                if response.status_code < 400:
+                    limiter.on_success(response.headers)
+                response.stream = _ReleasingStream(response.stream, limiter)
+                return response
+            delay = limiter.on_rate_limited(response.headers, attempt)
+            response.close()
+            limiter.release()
+            limiter.on_retry(delay)
+            time.sleep(delay)
+            attempt += 1
+
+    def close(self) -> None:
+        self._transport.close()
+
+
+class AsyncRateLimitedTransport(httpx.AsyncBaseTransport):
+    """Async variant of RateLimitedTransport; limits are shared with sync requests for the same key."""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport):
+        self._transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        limiter = _limiter_for(request)
+        await request.aread()
+        cost = estimate_request_tokens(request)
+        attempt = 0
+        while True:
+            await limiter.aacquire(cost)
+            try:
+                response = await self._transport.handle_async_request(request)
+            except BaseException:
+                limiter.release()
+                raise
+            if response.status_code != 429 or attempt >= MAX_RETRIES:
+                if response.status_code < 400:
+                    limiter.on_success(response.headers)
+                response.stream = _AsyncReleasingStream(response.stream, limiter)
+                return response
+            delay = limiter.on_rate_limited(response.headers, attempt)
+            await response.aclose()
+            limiter.release()
+            limiter.on_retry(delay)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def aclose(self) -> None:
+        await self._transport.aclose()
+
+
+def _error_status(error: BaseException) -> Tuple[Optional[int], Any]:
+    response = getattr(error, "response", None)
+    status = getattr(response, "status_code", None) or getattr(error, "status_code", None)
+    if status is None and "429" in str(error):
+        status = 429
+    return status, getattr(response, "headers", None)
+
+
+def _retry_delay(limiter: KeyLimiter, error: BaseException, attempt: int) -> Optional[float]:
+    # Backoff before the next attempt, or None when the error is not a retryable 429
+    status, headers = _error_status(error)
+    if status != 429 or attempt >= MAX_RETRIES:
+        return None
+    delay = limiter.on_rate_limited(headers, attempt)
+    limiter.on_retry(delay)
+    return delay
+
+
+def call_with_retry(limiter: KeyLimiter, cost: int, call: Callable[[], Any]) -> Any:
+    """Run ``call`` under ``limiter``, retrying 429s with the same backoff as the HTTP transports.
+
+    For clients whose HTTP layer cannot be wrapped (the Hugging Face endpoint).
+    """
+    attempt = 0
+    while True:
+        limiter.acquire(cost)
+        try:
+            result = call()
+        except Exception as e:
+            limiter.release()
+            delay = _retry_delay(limiter, e, attempt)
+            if delay is None:
+                raise
+            time.sleep(delay)
+            attempt += 1
+            continue
+        limiter.release()
+        limiter.on_success()
+        return result
+
+
+async def acall_with_retry(limiter: KeyLimiter, cost: int, call: Callable[[], Any]) -> Any:
+    attempt = 0
+    while True:
+        await limiter.aacquire(cost)
+        try:
+            result = await call()
+        except Exception as e:
+            limiter.release()
+            delay = _retry_delay(limiter, e, attempt)
+            if delay is None:
+                raise
+            await asyncio.sleep(delay)
+            attempt += 1
+            continue
+        limiter.release()
+        limiter.on_success()
+        return result
+
+
+def stream_with_retry(limiter: KeyLimiter, cost: int, start: Callable[[], Iterator[Any]]) -> Iterator[Any]:
+    """Stream from ``start()`` under ``limiter``; a 429 is retried only until the first chunk arrives."""
+    attempt = 0
+    while True:
+        limiter.acquire(cost)
+        chunks = start()
+        try:
+            first = next(chunks)
+        except StopIteration:
+            limiter.release()
+            limiter.on_success()
+            return
+        except Exception as e:
+            limiter.release()
+            delay = _retry_delay(limiter, e, attempt)
+            if delay is None:
+                raise
+            time.sleep(delay)
+            attempt += 1
+            continue
+        try:
+            yield first
+            yield from chunks
+        finally:
+            limiter.release()
+        limiter.on_success()
+        return
+
+
+async def astream_with_retry(limiter: KeyLimiter, cost: int, start: Callable[[], AsyncIterator[Any]]) -> AsyncIterator[Any]:
+    attempt = 0
+    while True:
+        await limiter.aacquire(cost)
+        chunks = start()
+        try:
+            first = await chunks.__anext__()
+        except StopAsyncIteration:
+            limiter.release()
+            limiter.on_success()
+            return
+        except Exception as e:
+            limiter.release()
+            delay = _retry_delay(limiter, e, attempt)
+            if delay is None:
+                raise
+            await asyncio.sleep(delay)
+            attempt += 1
+            continue
+        try:
+            yield first
+            async for chunk in chunks:
+                yield chunk
+        finally:
+            limiter.release()
+        limiter.on_success()
+        return
@@ -0,0 +1,121 @@
+import os
+import re
+import json
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+from tools.tracing import set_attribute
+
+
+# Ask OpenAI/Groq for a JSON object response (response_format=json_object); set LLM_JSON_MODE=0 to disable
+JSON_MODE = os.getenv("LLM_JSON_MODE", "1").strip().lower() not in ("0", "false", "off", "no")
+JSON_MODE_PROVIDERS = ("openai", "groq")
+# langchain-groq sends stream=false whenever response_format is bound, so streamed calls skip JSON mode there
+STREAMING_JSON_MODE_PROVIDERS = ("openai",)
+
+_THINK_RE = re.compile(r"<think>.*?(?:</think>|$)", re.S)
+_FENCE_RE = re.compile(r"```(?:json)?", re.I)
+_TRAILING_COMMA_RE = re.compile(r",(\s*[}\]])")
+_DANGLING_KEY_RE = re.compile(r'([{,])\s*"(?:[^"\\]|\\.)*"\s*:?\s*$')
+_PARTIAL_LITERAL_RE = re.compile(r"(?<=[:\[,\s])(?:t|tr|tru|f|fa|fal|fals|n|nu|nul|-|-?\d+\.)$")
+
+_stats_lock = threading.Lock()
+_stats: Dict[str, Dict[str, int]] = {}
+
+
+def with_json_mode(llm, provider: Optional[str], streamed: bool = False):
+    """Bind provider JSON mode to a chat model when the provider supports it; other models are returned as-is.
+
+    Pass ``streamed=True`` for calls whose tokens are streamed: JSON mode is then only bound where
+    it keeps streaming, and the other providers rely on repair_json/parse_json_response.
+    """
+    providers = STREAMING_JSON_MODE_PROVIDERS if streamed else JSON_MODE_PROVIDERS
+    if not JSON_MODE or (provider or "").lower() not in providers:
+        return llm
+    try:
+        return llm.bind(response_format={"type": "json_object"})
+    except Exception:
+        return llm
+
+
+def _scan(text: str) -> Tuple[Optional[int], List[str], Optional[int]]:
+    """Return (end of the first complete top-level value, open brackets, start of an unterminated string)."""
+    stack: List[str] = []
+    string_start: Optional[int] = None
+    escaped = False
+    for i, ch in enumerate(text):
+        if string_start is not None:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                string_start = None
+        elif ch == '"':
+            string_start = i
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+        elif ch in "}]" and stack:
+            stack.pop()
+            if not stack:
+                return i + 1, [], None
+    return None, stack, string_start
+
+
+def repair_json(text: str) -> Optional[Any]:
+    """Cheaply repair near-valid JSON from an LLM: reasoning blocks, code fences, surrounding prose,
+    trailing commas and truncation (cut-off strings, dangling keys and unclosed brackets).
+
+    Returns the parsed value, or None when nothing JSON-like can be recovered.
+    """
+    cleaned = _FENCE_RE.sub("", _THINK_RE.sub("", text or ""))
+    starts = [i for i in (cleaned.find("{"), cleaned.find("[")) if i != -1]
+    if not starts:
+        return None
+    body = cleaned[min(starts):]
+    end, stack, string_start = _scan(body)
+    if end is not None:
+        body = body[:end]
+    else:
+        # Truncated: drop the incomplete trailing member (a cut-off string is never kept half-written), then close brackets
+        if string_start is not None:
+            body = body[:string_start]
+        body = _PARTIAL_LITERAL_RE.sub("", body.rstrip())
+        body = _DANGLING_KEY_RE.sub(r"\1", body.rstrip()).rstrip().rstrip(",")
+        _, stack, _ = _scan(body)
+        body += "".join(reversed(stack))
+    body = _TRAILING_COMMA_RE.sub(r"\1", body)
+    try:
+        return json.loads(body)
+    except Exception:
+        return None
+
+
+def parse_json_response(text: str) -> Tuple[Any, str]:
+    """Parse an LLM JSON response; returns (data, how) with how in "direct", "repaired" or "failed"."""
+    try:
+        return json.loads(text), "direct"
+    except Exception:
+        pass
+    data = repair_json(text)
+    return (data, "repaired") if data is not None else (None, "failed")
+
+
+def record_structured_output(node: str, outcome: str, reprompts: int = 0) -> None:
+    """Count how one structured call ended: "direct", "repaired" or "fallback" (``reprompts`` extra calls were needed)."""
+    set_attribute("structured_output", outcome)
+    if reprompts:
+        set_attribute("fallback_reprompts", reprompts)
+    with _stats_lock:
+        node_stats = _stats.setdefault(node, {"direct": 0, "repaired": 0, "fallback": 0, "reprompts": 0})
+        node_stats[outcome] += 1
+        node_stats["reprompts"] += reprompts
+
+
+def get_structured_output_stats() -> Dict[str, Dict[str, Any]]:
+    """Per-node outcome counters with the share of calls that still needed a fallback re-prompt."""
+    with _stats_lock:
+        report: Dict[str, Dict[str, Any]] = {}
+        for node, counts in _stats.items():
+            calls = counts["direct"] + counts["repaired"] + counts["fallback"]
+            report[node] = {**counts, "fallback_rate": counts["fallback"] / calls if calls else 0.0}
+        return report
@@ -0,0 +1,151 @@
+import os
+import re
+from functools import lru_cache
+from typing import Any, Dict, Optional
+from llm.llm_config import DEFAULT_MAX_TOKENS, resolve_model, resolve_provider
+
+try:
+    import tiktoken
+except ImportError:  # Optional: fall back to the estimator below
+    tiktoken = None
+
+
+# Context windows (tokens) of the models get_llm resolves; LLM_CONTEXT_WINDOW overrides for any model
+CONTEXT_WINDOWS = {
+    "gpt-4o-mini": 128000,
+    "gpt-4o": 128000,
+    "gpt-4.1-mini": 1047576,
+    "qwen/qwen3-32b": 131072,
+    "Qwen/Qwen3-8B": 32768,
+    "llama-3.1-8b-instant": 131072,
+    "llama-3.3-70b-versatile": 131072,
+}
+DEFAULT_CONTEXT_WINDOW = 8192
+# Fraction of the window kept free to absorb tokenizer mismatch and chat-format overhead
+SAFETY_MARGIN = float(os.getenv("PROMPT_SAFETY_MARGIN", 0.05))
+# Default ceiling on prompt tokens per provider, below the context window so one prompt plus its output
+# fits the provider's tokens-per-minute limit (Groq's free tier allows ~6000 TPM); 0 = window only
+PROVIDER_INPUT_CAPS = {"groq": 4000, "huggingface": 16000, "openai": 0}
+# Overrides the per-provider ceiling for every provider when set; 0 = window only
+MAX_INPUT_TOKENS = os.getenv("LLM_MAX_INPUT_TOKENS")
+
+_TOKEN_RE = re.compile(r"[A-Za-z]+|\d|[^\sA-Za-z\d]")
+
+
+def get_input_cap(provider: str) -> int:
+    """Ceiling on prompt tokens for ``provider`` (LLM_MAX_INPUT_TOKENS, else PROVIDER_INPUT_CAPS); 0 means none."""
+    if MAX_INPUT_TOKENS not in (None, ""):
+        return int(MAX_INPUT_TOKENS)
+    return PROVIDER_INPUT_CAPS.get(provider, 0)
+
+
+def get_context_window(model: str) -> int:
+    override = os.getenv("LLM_CONTEXT_WINDOW")
+    if override:
+        return int(override)
+    if model in CONTEXT_WINDOWS:
+        return CONTEXT_WINDOWS[model]
+    lowered = {name.lower(): size for name, size in CONTEXT_WINDOWS.items()}
+    return lowered.get(model.lower(), DEFAULT_CONTEXT_WINDOW)
+
+
+@lru_cache(maxsize=8)
+def _encoding_for(model: str):
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except Exception:
+        pass
+    try:
+        # Close enough for Qwen/Llama BPE vocabularies, and far better than a character ratio
+        return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        return None
+
+
+def estimate_tokens(text: str) -> int:
+    """Tokenizer-free estimate: one token per number digit or symbol, and one per ~6 letters of each word."""
+    total = 0
+    for match in _TOKEN_RE.finditer(text):
+        size = match.end() - match.start()
+        total += 1 + (size - 1) // 6 if size > 1 else 1
+    return total
+
+
+def _count(text: str, model: Optional[str]) -> int:
+    if not text:
+        return 0
+    encoding = _encoding_for(model or "")
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return estimate_tokens(text)
+
+
+@lru_cache(maxsize=16)
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    """Count tokens with tiktoken when installed, otherwise estimate them.
+
+    Results are memoized, so re-measuring the same transcript in later nodes is free.
+    """
+    return _count(text, model)
+
+
+class PromptBudget:
+    """Input-token budget for one prompt: context window minus output reservation, template and safety margin,
+    capped by the provider's input ceiling (see get_input_cap)."""
+
+    def __init__(self, provider: Optional[str] = None, model: Optional[str] = None, max_tokens: Optional[int] = None, template: str = ""):
+        self.provider = resolve_provider(provider)
+        self.model = resolve_model(self.provider, model)
+        self.context_window = get_context_window(self.model)
+        self.max_tokens = DEFAULT_MAX_TOKENS if max_tokens is None else int(max_tokens)
+        self.template_tokens = count_tokens(template, self.model)
+        available = int(self.context_window * (1 - SAFETY_MARGIN)) - self.max_tokens - self.template_tokens
+        input_cap = get_input_cap(self.provider)
+        if input_cap:
+            available = min(available, input_cap - self.template_tokens)
+        self.input_tokens = max(256, available)
+        self.transcript_tokens = 0
+        self.source_tokens = 0
+        self.used_tokens = 0
+
+    def chars_for(self, text: str, tokens: Optional[int] = None) -> int:
+        """Characters of ``text`` that fit the budget, using the text's own characters-per-token ratio."""
+        tokens = count_tokens(text, self.model) if tokens is None else tokens
+        if tokens <= self.input_tokens:
+            return len(text)
+        return int(len(text) * self.input_tokens / tokens)
+
+    def fits(self, text: str) -> bool:
+        """Whether the full transcript fits the budget as-is (its token count is recorded for the report)."""
+        self.transcript_tokens = count_tokens(text, self.model)
+        return self.transcript_tokens <= self.input_tokens
+
+    def fit(self, text: str) -> str:
+        """Return ``text`` trimmed at a word boundary so it fits the budget, recording the token counts."""
+        tokens = count_tokens(text, self.model)
+        self.source_tokens = tokens
+        cut = len(text)
+        while tokens > self.input_tokens and cut > 0:
+            cut = int(cut * self.input_tokens / tokens * 0.98)
+            space = text.rfind(" ", 0, cut)
+            if space > cut * 0.9:
+                cut = space
+            tokens = _count(text[:cut], self.model)
+        self.used_tokens = tokens
+        return text if cut == len(text) else text[:cut]
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "provider": self.provider,
+            "model": self.model,
+            "context_window": self.context_window,
+            "max_output_tokens": self.max_tokens,
+            "template_tokens": self.template_tokens,
+            "input_budget_tokens": self.input_tokens,
+            "transcript_tokens": self.transcript_tokens,
+            "source_tokens": self.source_tokens,
+            "prompt_tokens": self.template_tokens + self.used_tokens,
+            "truncated": self.used_tokens < self.source_tokens,
+        }
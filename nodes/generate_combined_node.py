@@ -0,0 +1,217 @@
+import asyncio
+import random
+from typing import Any, Dict, List, Optional, Tuple
+from llm.llm_config import get_llm, resolve_provider
+from llm.structured_output import record_structured_output, with_json_mode
+from llm.token_budget import PromptBudget
+from state.app_state import YouTubeVideoState
+from tools.question_bank import QUESTION_BANK_BATCH, bank_needs_refill
+from nodes.quiz_stream_parser import StreamingQuizParser
+from nodes.generate_summary_node import (
+    SUMMARY_STREAM_TAG,
+    _key_points_fallback_prompt,
+    _parse_bullets,
+    _parse_summary,
+    _summary_fallback_prompt,
+    agenerate_summary_node,
+    generate_summary_node,
+)
+from nodes.generate_quiz_node import (
+    QUIZ_SIZE,
+    _banked_quiz,
+    _bank_video_id,
+    _emit_questions,
+    _json_quiz_prompt,
+    _line_quiz_prompt,
+    _question_writer,
+    _response_text,
+    _stream_json_quiz,
+    _astream_json_quiz,
+    agenerate_quiz_node,
+    generate_quiz_node,
+    parse_line_quiz,
+)
+
+
+# Output reservation for the combined document (summary, key points and a bank-sized question batch)
+COMBINED_MAX_TOKENS = 6144
+# A section is accepted with at least this many key points
+MIN_KEY_POINTS = 3
+# State fields this node's output depends on (see graph/memo.py)
+COMBINED_INPUTS = ("video_url", "video_transcript", "llm_provider")
+
+
+def _combined_prompt(transcript: str, variation_token: str, count: int) -> str:
+    return f"""
+You are a precise summarizer and quiz writer. From the YouTube video transcript below, return ONLY valid JSON, no extra text, with this schema:
+{{
+  "summary": "3-7 crisp sentences that explain the video clearly in plain language",
+  "key_points": ["5-7 short bullets, each one sentence and highly informative"],
+  "questions": [
+    {{
+      "question": "string",
+      "options": ["string","string","string","string"],
+      "answer_index": 0-3
+    }}
+  ]
+}}
+
+Rules:
+- Write "summary" first, then "key_points", then "questions".
+- Use only information present in the transcript; no marketing tone, opinions or repetition.
+- {count} questions total, each with 4 options, exactly one correct; no trick questions, no "All of the above".
+- Vary question phrasing across runs via VARIATION_TOKEN.
+
+VARIATION_TOKEN: {variation_token}
+
+Transcript:
+{transcript}
+"""
+
+
+def _get_combined_llm(state: YouTubeVideoState):
+    provider = state.get("llm_provider") or "groq"
+    api_key = state.get("api_key") or state.get("groq_api_key")
+    # The questions must differ between runs, so the combined call bypasses the response cache
+    return get_llm(temperature=0.4, max_tokens=COMBINED_MAX_TOKENS, api_key=api_key, provider=provider, cache=False)
+
+
+def _combined_budget(state: YouTubeVideoState, count: int) -> PromptBudget:
+    return PromptBudget(state.get("llm_provider") or "groq", max_tokens=COMBINED_MAX_TOKENS, template=_combined_prompt("", "0", count))
+
+
+def _use_separate_nodes(state: YouTubeVideoState, video_id: Optional[str], budget: PromptBudget) -> bool:
+    """Fall back to the separate nodes when there is nothing to gain from one call.
+
+    That is the case when the bank can serve the quiz without the LLM, or when the transcript
+    needs map-reduce summarization because it does not fit one prompt.
+    """
+    if video_id and not bank_needs_refill(video_id, QUIZ_SIZE):
+        return True
+    return not budget.fits(state["video_transcript"])
+
+
+def _merge_separate(summary_result: Dict[str, Any], quiz_result: Dict[str, Any]) -> Dict[str, Any]:
+    merged = {**quiz_result, **summary_result}
+    merged["token_usage"] = {**quiz_result.get("token_usage", {}), **summary_result.get("token_usage", {})}
+    if summary_result.get("error") or quiz_result.get("error"):
+        merged["error"] = summary_result.get("error") or quiz_result.get("error")
+    return merged
+
+
+def _validate_sections(text: str, parser: StreamingQuizParser) -> Tuple[str, List[str], List[Dict[str, Any]], str]:
+    """Check each section on its own; a failed section comes back empty so only it is re-requested."""
+    summary_text, key_points_list, how = _parse_summary(text)
+    if len(key_points_list) < MIN_KEY_POINTS:
+        key_points_list = []
+    return summary_text, key_points_list, parser.finish(), how
+
+
+def _quiz_complete(questions: List[Dict[str, Any]], count: int) -> bool:
+    # Too few to serve a quiz: keep what parsed (it goes into the bank) and ask for the section again
+    return len(questions) >= min(count, QUIZ_SIZE)
+
+
+def _result(summary_text: str, key_points_list: List[str], video_id: Optional[str], questions: List[Dict[str, Any]], budget: PromptBudget) -> Dict[str, Any]:
+    result = _banked_quiz(video_id, questions, budget)
+    result.update({
+        "summary": summary_text.strip(),
+        "key_points": key_points_list[:7],
+        "token_usage": {"generate_content": budget.report()},
+    })
+    return result
+
+
+def generate_combined_node(state: YouTubeVideoState) -> Dict[str, Any]:
+    """Generate summary, key points and quiz questions with a single LLM call.
+
+    Each section of the JSON document is validated independently; only the sections that are
+    missing or malformed are requested again, using the separate nodes' fallback prompts.
+    """
+    try:
+        video_id = _bank_video_id(state)
+        count = QUESTION_BANK_BATCH if video_id else QUIZ_SIZE
+        budget = _combined_budget(state, count)
+        if _use_separate_nodes(state, video_id, budget):
+            return _merge_separate(generate_summary_node(state), generate_quiz_node(state))
+
+        llm = _get_combined_llm(state)
+        json_llm = with_json_mode(llm, resolve_provider(state.get("llm_provider") or "groq"), streamed=True)
+        transcript = budget.fit(state["video_transcript"])
+        variation_token = str(random.randint(1, 10**9))
+
+        # Stream so the summary card and quiz preview update while the document is generated
+        parser = StreamingQuizParser()
+        writer = _question_writer()
+        parts: List[str] = []
+        for chunk in json_llm.stream(_combined_prompt(transcript, variation_token, count), config={"tags": [SUMMARY_STREAM_TAG]}):
+            text = _response_text(chunk)
+            parts.append(text)
+            _emit_questions(writer, parser, parser.feed(text))
+        summary_text, key_points_list, questions, how = _validate_sections("".join(parts), parser)
+
+        reprompts = 0
+        if not summary_text:
+            summary_text = _response_text(llm.invoke(_summary_fallback_prompt(transcript)))
+            reprompts += 1
+        if not key_points_list:
+            key_points_list = _parse_bullets(_response_text(llm.invoke(_key_points_fallback_prompt(transcript))))
+            reprompts += 1
+        if not _quiz_complete(questions, count):
+            questions += _stream_json_quiz(json_llm, _json_quiz_prompt(transcript, variation_token, count))[0]
+            reprompts += 1
+            if not questions:
+                questions = parse_line_quiz(_response_text(llm.invoke(_line_quiz_prompt(transcript, variation_token, count))))
+                reprompts += 1
+        record_structured_output("generate_content", "fallback" if reprompts else how, reprompts)
+
+        return _result(summary_text, key_points_list, video_id, questions, budget)
+    except Exception as e:
+        return {"error": f"Error generating content: {str(e)}"}
+
+
+async def agenerate_combined_node(state: YouTubeVideoState) -> Dict[str, Any]:
+    """Async variant of generate_combined_node; re-requests for failed sections run concurrently."""
+    try:
+        video_id = _bank_video_id(state)
+        count = QUESTION_BANK_BATCH if video_id else QUIZ_SIZE
+        budget = _combined_budget(state, count)
+        if _use_separate_nodes(state, video_id, budget):
+            summary_result, quiz_result = await asyncio.gather(agenerate_summary_node(state), agenerate_quiz_node(state))
+            return _merge_separate(summary_result, quiz_result)
+
+        llm = _get_combined_llm(state)
+        json_llm = with_json_mode(llm, resolve_provider(state.get("llm_provider") or "groq"), streamed=True)
+        transcript = budget.fit(state["video_transcript"])
+        variation_token = str(random.randint(1, 10**9))
+
+        parser = StreamingQuizParser()
+        writer = _question_writer()
+        parts: List[str] = []
+        async for chunk in json_llm.astream(_combined_prompt(transcript, variation_token, count), config={"tags": [SUMMARY_STREAM_TAG]}):
+            text = _response_text(chunk)
+            parts.append(text)
+            _emit_questions(writer, parser, parser.feed(text))
+        summary_text, key_points_list, questions, how = _validate_sections("".join(parts), parser)
+
+        summary_retry = llm.ainvoke(_summary_fallback_prompt(transcript)) if not summary_text else None
+        kp_retry = llm.ainvoke(_key_points_fallback_prompt(transcript)) if not key_points_list else None
+        quiz_retry = _astream_json_quiz(json_llm, _json_quiz_prompt(transcript, variation_token, count)) if not _quiz_complete(questions, count) else None
+        pending = [c for c in (summary_retry, kp_retry, quiz_retry) if c is not None]
+        reprompts = len(pending)
+        if pending:
+            retried = iter(await asyncio.gather(*pending))
+            if summary_retry is not None:
+                summary_text = _response_text(next(retried))
+            if kp_retry is not None:
+                key_points_list = _parse_bullets(_response_text(next(retried)))
+            if quiz_retry is not None:
+                questions += next(retried)[0]
+                if not questions:
+                    questions = parse_line_quiz(_response_text(await llm.ainvoke(_line_quiz_prompt(transcript, variation_token, count))))
+                    reprompts += 1
+        record_structured_output("generate_content", "fallback" if reprompts else how, reprompts)
+
+        return _result(summary_text, key_points_list, video_id, questions, budget)
+    except Exception as e:
+        return {"error": f"Error generating content: {str(e)}"}
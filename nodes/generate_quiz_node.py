@@ -1,9 +1,30 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Tuple
 import random
 import re
 import json
-from llm.llm_config import get_llm
+from llm.llm_config import get_llm, resolve_provider
+from llm.structured_output import record_structured_output, with_json_mode
+from llm.token_budget import PromptBudget
 from state.app_state import YouTubeVideoState
+from tools.youtube_tool import extract_video_id
+from tools.question_bank import QUESTION_BANK_BATCH, add_to_bank, bank_needs_refill, serve_from_bank
+from tools.transcript_index import select_transcript_passages
+from nodes.quiz_stream_parser import StreamingQuizParser, normalize_quiz_item, parse_quiz_stream
+
+try:
+    from langgraph.config import get_stream_writer
+except ImportError:  # Older langgraph without custom stream mode
+    get_stream_writer = None
+
+
+# Questions per quiz served to the user
+QUIZ_SIZE = 10
+# Output reservation for quiz calls; bank refills ask for a larger batch
+QUIZ_MAX_TOKENS = 4096
+# Key of the custom stream events emitted for each question as soon as it is parsed
+QUIZ_STREAM_KEY = "quiz_question"
+# State fields this node's output depends on (see graph/memo.py); transcript_segments follow video_transcript
+QUIZ_INPUTS = ("video_url", "video_transcript", "llm_provider")
 
 
 def _extract_answer_index(answer_text: str) -> int:
@@ -17,24 +38,46 @@ def _extract_answer_index(answer_text: str) -> int:
     return {"A": 0, "B": 1, "C": 2, "D": 3}.get(letter, -1)
 
 
-def generate_quiz_node(state: YouTubeVideoState) -> Dict[str, Any]:
-    """Generate a dynamic MCQ quiz from video transcript with robust parsing and correct answer tagging.
+def _response_text(resp: Any) -> str:
+    return resp.content if hasattr(resp, 'content') else str(resp)
 
-    Strategy:
-    1) Ask for strict JSON first for reliability.
-    2) If JSON fails or yields no items, fall back to line-based parser.
-    """
+
+def _get_quiz_llm(state: YouTubeVideoState):
+    provider = state.get("llm_provider") or "groq"
+    api_key = state.get("api_key") or state.get("groq_api_key")
+    # Each run must produce a fresh quiz, so bypass the response cache; bank refills need room for a larger batch
+    return get_llm(temperature=0.4, max_tokens=QUIZ_MAX_TOKENS, api_key=api_key, provider=provider, cache=False)
+
+
+def _json_llm(llm, state: YouTubeVideoState):
+    """The same model with provider JSON mode, for the structured quiz call (streamed)."""
+    return with_json_mode(llm, resolve_provider(state.get("llm_provider") or "groq"), streamed=True)
+
+
+def _bank_video_id(state: YouTubeVideoState) -> Optional[str]:
     try:
-        # Lower temperature for more deterministic structure; include variation token to diversify across runs
-        variation_token = str(random.randint(1, 10**9))
-        provider = state.get("llm_provider") or "groq"
-        api_key = state.get("api_key") or state.get("groq_api_key")
-        llm = get_llm(temperature=0.4, api_key=api_key, provider=provider)
+        return extract_video_id(state.get("video_url") or "")
+    except Exception:
+        return None
+
 
-        transcript = state['video_transcript'][:12000]
+def _quiz_budget(state: YouTubeVideoState, count: int) -> PromptBudget:
+    return PromptBudget(state.get("llm_provider") or "groq", max_tokens=QUIZ_MAX_TOKENS, template=_json_quiz_prompt("", "0", count))
 
-        # 1) JSON-first prompt
-        json_prompt = f"""
+
+def _quiz_material(state: YouTubeVideoState, budget: PromptBudget) -> str:
+    """Transcript text for the quiz prompt, drawn from the whole video when it exceeds the token budget."""
+    transcript = state['video_transcript']
+    if not budget.fits(transcript):
+        segments = state.get('transcript_segments')
+        if segments is not None:
+            segments = segments.bind(transcript)  # None for stale segments from another video; skip timestamps
+        transcript = select_transcript_passages(transcript, budget.chars_for(transcript, budget.transcript_tokens), segments)
+    return budget.fit(transcript)
+
+
+def _json_quiz_prompt(transcript: str, variation_token: str, count: int = QUIZ_SIZE) -> str:
+    return f"""
 You are generating a quiz STRICTLY from the transcript. Return ONLY JSON, no extra text.
 
 Schema:
@@ -49,7 +92,7 @@ Schema:
 }}
 
 Rules:
-- 10 questions total, each with 4 options, exactly one correct.
+- {count} questions total, each with 4 options, exactly one correct.
 - No trick questions, no "All of the above".
 - Use only transcript facts; be unambiguous.
 - Vary phrasing across runs via VARIATION_TOKEN.
@@ -60,58 +103,11 @@ Transcript:
 {transcript}
 """
 
-        json_resp = llm.invoke(json_prompt)
-        json_text = json_resp.content if hasattr(json_resp, 'content') else str(json_resp)
-
-        def try_parse_json(text: str) -> List[Dict[str, Any]]:
-            try:
-                data = json.loads(text)
-            except Exception:
-                # Attempt to extract first {...} or [...] block
-                m = re.search(r"(\{[\s\S]*\}|\[[\s\S]*\])", text)
-                if not m:
-                    return []
-                try:
-                    data = json.loads(m.group(1))
-                except Exception:
-                    return []
-            if isinstance(data, list):
-                items = data
-            elif isinstance(data, dict):
-                items = data.get('questions') or data.get('quiz') or []
-            else:
-                return []
-            normalized: List[Dict[str, Any]] = []
-            for item in items:
-                if not isinstance(item, dict):
-                    continue
-                q_text = str(item.get('question', '')).strip()
-                opts = item.get('options', [])
-                ans_idx = item.get('answer_index')
-                if not q_text or not isinstance(opts, list) or len(opts) != 4:
-                    continue
-                try:
-                    ans_idx = int(ans_idx)
-                except Exception:
-                    continue
-                if not (0 <= ans_idx < 4):
-                    continue
-                normalized.append({
-                    'question': q_text,
-                    'options': [str(o).strip() for o in opts][:4],
-                    'correct_index': ans_idx,
-                    'correct_text': str(opts[ans_idx]).strip(),
-                })
-            return normalized
-
-        normalized_questions: List[Dict[str, Any]] = try_parse_json(json_text)
-
-        # 2) Fallback to line-based parsing if JSON yielded nothing
-        if not normalized_questions:
-            # Generate quiz questions in line format
-            quiz_prompt = f"""Create 10 concept-check multiple-choice questions (MCQs) strictly from this transcript. Vary phrasing across different VARIATION_TOKENs.
 
-Transcript (truncate if needed):
+def _line_quiz_prompt(transcript: str, variation_token: str, count: int = QUIZ_SIZE) -> str:
+    return f"""Create {count} concept-check multiple-choice questions (MCQs) strictly from this transcript. Vary phrasing across different VARIATION_TOKENs.
+
+Transcript (passages may be excerpts from across the video):
 {transcript}
 
 Format each item exactly as:
@@ -130,73 +126,235 @@ Rules:
 VARIATION_TOKEN: {variation_token}
 """
 
-            quiz_response = llm.invoke(quiz_prompt)
-            quiz_content = quiz_response.content if hasattr(quiz_response, 'content') else str(quiz_response)
-
-            # Parse quiz questions (line-based)
-            questions: List[Dict[str, Any]] = []
-            current_question: Dict[str, Any] = {}
-
-            for raw_line in quiz_content.split('\n'):
-                line = raw_line.strip()
-                if not line:
-                    continue
-                if line.startswith('Question') or re.match(r'^(Q\d+|\d+[\).:])', line):
-                    if current_question:
-                        questions.append(current_question)
-                    q_text = line.split(':', 1)[1].strip() if ':' in line else re.sub(r'^(Q\d+|\d+[\).:])\s*', '', line)
-                    current_question = {
-                        'question': q_text,
-                        'options': [],
-                        'answer': ''
-                    }
-                elif re.match(r'^[ABCD][\).]', line):
-                    option_text = re.split(r'[\).]', line, 1)[1].strip()
-                    if 'options' in current_question:
-                        current_question['options'].append(option_text)
-                elif line.lower().startswith('answer'):
-                    current_question['answer'] = line.split(':', 1)[1].strip() if ':' in line else ''
-
-            # Add the last question
+
+def try_parse_json(text: str) -> List[Dict[str, Any]]:
+    """Parse a complete JSON quiz response into normalized question dicts; returns [] when nothing usable.
+
+    Responses that are not valid JSON as a whole (extra prose, truncation) go through the
+    incremental parser, which keeps every complete question object.
+    """
+    try:
+        data = json.loads(text)
+    except Exception:
+        return parse_quiz_stream(text)
+    if isinstance(data, list):
+        items = data
+    elif isinstance(data, dict):
+        items = data.get('questions') or data.get('quiz') or []
+    else:
+        return []
+    return [q for q in (normalize_quiz_item(item) for item in items) if q is not None]
+
+
+def parse_line_quiz(quiz_content: str) -> List[Dict[str, Any]]:
+    """Parse the line-based fallback format into normalized questions with shuffled options."""
+    # Parse quiz questions (line-based)
+    questions: List[Dict[str, Any]] = []
+    current_question: Dict[str, Any] = {}
+
+    for raw_line in quiz_content.split('\n'):
+        line = raw_line.strip()
+        if not line:
+            continue
+        if line.startswith('Question') or re.match(r'^(Q\d+|\d+[\).:])', line):
             if current_question:
                 questions.append(current_question)
+            q_text = line.split(':', 1)[1].strip() if ':' in line else re.sub(r'^(Q\d+|\d+[\).:])\s*', '', line)
+            current_question = {
+                'question': q_text,
+                'options': [],
+                'answer': ''
+            }
+        elif re.match(r'^[ABCD][\).]', line):
+            option_text = re.split(r'[\).]', line, 1)[1].strip()
+            if 'options' in current_question:
+                current_question['options'].append(option_text)
+        elif line.lower().startswith('answer'):
+            current_question['answer'] = line.split(':', 1)[1].strip() if ':' in line else ''
+
+    # Add the last question
+    if current_question:
+        questions.append(current_question)
+
+    # Normalize, compute correct indices, and optionally shuffle options per question
+    normalized_questions: List[Dict[str, Any]] = []
+    for q in questions:
+        options = q.get('options', [])
+        if not isinstance(options, list) or len(options) < 4:
+            continue
+        options = options[:4]
+        answer_index = _extract_answer_index(q.get('answer', ''))
+        if answer_index == -1 and q.get('answer') in options:
+            answer_index = options.index(q['answer'])
+        if answer_index < 0 or answer_index >= len(options):
+            # If parsing failed, try to recover by choosing the most likely option via heuristics
+            # Here we skip to avoid false positives instead of marking incorrect items as correct
+            continue
+        indexed_options = list(enumerate(options))
+        random.shuffle(indexed_options)
+        new_options = [text for _, text in indexed_options]
+        new_correct_index = next(i for i, (old_idx, _) in enumerate(indexed_options) if old_idx == answer_index)
+        normalized_questions.append({
+            'question': q.get('question', 'Question').strip(),
+            'options': new_options,
+            'correct_index': new_correct_index,
+            'correct_text': new_options[new_correct_index],
+        })
+    return normalized_questions
+
+
+def _quiz_result(normalized_questions: List[Dict[str, Any]], budget: Optional[PromptBudget] = None) -> Dict[str, Any]:
+    # If more than 10 questions parsed, sample 10
+    if len(normalized_questions) > QUIZ_SIZE:
+        normalized_questions = random.sample(normalized_questions, QUIZ_SIZE)
+
+    # Filter out any malformed items to avoid always-correct behavior
+    normalized_questions = [q for q in normalized_questions if isinstance(q.get('correct_index'), int) and 0 <= q['correct_index'] < len(q.get('options', []))]
+
+    result = {
+        "quiz_questions": normalized_questions,
+        "current_question_index": 0,
+        "user_answers": {},
+        "quiz_score": 0
+    }
+    if budget is not None:
+        result["token_usage"] = {"generate_quiz": budget.report()}
+    return result
+
+
+def _banked_quiz(video_id: Optional[str], generated: List[Dict[str, Any]], budget: PromptBudget, mark_served: bool = True) -> Dict[str, Any]:
+    """Merge a freshly generated batch into the video's question bank and serve a quiz from it.
+
+    The quiz leads with the new batch in generation order, so it matches the questions previewed
+    while they streamed; older bank questions only top it up.
+    """
+    if video_id:
+        if generated:
+            add_to_bank(video_id, generated)
+        quiz = serve_from_bank(video_id, QUIZ_SIZE, first=generated, mark_served=mark_served)
+        if quiz:
+            return _quiz_result(quiz, budget)
+    return _quiz_result(generated, budget)
+
+
+def _question_writer():
+    """LangGraph's custom stream writer inside a graph run; None when the node is called directly."""
+    if get_stream_writer is None:
+        return None
+    try:
+        return get_stream_writer()
+    except Exception:
+        return None
+
+
+def _emit_questions(writer, parser: StreamingQuizParser, completed: List[Dict[str, Any]]) -> None:
+    if writer is None:
+        return
+    first = len(parser.questions) - len(completed)
+    for offset, question in enumerate(completed):
+        writer({QUIZ_STREAM_KEY: question, "index": first + offset})
+
+
+def _json_outcome(text: str, questions: List[Dict[str, Any]]) -> str:
+    """"direct" for a valid JSON document, "repaired" when questions were only recovered by the parser's repairs."""
+    if not questions:
+        return "failed"
+    try:
+        json.loads(text)
+        return "direct"
+    except Exception:
+        return "repaired"
+
+
+def _stream_json_quiz(llm, prompt: str) -> Tuple[List[Dict[str, Any]], str]:
+    """Stream the JSON quiz response, emitting each question as soon as its object is complete.
+
+    Returns the questions and how the response parsed (see _json_outcome).
+    """
+    parser = StreamingQuizParser()
+    writer = _question_writer()
+    parts: List[str] = []
+    for chunk in llm.stream(prompt):
+        text = _response_text(chunk)
+        parts.append(text)
+        _emit_questions(writer, parser, parser.feed(text))
+    questions = parser.finish()
+    return questions, _json_outcome("".join(parts), questions)
+
+
+async def _astream_json_quiz(llm, prompt: str) -> Tuple[List[Dict[str, Any]], str]:
+    parser = StreamingQuizParser()
+    writer = _question_writer()
+    parts: List[str] = []
+    async for chunk in llm.astream(prompt):
+        text = _response_text(chunk)
+        parts.append(text)
+        _emit_questions(writer, parser, parser.feed(text))
+    questions = parser.finish()
+    return questions, _json_outcome("".join(parts), questions)
+
+
+def generate_quiz_node(state: YouTubeVideoState, mark_served: bool = True) -> Dict[str, Any]:
+    """Generate a dynamic MCQ quiz from video transcript with robust parsing and correct answer tagging.
+
+    Quizzes are sampled from a per-video question bank; the LLM is only called when the bank
+    runs low, and then asked for a larger batch. Prefetched quizzes pass ``mark_served=False``
+    and are recorded as served only when shown (see quiz_prefetch).
+
+    Strategy:
+    1) Ask for strict JSON first for reliability, parsing questions incrementally as they stream in.
+    2) If JSON fails or yields no items, fall back to line-based parser.
+    """
+    try:
+        video_id = _bank_video_id(state)
+        if video_id and not bank_needs_refill(video_id, QUIZ_SIZE):
+            return _quiz_result(serve_from_bank(video_id, QUIZ_SIZE, mark_served=mark_served))
+        count = QUESTION_BANK_BATCH if video_id else QUIZ_SIZE
+
+        # Lower temperature for more deterministic structure; include variation token to diversify across runs
+        variation_token = str(random.randint(1, 10**9))
+        llm = _get_quiz_llm(state)
+
+        budget = _quiz_budget(state, count)
+        transcript = _quiz_material(state, budget)
+
+        # 1) JSON-first prompt; complete questions survive even if the response is cut off
+        normalized_questions, how = _stream_json_quiz(_json_llm(llm, state), _json_quiz_prompt(transcript, variation_token, count))
+
+        # 2) Fallback to line-based parsing if JSON yielded nothing even after repair
+        if not normalized_questions:
+            quiz_response = llm.invoke(_line_quiz_prompt(transcript, variation_token, count))
+            normalized_questions = parse_line_quiz(_response_text(quiz_response))
+            how = "fallback"
+        record_structured_output("generate_quiz", how, 1 if how == "fallback" else 0)
+
+        return _banked_quiz(video_id, normalized_questions, budget, mark_served)
+    except Exception as e:
+        return {"error": f"Error generating quiz: {str(e)}"}
+
+
+async def agenerate_quiz_node(state: YouTubeVideoState) -> Dict[str, Any]:
+    """Async variant of generate_quiz_node built on astream/ainvoke."""
+    try:
+        video_id = _bank_video_id(state)
+        if video_id and not bank_needs_refill(video_id, QUIZ_SIZE):
+            return _quiz_result(serve_from_bank(video_id, QUIZ_SIZE))
+        count = QUESTION_BANK_BATCH if video_id else QUIZ_SIZE
+
+        variation_token = str(random.randint(1, 10**9))
+        llm = _get_quiz_llm(state)
+
+        budget = _quiz_budget(state, count)
+        transcript = _quiz_material(state, budget)
+
+        normalized_questions, how = await _astream_json_quiz(_json_llm(llm, state), _json_quiz_prompt(transcript, variation_token, count))
+
+        if not normalized_questions:
+            quiz_response = await llm.ainvoke(_line_quiz_prompt(transcript, variation_token, count))
+            normalized_questions = parse_line_quiz(_response_text(quiz_response))
+            how = "fallback"
+        record_structured_output("generate_quiz", how, 1 if how == "fallback" else 0)
 
-            # Normalize, compute correct indices, and optionally shuffle options per question
-            for q in questions:
-                options = q.get('options', [])
-                if not isinstance(options, list) or len(options) < 4:
-                    continue
-                options = options[:4]
-                answer_index = _extract_answer_index(q.get('answer', ''))
-                if answer_index == -1 and q.get('answer') in options:
-                    answer_index = options.index(q['answer'])
-                if answer_index < 0 or answer_index >= len(options):
-                    # If parsing failed, try to recover by choosing the most likely option via heuristics
-                    # Here we skip to avoid false positives instead of marking incorrect items as correct
-                    continue
-                indexed_options = list(enumerate(options))
-                random.shuffle(indexed_options)
-                new_options = [text for _, text in indexed_options]
-                new_correct_index = next(i for i, (old_idx, _) in enumerate(indexed_options) if old_idx == answer_index)
-                normalized_questions.append({
-                    'question': q.get('question', 'Question').strip(),
-                    'options': new_options,
-                    'correct_index': new_correct_index,
-                    'correct_text': new_options[new_correct_index],
-                })
-
-        # If more than 10 questions parsed, sample 10
-        if len(normalized_questions) > 10:
-            normalized_questions = random.sample(normalized_questions, 10)
-
-        # Filter out any malformed items to avoid always-correct behavior
-        normalized_questions = [q for q in normalized_questions if isinstance(q.get('correct_index'), int) and 0 <= q['correct_index'] < len(q.get('options', []))]
-
-        return {
-            "quiz_questions": normalized_questions,
-            "current_question_index": 0,
-            "user_answers": {},
-            "quiz_score": 0
-        }
+        return _banked_quiz(video_id, normalized_questions, budget)
     except Exception as e:
-        return {"error": f"Error generating quiz: {str(e)}"}
\ No newline at end of file
+        return {"error": f"Error generating quiz: {str(e)}"}
@@ -1,21 +1,41 @@
 from typing import Dict, Any, List
-from tools.search_tool import search_related_resources
+from tools.search_tool import search_related_resources, asearch_related_resources
 from state.app_state import YouTubeVideoState
 
 
+# State fields this node's output depends on (see graph/memo.py); searches do not depend on the LLM provider
+RESOURCES_INPUTS = ("video_title", "video_transcript")
+
+
+def _search_topic(state: YouTubeVideoState) -> str:
+    # Use video title as the search topic
+    topic = state.get("video_title", "")
+    if not topic:
+        topic = state.get("video_transcript", "")[:100]  # Use first 100 characters of transcript if title is not available
+    return topic
+
+
 def generate_resources_node(state: YouTubeVideoState) -> Dict[str, Any]:
     """Generate related resources based on video content."""
     try:
-        # Use video title as the search topic
-        topic = state.get("video_title", "")
-        if not topic:
-            topic = state.get("video_transcript", "")[:100]  # Use first 100 characters of transcript if title is not available
-        
         # Search for related resources
-        resources = search_related_resources(topic)
+        resources, timings = search_related_resources(_search_topic(state), return_timings=True)
         
         return {
-            "related_resources": resources
+            "related_resources": resources,
+            "search_timings": timings,
+        }
+    except Exception as e:
+        return {"error": f"Error generating resources: {str(e)}"}
+
+
+async def agenerate_resources_node(state: YouTubeVideoState) -> Dict[str, Any]:
+    """Async variant of generate_resources_node."""
+    try:
+        resources, timings = await asearch_related_resources(_search_topic(state), return_timings=True)
+        return {
+            "related_resources": resources,
+            "search_timings": timings,
         }
     except Exception as e:
         return {"error": f"Error generating resources: {str(e)}"}
\ No newline at end of file
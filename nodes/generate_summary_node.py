@@ -1,36 +1,190 @@
-from typing import Dict, Any, List
-import json
+from typing import Dict, Any, List, Tuple
+import os
+import asyncio
 import re
-from llm.llm_config import get_llm
+from llm.llm_config import get_llm, resolve_provider
+from llm.structured_output import parse_json_response, record_structured_output, with_json_mode
+from llm.token_budget import PromptBudget, count_tokens
 from state.app_state import YouTubeVideoState
 
 
-def _safe_json_extract(text: str) -> Dict[str, Any]:
-    """Attempt to extract a JSON object from arbitrary LLM text output."""
-    try:
-        return json.loads(text)
-    except Exception:
-        pass
-    # Try to find the first {...} block
-    match = re.search(r"\{[\s\S]*\}", text)
-    if match:
-        try:
-            return json.loads(match.group(0))
-        except Exception:
-            return {}
-    return {}
+# Summarization mode: "auto" (map-reduce only for long transcripts), "single" or "map_reduce"
+SUMMARY_MODE = os.getenv("SUMMARY_MODE", "auto").strip().lower()
+SUMMARY_MAP_CONCURRENCY = int(os.getenv("SUMMARY_MAP_CONCURRENCY", 4))
+# Run tag on the user-facing summary call; UIs filter streamed tokens by it (map calls are untagged)
+SUMMARY_STREAM_TAG = "summary_stream"
+# State fields this node's output depends on (see graph/memo.py); the API key is not one of them
+SUMMARY_INPUTS = ("video_transcript", "llm_provider")
 
+_JSON_ESCAPES = {"n": "\n", "t": "\t", "r": "", "b": "", "f": "", '"': '"', "\\": "\\", "/": "/"}
+
+
+def _safe_json_extract(text: str) -> Tuple[Dict[str, Any], str]:
+    """Extract a JSON object from LLM output, repairing near-valid JSON; returns (data, how it parsed)."""
+    data, how = parse_json_response(text)
+    return (data if isinstance(data, dict) else {}), how
+
+
+def extract_partial_summary(text: str) -> str:
+    """Return the (possibly still incomplete) "summary" string from a streamed JSON response."""
+    match = re.search(r'"summary"\s*:\s*"', text)
+    if not match:
+        return ""
+    out: List[str] = []
+    i = match.end()
+    while i < len(text):
+        ch = text[i]
+        if ch == '"':
+            break
+        if ch == "\\":
+            if i + 1 >= len(text):
+                break  # escape sequence split across chunks
+            nxt = text[i + 1]
+            if nxt == "u":
+                hex_digits = text[i + 2:i + 6]
+                if len(hex_digits) < 4:
+                    break
+                try:
+                    out.append(chr(int(hex_digits, 16)))
+                except ValueError:
+                    pass
+                i += 6
+                continue
+            out.append(_JSON_ESCAPES.get(nxt, nxt))
+            i += 2
+            continue
+        out.append(ch)
+        i += 1
+    return "".join(out)
+
+
+def _chunk_transcript(text: str, budget: PromptBudget) -> List[str]:
+    """Split text into chunks that each fit ``budget``, preferring sentence then word boundaries."""
+    max_chars = max(200, budget.chars_for(text))
+    chunks: List[str] = []
+    start = 0
+    length = len(text)
+    while start < length:
+        size = max_chars
+        while True:
+            end = min(length, start + size)
+            if end < length:
+                floor = start + size // 2
+                cut = max(text.rfind(". ", floor, end), text.rfind("? ", floor, end), text.rfind("! ", floor, end))
+                if cut == -1:
+                    cut = text.rfind(" ", floor, end)
+                if cut != -1:
+                    end = cut + 1
+            chunk = text[start:end].strip()
+            tokens = count_tokens(chunk, budget.model)
+            if tokens <= budget.input_tokens or size <= 200:
+                break
+            # Denser than the text's average (numbers, symbols): shrink to the measured ratio
+            size = max(200, int((end - start) * budget.input_tokens / tokens * 0.98))
+        if chunk:
+            chunks.append(chunk)
+        start = end
+    return chunks
+
+
+def _use_map_reduce(transcript: str, budget: PromptBudget) -> bool:
+    """Map-reduce when forced, or in auto mode when the transcript does not fit the model's prompt budget."""
+    fits = budget.fits(transcript)
+    if SUMMARY_MODE == "single":
+        return False
+    if SUMMARY_MODE == "map_reduce":
+        return True
+    return not fits
+
+
+def _map_prompt(chunk: str, index: int, total: int) -> str:
+    return (
+        f"Below is part {index} of {total} of a YouTube video transcript. "
+        "Summarize it in 3-5 factual sentences, keeping names, definitions, numbers and examples. "
+        "Use only information present in this part; no intro or closing remarks.\n\n"
+        f"Transcript part {index}/{total}:\n{chunk}\n\nSummary:"
+    )
+
+
+def _combine_partials(responses: List[Any], total: int) -> str:
+    """Join successful chunk summaries in video order, skipping failed chunks."""
+    partials = []
+    for i, resp in enumerate(responses, 1):
+        if isinstance(resp, Exception):
+            continue
+        text = _response_text(resp)
+        if text.strip():
+            partials.append(f"[Part {i}/{total}] {text.strip()}")
+    if not partials:
+        raise Exception("All transcript chunk summaries failed")
+    return "\n".join(partials)
+
+
+def _map_budget(state: YouTubeVideoState) -> PromptBudget:
+    # Map calls use the summary model, so each chunk gets that model's input budget
+    return PromptBudget(state.get("llm_provider") or "groq", template=_map_prompt("", 999, 999))
+
+
+def _is_reduced(combined: str, material: str, budget: PromptBudget) -> bool:
+    return count_tokens(combined, budget.model) <= budget.input_tokens or len(combined) >= len(material)
+
+
+def _map_reduce_material(llm, transcript: str, map_budget: PromptBudget, budget: PromptBudget) -> str:
+    """Summarize transcript chunks sized to ``map_budget`` in parallel and return the ordered partial summaries.
+
+    Partial summaries are collapsed again while they exceed the summary prompt's ``budget``, so
+    the reduce prompt stays bounded regardless of video length.
+    """
+    material = transcript
+    while True:
+        chunks = _chunk_transcript(material, map_budget)
+        if len(chunks) <= 1 and material is not transcript:
+            return material
+        prompts = [_map_prompt(chunk, i, len(chunks)) for i, chunk in enumerate(chunks, 1)]
+        responses = llm.batch(prompts, config={"max_concurrency": SUMMARY_MAP_CONCURRENCY}, return_exceptions=True)
+        combined = _combine_partials(responses, len(chunks))
+        if _is_reduced(combined, material, budget):
+            return combined
+        material = combined
+
+
+async def _amap_reduce_material(llm, transcript: str, map_budget: PromptBudget, budget: PromptBudget) -> str:
+    """Async variant of _map_reduce_material built on abatch."""
+    material = transcript
+    while True:
+        chunks = _chunk_transcript(material, map_budget)
+        if len(chunks) <= 1 and material is not transcript:
+            return material
+        prompts = [_map_prompt(chunk, i, len(chunks)) for i, chunk in enumerate(chunks, 1)]
+        responses = await llm.abatch(prompts, config={"max_concurrency": SUMMARY_MAP_CONCURRENCY}, return_exceptions=True)
+        combined = _combine_partials(responses, len(chunks))
+        if _is_reduced(combined, material, budget):
+            return combined
+        material = combined
+
+
+def _response_text(resp: Any) -> str:
+    return resp.content if hasattr(resp, "content") else str(resp)
+
+
+def _get_summary_llm(state: YouTubeVideoState):
+    provider = state.get("llm_provider") or "groq"
+    api_key = state.get("api_key") or state.get("groq_api_key")
+    return get_llm(temperature=0.3, api_key=api_key, provider=provider)
 
-def generate_summary_node(state: YouTubeVideoState) -> Dict[str, Any]:
-    """Generate a structured summary and key points from the video transcript."""
-    try:
-        provider = state.get("llm_provider") or "groq"
-        api_key = state.get("api_key") or state.get("groq_api_key")
-        llm = get_llm(temperature=0.3, api_key=api_key, provider=provider)
 
-        transcript_excerpt = state["video_transcript"][:8000]
+def _json_llm(llm, state: YouTubeVideoState):
+    """The same model with provider JSON mode, for the structured summary call (streamed)."""
+    return with_json_mode(llm, resolve_provider(state.get("llm_provider") or "groq"), streamed=True)
 
-        prompt = f"""
+
+def _summary_budget(state: YouTubeVideoState) -> PromptBudget:
+    # Matches _get_summary_llm, which keeps get_llm's default max_tokens
+    return PromptBudget(state.get("llm_provider") or "groq", template=_build_summary_prompt("", "Section summaries of the transcript (in video order)"))
+
+
+def _build_summary_prompt(transcript_excerpt: str, source_label: str) -> str:
+    prompt = f"""
 You are a precise summarizer. Given a YouTube video transcript, produce a clear, strictly relevant summary followed by concise key points.
 
 Return ONLY valid JSON with this schema:
@@ -45,45 +199,118 @@ Rules:
 - Prefer simple sentences and concrete wording.
 - If something is unknown from the transcript, omit it instead of guessing.
 
-Transcript:
+{source_label}:
 """
-        prompt += transcript_excerpt
+    return prompt + transcript_excerpt
+
+
+def _parse_summary(content: str) -> Tuple[str, List[str], str]:
+    """Pull summary text and key points out of the JSON response; empty values mean that section failed."""
+    data, how = _safe_json_extract(content)
+
+    summary_text = ""
+    key_points_list: List[str] = []
+
+    if isinstance(data, dict):
+        summary_text = str(data.get("summary", "")).strip()
+        key_points_raw = data.get("key_points", [])
+        if isinstance(key_points_raw, list):
+            key_points_list = [str(p).strip(" -•\t").strip() for p in key_points_raw if str(p).strip()]
+    return summary_text, key_points_list, how
+
+
+def _summary_fallback_prompt(transcript_excerpt: str) -> str:
+    return f"Summarize clearly in 5-7 sentences, strictly based on this transcript:\n\n{transcript_excerpt}\n\nSummary:"
+
+
+def _key_points_fallback_prompt(transcript_excerpt: str) -> str:
+    return f"Extract 5-7 concise, highly informative bullet points from this transcript. One sentence each.\n\n{transcript_excerpt}\n\nBullets:"
+
+
+def _parse_bullets(kp_text: str) -> List[str]:
+    return [
+        line.strip(" -•\t").strip()
+        for line in kp_text.split("\n")
+        if line.strip()
+    ][:7]
+
 
-        response = llm.invoke(prompt)
-        content = response.content if hasattr(response, "content") else str(response)
-        data = _safe_json_extract(content)
+def _summary_result(summary_text: str, key_points_list: List[str], budget: PromptBudget) -> Dict[str, Any]:
+    # Trim to safe sizes
+    return {
+        "summary": summary_text.strip(),
+        "key_points": key_points_list[:7],
+        "token_usage": {"generate_summary": budget.report()},
+    }
 
-        summary_text = ""
-        key_points_list: List[str] = []
 
-        if isinstance(data, dict):
-            summary_text = str(data.get("summary", "")).strip()
-            key_points_raw = data.get("key_points", [])
-            if isinstance(key_points_raw, list):
-                key_points_list = [str(p).strip(" -•\t").strip() for p in key_points_raw if str(p).strip()]
+def generate_summary_node(state: YouTubeVideoState) -> Dict[str, Any]:
+    """Generate a structured summary and key points from the video transcript."""
+    try:
+        llm = _get_summary_llm(state)
+
+        transcript = state["video_transcript"]
+        budget = _summary_budget(state)
+        if _use_map_reduce(transcript, budget):
+            # Long video: summarize every chunk, then reduce the partial summaries below
+            transcript_excerpt = _map_reduce_material(llm, transcript, _map_budget(state), budget)
+            source_label = "Section summaries of the transcript (in video order)"
+        else:
+            transcript_excerpt = transcript
+            source_label = "Transcript"
+        # Fill the prompt up to the model's window minus the output reservation
+        transcript_excerpt = budget.fit(transcript_excerpt)
 
-        # Fallbacks if parsing failed
+        response = _json_llm(llm, state).invoke(_build_summary_prompt(transcript_excerpt, source_label), config={"tags": [SUMMARY_STREAM_TAG]})
+        summary_text, key_points_list, how = _parse_summary(_response_text(response))
+
+        # Fallbacks only for the sections that are still missing after repair
+        reprompts = 0
         if not summary_text:
-            summary_fallback_prompt = f"Summarize clearly in 5-7 sentences, strictly based on this transcript:\n\n{transcript_excerpt}\n\nSummary:"
-            summary_resp = llm.invoke(summary_fallback_prompt)
-            summary_text = summary_resp.content if hasattr(summary_resp, "content") else str(summary_resp)
+            summary_text = _response_text(llm.invoke(_summary_fallback_prompt(transcript_excerpt)))
+            reprompts += 1
 
         if not key_points_list:
-            kp_fallback_prompt = f"Extract 5-7 concise, highly informative bullet points from this transcript. One sentence each.\n\n{transcript_excerpt}\n\nBullets:"
-            kp_resp = llm.invoke(kp_fallback_prompt)
-            kp_text = kp_resp.content if hasattr(kp_resp, "content") else str(kp_resp)
-            key_points_list = [
-                line.strip(" -•\t").strip()
-                for line in kp_text.split("\n")
-                if line.strip()
-            ][:7]
-
-        # Trim to safe sizes
-        key_points_list = key_points_list[:7]
-
-        return {
-            "summary": summary_text.strip(),
-            "key_points": key_points_list,
-        }
+            key_points_list = _parse_bullets(_response_text(llm.invoke(_key_points_fallback_prompt(transcript_excerpt))))
+            reprompts += 1
+        record_structured_output("generate_summary", "fallback" if reprompts else how, reprompts)
+
+        return _summary_result(summary_text, key_points_list, budget)
+    except Exception as e:
+        return {"error": f"Error generating summary: {str(e)}"}
+
+
+async def agenerate_summary_node(state: YouTubeVideoState) -> Dict[str, Any]:
+    """Async variant of generate_summary_node built on ainvoke/abatch."""
+    try:
+        llm = _get_summary_llm(state)
+
+        transcript = state["video_transcript"]
+        budget = _summary_budget(state)
+        if _use_map_reduce(transcript, budget):
+            transcript_excerpt = await _amap_reduce_material(llm, transcript, _map_budget(state), budget)
+            source_label = "Section summaries of the transcript (in video order)"
+        else:
+            transcript_excerpt = transcript
+            source_label = "Transcript"
+        # Fill the prompt up to the model's window minus the output reservation
+        transcript_excerpt = budget.fit(transcript_excerpt)
+
+        response = await _json_llm(llm, state).ainvoke(_build_summary_prompt(transcript_excerpt, source_label), config={"tags": [SUMMARY_STREAM_TAG]})
+        summary_text, key_points_list, how = _parse_summary(_response_text(response))
+
+        # Both fallbacks are independent, so issue them together
+        summary_fallback = llm.ainvoke(_summary_fallback_prompt(transcript_excerpt)) if not summary_text else None
+        kp_fallback = llm.ainvoke(_key_points_fallback_prompt(transcript_excerpt)) if not key_points_list else None
+        pending = [c for c in (summary_fallback, kp_fallback) if c is not None]
+        record_structured_output("generate_summary", "fallback" if pending else how, len(pending))
+        if pending:
+            fallback_responses = iter(await asyncio.gather(*pending))
+            if summary_fallback is not None:
+                summary_text = _response_text(next(fallback_responses))
+            if kp_fallback is not None:
+                key_points_list = _parse_bullets(_response_text(next(fallback_responses)))
+
+        return _summary_result(summary_text, key_points_list, budget)
     except Exception as e:
-        return {"error": f"Error generating summary: {str(e)}"}
\ No newline at end of file
+        return {"error": f"Error generating summary: {str(e)}"}
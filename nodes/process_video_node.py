@@ -1,72 +1,170 @@
-from typing import Dict, Any
-from tools.youtube_tool import get_video_title, get_video_transcript
+import os
+import time
+import asyncio
+from typing import Dict, Any, List, Optional
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from tools.youtube_tool import get_video_title, get_video_transcript_segments
+from tools.transcript_store import TranscriptSegments
 from state.app_state import YouTubeVideoState
+from tools.tracing import in_context
+
+
+# Per-call timeouts (seconds) for the concurrent metadata/transcript lookups
+TITLE_TIMEOUT = float(os.getenv("VIDEO_TITLE_TIMEOUT", 15))
+TRANSCRIPT_TIMEOUT = float(os.getenv("VIDEO_TRANSCRIPT_TIMEOUT", 60))
+# State fields this node's output depends on (see graph/memo.py)
+PROCESS_VIDEO_INPUTS = ("video_url",)
+
+# Shared pool so a slow title lookup never holds up returning from the node
+_lookup_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="video-lookup")
+
+
+def _validate_url(video_url: str) -> Optional[str]:
+    """Return an error message for an unusable URL, or None when it looks like a YouTube link."""
+    if not video_url or not video_url.strip():
+        return "Please provide a valid YouTube URL"
+
+    # Validate YouTube URL format
+    if not ("youtube.com" in video_url or "youtu.be" in video_url):
+        return "Please provide a valid YouTube URL (youtube.com or youtu.be)"
+    return None
+
+
+def _has_transcript(video_transcript: Optional[str]) -> bool:
+    return bool(video_transcript and len(video_transcript.strip()) >= 10)
+
+
+def _build_result(video_url: str, video_title: Optional[str], segments: Optional[TranscriptSegments], errors: List[str]) -> Dict[str, Any]:
+    """Turn the lookup outcomes into the node's state update."""
+    video_transcript = segments.text if segments is not None else None
+
+    # Determine if we have enough data to proceed
+    if not _has_transcript(video_transcript):
+        if errors:
+            return {"error": f"Failed to process video. Issues encountered: {'; '.join(errors)}. The video might not have captions available or may be private/restricted."}
+        else:
+            return {"error": "Could not retrieve a valid transcript from this video. The video might not have captions available."}
+
+    # If we don't have a title but have transcript, use a fallback title
+    if not video_title:
+        try:
+            from tools.youtube_tool import extract_video_id
+            video_id = extract_video_id(video_url)
+            video_title = f"YouTube Video ({video_id})"
+        except:
+            video_title = "YouTube Video"
+
+    result = {
+        "video_title": video_title,
+        "video_transcript": video_transcript,
+        "transcript_segments": segments
+    }
+
+    # Add warnings if there were non-critical errors
+    if errors and video_transcript:
+        result["warnings"] = errors
+
+    return result
 
 
 def process_video_node(state: YouTubeVideoState) -> Dict[str, Any]:
     """Process the YouTube video and extract title and transcript with improved error handling."""
     try:
         video_url = state["video_url"]
-        
-        if not video_url or not video_url.strip():
-            return {"error": "Please provide a valid YouTube URL"}
-        
-        # Validate YouTube URL format
-        if not ("youtube.com" in video_url or "youtu.be" in video_url):
-            return {"error": "Please provide a valid YouTube URL (youtube.com or youtu.be)"}
-        
+
+        invalid = _validate_url(video_url)
+        if invalid:
+            return {"error": invalid}
+
         video_title = None
         video_transcript = None
+        segments = None
         errors = []
-        
-        # Get video title with fallback
-        try:
-            video_title = get_video_title(video_url)
 
-        except Exception as title_error:
-            error_msg = f"Could not retrieve video title: {str(title_error)}"
-            errors.append(error_msg)
+        # Run title and transcript lookups concurrently so the node waits for the slower one, not the sum
+        started = time.monotonic()
+        title_future = _lookup_executor.submit(in_context(get_video_title), video_url)
+        transcript_future = _lookup_executor.submit(in_context(get_video_transcript_segments), video_url)
 
-            # Continue processing - we can still get transcript without title
-        
         # Get video transcript with detailed error reporting
         try:
-            video_transcript = get_video_transcript(video_url)
-            if not (video_transcript and len(video_transcript.strip()) >= 10):
+            segments = transcript_future.result(timeout=TRANSCRIPT_TIMEOUT)
+            video_transcript = segments.text
+            if not _has_transcript(video_transcript):
                 error_msg = "Retrieved transcript is too short or empty"
                 errors.append(error_msg)
-    
+
+        except FutureTimeoutError:
+            transcript_future.cancel()
+            errors.append(f"Could not retrieve transcript: timed out after {TRANSCRIPT_TIMEOUT:.0f}s")
         except Exception as transcript_error:
             error_msg = f"Could not retrieve transcript: {str(transcript_error)}"
             errors.append(error_msg)
 
-        
-        # Determine if we have enough data to proceed
-        if not video_transcript or len(video_transcript.strip()) < 10:
-            if errors:
-                return {"error": f"Failed to process video. Issues encountered: {'; '.join(errors)}. The video might not have captions available or may be private/restricted."}
-            else:
-                return {"error": "Could not retrieve a valid transcript from this video. The video might not have captions available."}
-        
-        # If we don't have a title but have transcript, use a fallback title
-        if not video_title:
+        # Get video title with fallback; its timeout counts from submission, so a slow lookup adds little extra wait
+        if _has_transcript(video_transcript):
+            try:
+                remaining = max(0.0, TITLE_TIMEOUT - (time.monotonic() - started))
+                video_title = title_future.result(timeout=remaining)
+
+            except FutureTimeoutError:
+                title_future.cancel()
+                errors.append(f"Could not retrieve video title: timed out after {TITLE_TIMEOUT:.0f}s")
+            except Exception as title_error:
+                error_msg = f"Could not retrieve video title: {str(title_error)}"
+                errors.append(error_msg)
+
+                # Continue processing - we can still get transcript without title
+        else:
+            title_future.cancel()
+
+        return _build_result(video_url, video_title, segments, errors)
+
+    except Exception as e:
+        return {"error": f"Unexpected error processing video: {str(e)}. Please check if the URL is valid and the video is publicly accessible."}
+
+
+async def aprocess_video_node(state: YouTubeVideoState) -> Dict[str, Any]:
+    """Async variant of process_video_node; the blocking yt-dlp/transcript calls run in worker threads."""
+    try:
+        video_url = state["video_url"]
+
+        invalid = _validate_url(video_url)
+        if invalid:
+            return {"error": invalid}
+
+        video_title = None
+        video_transcript = None
+        segments = None
+        errors = []
+
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        title_task = loop.run_in_executor(_lookup_executor, in_context(get_video_title), video_url)
+        transcript_task = loop.run_in_executor(_lookup_executor, in_context(get_video_transcript_segments), video_url)
+
+        try:
+            segments = await asyncio.wait_for(transcript_task, TRANSCRIPT_TIMEOUT)
+            video_transcript = segments.text
+            if not _has_transcript(video_transcript):
+                errors.append("Retrieved transcript is too short or empty")
+        except asyncio.TimeoutError:
+            errors.append(f"Could not retrieve transcript: timed out after {TRANSCRIPT_TIMEOUT:.0f}s")
+        except Exception as transcript_error:
+            errors.append(f"Could not retrieve transcript: {str(transcript_error)}")
+
+        if _has_transcript(video_transcript):
             try:
-                from tools.youtube_tool import extract_video_id
-                video_id = extract_video_id(video_url)
-                video_title = f"YouTube Video ({video_id})"
-            except:
-                video_title = "YouTube Video"
-        
-        result = {
-            "video_title": video_title,
-            "video_transcript": video_transcript
-        }
-        
-        # Add warnings if there were non-critical errors
-        if errors and video_transcript:
-            result["warnings"] = errors
-        
-        return result
-        
+                remaining = max(0.0, TITLE_TIMEOUT - (loop.time() - started))
+                video_title = await asyncio.wait_for(title_task, remaining)
+            except asyncio.TimeoutError:
+                errors.append(f"Could not retrieve video title: timed out after {TITLE_TIMEOUT:.0f}s")
+            except Exception as title_error:
+                errors.append(f"Could not retrieve video title: {str(title_error)}")
+        else:
+            title_task.cancel()
+
+        return _build_result(video_url, video_title, segments, errors)
+
     except Exception as e:
-        return {"error": f"Unexpected error processing video: {str(e)}. Please check if the URL is valid and the video is publicly accessible."}
\ No newline at end of file
+        return {"error": f"Unexpected error processing video: {str(e)}. Please check if the URL is valid and the video is publicly accessible."}
@@ -0,0 +1,73 @@
+import os
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, CancelledError
+from typing import Any, Deque, Dict, List, Optional
+from nodes.generate_quiz_node import _bank_video_id, generate_quiz_node
+from state.app_state import YouTubeVideoState
+from tools.question_bank import mark_quiz_served
+
+
+# How many upcoming quiz sets to keep ready per video, and how long take() waits for one in flight
+QUIZ_PREFETCH_DEPTH = int(os.getenv("QUIZ_PREFETCH_DEPTH", 1))
+QUIZ_PREFETCH_WAIT = float(os.getenv("QUIZ_PREFETCH_WAIT_SECONDS", 60))
+
+_prefetch_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv("QUIZ_PREFETCH_WORKERS", 4)),
+    thread_name_prefix="quiz-prefetch",
+)
+
+
+class QuizPrefetcher:
+    """Generates the next quiz sets for one video in the background while the current quiz is taken.
+
+    Each job calls generate_quiz_node, which draws a fresh VARIATION_TOKEN, so every prefetched
+    set differs. At most ``depth`` sets are queued; cancel() drops them when the video changes.
+    Sets are recorded as served in the question bank only when take() hands them out, so
+    discarded sets do not skew the bank's rotation.
+    """
+
+    def __init__(self, video_key: str, state: YouTubeVideoState, depth: int = QUIZ_PREFETCH_DEPTH):
+        self.video_key = video_key
+        self._state = dict(state)
+        self._depth = max(1, depth)
+        self._queue: Deque[Future] = deque()
+        self._lock = threading.Lock()
+        self._cancelled = threading.Event()
+
+    def ensure_started(self) -> None:
+        """Top the queue up to ``depth`` pending or ready quiz sets."""
+        with self._lock:
+            while not self._cancelled.is_set() and len(self._queue) < self._depth:
+                self._queue.append(_prefetch_executor.submit(self._generate))
+
+    def take(self, timeout: float = QUIZ_PREFETCH_WAIT) -> Optional[List[Dict[str, Any]]]:
+        """Return the oldest prefetched quiz (waiting for it if still running) and queue the next one."""
+        with self._lock:
+            future = self._queue.popleft() if self._queue else None
+        questions = None
+        if future is not None:
+            try:
+                questions = future.result(timeout=timeout)
+            except (CancelledError, Exception):
+                questions = None
+        video_id = _bank_video_id(self._state)
+        if questions and video_id:
+            mark_quiz_served(video_id, questions)
+        self.ensure_started()
+        return questions
+
+    def cancel(self) -> None:
+        """Stop prefetching; queued jobs are cancelled and running ones are discarded."""
+        self._cancelled.set()
+        with self._lock:
+            while self._queue:
+                self._queue.popleft().cancel()
+
+    def _generate(self) -> Optional[List[Dict[str, Any]]]:
+        if self._cancelled.is_set():
+            return None
+        result = generate_quiz_node(self._state, mark_served=False)
+        if self._cancelled.is_set():
+            return None
+        return result.get("quiz_questions") or None
@@ -0,0 +1,124 @@
+import json
+from typing import Any, Dict, List, Optional
+from llm.structured_output import repair_json
+
+
+def normalize_quiz_item(item: Any) -> Optional[Dict[str, Any]]:
+    """Validate one ``{question, options, answer_index}`` object and normalize it; None when unusable."""
+    if not isinstance(item, dict):
+        return None
+    q_text = str(item.get('question', '')).strip()
+    opts = item.get('options', [])
+    ans_idx = item.get('answer_index')
+    if not q_text or not isinstance(opts, list) or len(opts) != 4:
+        return None
+    try:
+        ans_idx = int(ans_idx)
+    except Exception:
+        return None
+    if not (0 <= ans_idx < 4):
+        return None
+    return {
+        'question': q_text,
+        'options': [str(o).strip() for o in opts][:4],
+        'correct_index': ans_idx,
+        'correct_text': str(opts[ans_idx]).strip(),
+    }
+
+
+class StreamingQuizParser:
+    """Incremental parser for the JSON quiz response.
+
+    Feed it the LLM output chunk by chunk; every ``{question, options, answer_index}`` object is
+    returned as soon as its closing brace arrives, whatever it is nested in. Text outside JSON
+    objects (preambles, ``<think>`` blocks) is skipped, and an object cut off by a truncated
+    response is simply never emitted, so the questions before it survive.
+    """
+
+    def __init__(self):
+        self.questions: List[Dict[str, Any]] = []
+        self._buffer = ""
+        self._pos = 0
+        self._starts: List[int] = []  # Buffer offsets of the currently open '{'
+        self._in_string = False
+        self._escaped = False
+        self._in_think = False
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        """Consume the next piece of output and return the questions it completed."""
+        if not chunk:
+            return []
+        self._buffer += chunk
+        completed: List[Dict[str, Any]] = []
+        buffer = self._buffer
+        i = self._pos
+        end = len(buffer)
+        while i < end:
+            if self._in_think:
+                close = buffer.find("</think>", i)
+                if close == -1:
+                    # Keep a possible partial closing tag for the next chunk
+                    i = max(i, end - len("</think>") + 1)
+                    break
+                self._in_think = False
+                i = close + len("</think>")
+                continue
+            ch = buffer[i]
+            if not self._starts:
+                # Outside any object: only look for the next '{' or a reasoning block
+                if ch == "<" and buffer.startswith("<think>", i):
+                    self._in_think = True
+                    i += len("<think>")
+                    continue
+                if ch == "<" and end - i < len("<think>") and "<think>".startswith(buffer[i:]):
+                    break  # Partial tag; wait for more output
+                if ch == "{":
+                    self._starts.append(i)
+                i += 1
+                continue
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == "\\":
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch == "{":
+                self._starts.append(i)
+            elif ch == "}":
+                start = self._starts.pop()
+                question = self._parse_object(buffer[start:i + 1])
+                if question is not None:
+                    completed.append(question)
+            i += 1
+        self._pos = i
+        if not self._starts and not self._in_think and self._pos == end:
+            # Nothing pending: drop consumed text so the buffer stays small
+            self._buffer = ""
+            self._pos = 0
+        self.questions.extend(completed)
+        return completed
+
+    def finish(self) -> List[Dict[str, Any]]:
+        """All questions parsed so far; an unterminated trailing object is discarded."""
+        return list(self.questions)
+
+    @staticmethod
+    def _parse_object(text: str) -> Optional[Dict[str, Any]]:
+        if '"question"' not in text:
+            return None
+        try:
+            data = json.loads(text)
+        except Exception:
+            # e.g. a trailing comma inside the object
+            data = repair_json(text)
+        return normalize_quiz_item(data)
+
+
+def parse_quiz_stream(text: str) -> List[Dict[str, Any]]:
+    """Parse a complete (possibly truncated) JSON quiz response in one go."""
+    parser = StreamingQuizParser()
+    parser.feed(text)
+    return parser.finish()
@@ -1,6 +1,13 @@
-from typing import List, Dict, TypedDict
+from typing import Annotated, List, Dict, TypedDict
+from tools.transcript_store import TranscriptSegments
 from langgraph.graph import MessagesState
 
+
+def merge_dicts(left: Dict, right: Dict) -> Dict:
+    """Reducer that lets parallel nodes each add their own keys to a shared dict."""
+    return {**(left or {}), **(right or {})}
+
+
 class YouTubeVideoState(MessagesState):
     video_url: str
     # LLM provider and runtime key for Streamlit Cloud usage
@@ -10,10 +17,16 @@ class YouTubeVideoState(MessagesState):
     groq_api_key: str
     video_title: str
     video_transcript: str
+    # Timestamped offsets/starts/durations into video_transcript; serialized without the text (see TranscriptSegments.bind)
+    transcript_segments: TranscriptSegments
     summary: str
     key_points: List[str]
     quiz_questions: List[Dict]
     related_resources: List[Dict]
+    # Per-query timings of the last resource search, keyed by query label
+    search_timings: Dict[str, Dict]
+    # Prompt token accounting per node (window, budget, prompt size), see llm/token_budget.py
+    token_usage: Annotated[Dict[str, Dict], merge_dicts]
     current_question_index: int
     user_answers: Dict[int, str]
     quiz_score: int
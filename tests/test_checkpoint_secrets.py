@@ -0,0 +1,76 @@
+import os
+import tempfile
+
+# Isolated cache and checkpoint locations; set before project imports, which read them at import time
+_TMP = tempfile.mkdtemp(prefix="ytlearn-test-")
+os.environ["YTLEARN_CACHE_DIR"] = _TMP
+os.environ["WORKFLOW_CHECKPOINTS"] = "1"
+os.environ["WORKFLOW_CHECKPOINT_DB"] = os.path.join(_TMP, "checkpoints.sqlite")
+os.environ["RESULTS_CACHE_MAX_MB"] = "0"
+os.environ["LLM_CACHE"] = "off"
+
+import pytest
+
+from graph.checkpoint import CHECKPOINT_DB, _restore_secrets, _strip_secrets, _strip_writes, remember_secrets
+
+SECRET = "gsk_secret_for_checkpoint_test"
+
+
+def test_secrets_are_blanked_at_any_depth():
+    values = {"__start__": {"video_url": "u", "api_key": SECRET, "nested": [{"groq_api_key": SECRET}]}, "api_key": SECRET}
+    stripped = _strip_secrets(values)
+    assert SECRET not in repr(stripped)
+    assert stripped["__start__"]["video_url"] == "u"
+    writes = _strip_writes([("__start__", values["__start__"]), ("api_key", SECRET)])
+    assert SECRET not in repr(writes)
+
+
+def test_secrets_are_restored_from_the_current_run():
+    from types import SimpleNamespace
+
+    class _Tuple(SimpleNamespace):
+        def _replace(self, **changes):
+            return _Tuple(**{**vars(self), **changes})
+
+    remember_secrets({"api_key": SECRET})
+    loaded = _Tuple(
+        checkpoint={"channel_values": _strip_secrets({"api_key": SECRET, "__start__": {"api_key": SECRET}})},
+        pending_writes=[("task", "api_key", "")],
+    )
+    restored = _restore_secrets(loaded)
+    assert restored.checkpoint["channel_values"] == {"api_key": SECRET, "__start__": {"api_key": SECRET}}
+    assert restored.pending_writes == [("task", "api_key", SECRET)]
+
+
+def test_checkpointed_run_never_writes_the_api_key():
+    pytest.importorskip("langgraph.checkpoint.sqlite")
+    from benchmarks.fakes import FakeBackends, installed, video_url
+    from graph.workflow import run_workflow
+
+    state = {
+        "video_url": video_url(2),
+        "llm_provider": "groq",
+        "api_key": SECRET,
+        "groq_api_key": SECRET,
+        "video_title": "",
+        "video_transcript": "",
+        "summary": "",
+        "key_points": [],
+        "quiz_questions": [],
+        "related_resources": [],
+        "current_question_index": 0,
+        "user_answers": {},
+        "quiz_score": 0,
+        "error": "",
+    }
+    with installed(FakeBackends()):
+        result = run_workflow(state, thread_id="secret-test")
+    assert not result.get("error")
+
+    written = b""
+    for suffix in ("", "-wal", "-journal"):
+        if os.path.exists(CHECKPOINT_DB + suffix):
+            with open(CHECKPOINT_DB + suffix, "rb") as fh:
+                written += fh.read()
+    assert written
+    assert SECRET.encode("utf-8") not in written
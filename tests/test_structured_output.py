@@ -0,0 +1,44 @@
+import json
+
+import pytest
+
+pytest.importorskip("langchain_core")
+
+from llm.structured_output import with_json_mode
+
+
+class _Bindable:
+    def __init__(self, bound=None):
+        self.bound = bound
+
+    def bind(self, **kwargs):
+        return _Bindable(kwargs)
+
+
+def test_streamed_calls_skip_json_mode_on_groq():
+    llm = _Bindable()
+    assert with_json_mode(llm, "groq", streamed=True) is llm
+    assert with_json_mode(llm, "groq").bound == {"response_format": {"type": "json_object"}}
+    assert with_json_mode(llm, "openai", streamed=True).bound == {"response_format": {"type": "json_object"}}
+
+
+def test_groq_json_call_still_streams_in_chunks():
+    httpx = pytest.importorskip("httpx")
+    langchain_groq = pytest.importorskip("langchain_groq")
+    pieces = ['{"summary": ', '"chunked"', "}"]
+    sent = {}
+
+    def handler(request):
+        sent.update(json.loads(request.content))
+        events = [
+            {"id": "c", "object": "chat.completion.chunk", "created": 0, "model": "m",
+             "choices": [{"index": 0, "delta": {"role": "assistant", "content": piece}, "finish_reason": None}]}
+            for piece in pieces
+        ]
+        body = "".join(f"data: {json.dumps(event)}\n\n" for event in events) + "data: [DONE]\n\n"
+        return httpx.Response(200, content=body.encode("utf-8"), headers={"content-type": "text/event-stream"})
+
+    llm = langchain_groq.ChatGroq(model="m", groq_api_key="test", http_client=httpx.Client(transport=httpx.MockTransport(handler)))
+    chunks = [chunk.content for chunk in with_json_mode(llm, "groq", streamed=True).stream("Return JSON") if chunk.content]
+    assert sent.get("stream") is True
+    assert chunks == pieces
@@ -0,0 +1,161 @@
+import os
+import gzip
+import json
+import time
+import hashlib
+import tempfile
+import threading
+from typing import Any, Dict, Optional
+
+
+def get_cache_root() -> str:
+    """Return the root directory used for on-disk caches."""
+    return os.getenv("YTLEARN_CACHE_DIR") or os.path.join(os.path.expanduser("~"), ".cache", "ytlearn")
+
+
+class DiskCache:
+    """Content-addressed on-disk cache with TTL, LRU eviction and gzip-compressed JSON entries.
+
+    Each key is hashed (sha256) to a file name inside ``<cache root>/<namespace>``. Reads touch
+    the file's mtime so eviction can drop the least recently used entries once the namespace
+    grows beyond ``max_bytes``. A ``max_bytes`` of 0 disables the cache entirely.
+    """
+
+    def __init__(self, namespace: str, *, ttl_seconds: Optional[float] = None, max_bytes: int = 0, root: Optional[str] = None):
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.directory = os.path.join(root or get_cache_root(), namespace)
+        self._lock = threading.Lock()
+        self._total_bytes: Optional[int] = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def _path(self, key: str) -> str:
+        digest = hashlib.sha256(key.encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, f"{digest}.json.gz")
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value for ``key`` or None on a miss or expired entry."""
+        if not self.enabled:
+            return None
+        path = self._path(key)
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as fh:
+                record = json.load(fh)
+        except Exception:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        if record.get("key") != key or self._is_expired(record):
+            with self._lock:
+                self._remove(path)
+                self.misses += 1
+            return None
+
+        try:
+            os.utime(path, None)  # bump recency for LRU eviction
+        except OSError:
+            pass
+        with self._lock:
+            self.hits += 1
+        return record.get("value")
+
+    def set(self, key: str, value: Any) -> None:
+        """Store ``value`` (must be JSON-serializable) under ``key``."""
+        if not self.enabled:
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            payload = json.dumps({"key": key, "created_at": time.time(), "value": value}, ensure_ascii=False)
+            data = gzip.compress(payload.encode("utf-8"))
+            path = self._path(key)
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            with os.fdopen(fd, "wb") as fh:
+                fh.write(data)
+            previous = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(tmp_path, path)
+            with self._lock:
+                if self._total_bytes is not None:
+                    self._total_bytes += len(data) - previous
+            self._evict_if_needed()
+        except Exception as e:
+            # A broken cache must never break the caller
+            print(f"Error writing {self.namespace} cache: {str(e)}")
+
+    def clear(self) -> None:
+        """Remove every entry in this namespace."""
+        with self._lock:
+            for name in self._entries():
+                self._remove(os.path.join(self.directory, name))
+            self._total_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and current disk usage."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "namespace": self.namespace,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / lookups) if lookups else 0.0,
+                "evictions": self.evictions,
+                "bytes": self._disk_usage(),
+                "max_bytes": self.max_bytes,
+            }
+
+    def _is_expired(self, record: Dict[str, Any]) -> bool:
+        if not self.ttl_seconds:
+            return False
+        return (time.time() - float(record.get("created_at", 0))) > self.ttl_seconds
+
+    def _entries(self):
+        try:
+            return [name for name in os.listdir(self.directory) if name.endswith(".json.gz")]
+        except OSError:
+            return []
+
+    def _disk_usage(self) -> int:
+        if self._total_bytes is None:
+            total = 0
+            for name in self._entries():
+                try:
+                    total += os.path.getsize(os.path.join(self.directory, name))
+                except OSError:
+                    continue
+            self._total_bytes = total
+        return self._total_bytes
+
+    def _remove(self, path: str) -> None:
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except OSError:
+            return
+        if self._total_bytes is not None:
+            self._total_bytes -= size
+
+    def _evict_if_needed(self) -> None:
+        with self._lock:
+            if self._disk_usage() <= self.max_bytes:
+                return
+            entries = []
+            for name in self._entries():
+                path = os.path.join(self.directory, name)
+                try:
+                    entries.append((os.path.getmtime(path), path))
+                except OSError:
+                    continue
+            # Oldest access first
+            entries.sort()
+            for _, path in entries:
+                if self._total_bytes <= self.max_bytes:
+                    break
+                self._remove(path)
+                self.evictions += 1
@@ -0,0 +1,170 @@
+import os
+import re
+import random
+import threading
+from typing import Any, Dict, List, Optional, Set
+from tools.cache import DiskCache
+
+
+# Questions requested per LLM refill, bank size cap, and Jaccard similarity treated as a duplicate
+QUESTION_BANK_BATCH = int(os.getenv("QUESTION_BANK_BATCH", 20))
+QUESTION_BANK_MAX = int(os.getenv("QUESTION_BANK_MAX", 100))
+# The bank "runs low" once fewer never-served questions than this remain
+QUESTION_BANK_MIN_FRESH = int(os.getenv("QUESTION_BANK_MIN_FRESH", 5))
+DUPLICATE_SIMILARITY = float(os.getenv("QUESTION_BANK_DUPLICATE_SIMILARITY", 0.7))
+
+_STOPWORDS = {
+    "a", "an", "the", "of", "to", "in", "on", "for", "and", "or", "is", "are", "was", "were", "be",
+    "what", "which", "who", "whom", "how", "why", "when", "where", "does", "do", "did", "according",
+    "video", "speaker", "transcript", "following", "best", "describes", "main", "with", "by", "as",
+}
+
+_bank_store = DiskCache(
+    "question_bank",
+    ttl_seconds=float(os.getenv("QUESTION_BANK_TTL_SECONDS", 30 * 24 * 3600)),
+    max_bytes=int(float(os.getenv("QUESTION_BANK_MAX_MB", 64)) * 1024 * 1024),
+)
+_locks: Dict[str, threading.Lock] = {}
+_locks_guard = threading.Lock()
+
+
+def _question_terms(text: str) -> Set[str]:
+    words = re.findall(r"[a-z0-9]+", text.lower())
+    return {w for w in words if w not in _STOPWORDS}
+
+
+def _similarity(a: Set[str], b: Set[str]) -> float:
+    if not a or not b:
+        return 1.0 if a == b else 0.0
+    return len(a & b) / len(a | b)
+
+
+def _video_lock(video_id: str) -> threading.Lock:
+    with _locks_guard:
+        return _locks.setdefault(video_id, threading.Lock())
+
+
+class QuestionBank:
+    """Per-video pool of normalized quiz questions with served counters."""
+
+    def __init__(self, video_id: str, questions: Optional[List[Dict[str, Any]]] = None):
+        self.video_id = video_id
+        self.questions: List[Dict[str, Any]] = questions or []
+
+    @classmethod
+    def load(cls, video_id: str) -> "QuestionBank":
+        stored = _bank_store.get(video_id) or {}
+        return cls(video_id, stored.get("questions") or [])
+
+    def save(self) -> None:
+        _bank_store.set(self.video_id, {"video_id": self.video_id, "questions": self.questions})
+
+    def unserved(self) -> int:
+        return sum(1 for q in self.questions if not q.get("served"))
+
+    def needs_refill(self, quiz_size: int) -> bool:
+        """True when the bank cannot fill a quiz or is low on fresh questions, and is below its cap."""
+        if len(self.questions) < quiz_size:
+            return True
+        return len(self.questions) < QUESTION_BANK_MAX and self.unserved() < min(quiz_size, QUESTION_BANK_MIN_FRESH)
+
+    def add(self, questions: List[Dict[str, Any]]) -> int:
+        """Add normalized questions, skipping near-duplicates of ones already banked; returns how many were added."""
+        known = [_question_terms(q["question"]) for q in self.questions]
+        added = 0
+        for q in questions:
+            if len(self.questions) >= QUESTION_BANK_MAX:
+                break
+            terms = _question_terms(q.get("question", ""))
+            if any(_similarity(terms, other) >= DUPLICATE_SIMILARITY for other in known):
+                continue
+            options = [str(o) for o in q["options"]]
+            self.questions.append({
+                "question": q["question"],
+                "options": options,
+                "correct_index": q["correct_index"],
+                "correct_text": options[q["correct_index"]],
+                "served": 0,
+            })
+            known.append(terms)
+            added += 1
+        return added
+
+    def sample(self, count: int, first: Optional[List[Dict[str, Any]]] = None, mark_served: bool = True) -> List[Dict[str, Any]]:
+        """Pick ``count`` questions, least served first, with options reshuffled for this quiz.
+
+        ``first`` (e.g. a batch just generated and previewed) is served ahead of the rest, in order.
+        With ``mark_served=False`` the served counters are left for mark_quiz_served() to update.
+        """
+        by_text = {q["question"]: q for q in self.questions}
+        picked: List[Dict[str, Any]] = []
+        for q in first or []:
+            if len(picked) < count and all(p["question"] != q["question"] for p in picked):
+                picked.append(by_text.get(q["question"], q))
+        chosen = {p["question"] for p in picked}
+        pool = [q for q in self.questions if q["question"] not in chosen]
+        random.shuffle(pool)
+        pool.sort(key=lambda q: q.get("served", 0))
+        picked += pool[:count - len(picked)]
+        quiz: List[Dict[str, Any]] = []
+        for q in picked:
+            if mark_served and "served" in q:
+                q["served"] += 1
+            order = list(range(len(q["options"])))
+            random.shuffle(order)
+            options = [q["options"][i] for i in order]
+            correct_index = order.index(q["correct_index"])
+            quiz.append({
+                "question": q["question"],
+                "options": options,
+                "correct_index": correct_index,
+                "correct_text": options[correct_index],
+            })
+        return quiz
+
+    def mark_served(self, questions: List[Dict[str, Any]]) -> int:
+        """Count ``questions`` (matched by text) as served once more; returns how many were found."""
+        texts = {q.get("question") for q in questions}
+        marked = 0
+        for q in self.questions:
+            if q["question"] in texts:
+                q["served"] = q.get("served", 0) + 1
+                marked += 1
+        return marked
+
+
+def bank_needs_refill(video_id: str, quiz_size: int) -> bool:
+    with _video_lock(video_id):
+        return QuestionBank.load(video_id).needs_refill(quiz_size)
+
+
+def add_to_bank(video_id: str, questions: List[Dict[str, Any]]) -> int:
+    """Merge freshly generated questions into the video's bank (deduplicated) and persist it."""
+    with _video_lock(video_id):
+        bank = QuestionBank.load(video_id)
+        added = bank.add(questions)
+        if added:
+            bank.save()
+        return added
+
+
+def serve_from_bank(video_id: str, quiz_size: int, first: Optional[List[Dict[str, Any]]] = None, mark_served: bool = True) -> List[Dict[str, Any]]:
+    """Sample a quiz from the video's bank, starting with ``first``, and record the questions as served.
+
+    Pass ``mark_served=False`` for quizzes that may never be shown (prefetched sets) and call
+    mark_quiz_served() once one is handed out.
+    """
+    with _video_lock(video_id):
+        bank = QuestionBank.load(video_id)
+        quiz = bank.sample(quiz_size, first, mark_served)
+        if quiz and mark_served:
+            bank.save()
+        return quiz
+
+
+def mark_quiz_served(video_id: str, questions: List[Dict[str, Any]]) -> None:
+    """Record a quiz sampled with ``mark_served=False`` as served now that it is shown."""
+    with _video_lock(video_id):
+        bank = QuestionBank.load(video_id)
+        if bank.mark_served(questions):
+            bank.save()
@@ -1,132 +1,297 @@
 import os
+import re
+import time
+import asyncio
+import unicodedata
+from functools import lru_cache
+from typing import Any, Dict, List, Tuple
+from concurrent.futures import ThreadPoolExecutor, wait
 from dotenv import load_dotenv
 from langchain_community.tools import TavilySearchResults
+from tools.cache import DiskCache
+from tools.tracing import add_count, in_context, set_attribute, span
 
 load_dotenv()
 
+# Shared deadline (seconds) for the concurrent resource queries; stragglers are dropped
+SEARCH_DEADLINE = float(os.getenv("SEARCH_DEADLINE_SECONDS", 12))
+
+_search_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="resource-search")
+
+# Persistent search-result cache keyed by normalized query; set SEARCH_CACHE_MAX_MB=0 to disable
+_search_cache = DiskCache(
+    "search",
+    ttl_seconds=float(os.getenv("SEARCH_CACHE_TTL_SECONDS", 24 * 3600)),
+    max_bytes=int(float(os.getenv("SEARCH_CACHE_MAX_MB", 32)) * 1024 * 1024),
+)
+
+
+@lru_cache(maxsize=4)
+def _build_search_tool(tavily_api_key: str) -> TavilySearchResults:
+    return TavilySearchResults(
+        tavily_api_key=tavily_api_key,
+        max_results=5
+    )
+
+
 def get_search_tool():
-    """Initialize and return the Tavily search tool."""
+    """Return the Tavily search tool, reusing the instance built for the same API key."""
     try:
         tavily_api_key = os.getenv("TAVILY_API_KEY")
         if not tavily_api_key:
             raise ValueError("TAVILY_API_KEY not found in environment variables")
         
-        search = TavilySearchResults(
-            tavily_api_key=tavily_api_key,
-            max_results=5
-        )
-        return search
+        return _build_search_tool(tavily_api_key)
     except Exception as e:
         raise Exception(f"Error initializing search tool: {str(e)}")
 
-def search_related_resources(topic: str):
-    """Search for educational resources related to a given topic."""
-    try:
-        search = get_search_tool()
-        
-        # Clean and extract the main subject from the topic
-        # Remove common filler words and extract key concepts
-        topic = topic.strip()
-        
-        # Extract main subject - use up to 100 chars but try to find natural breakpoints
-        main_subject = topic[:100].strip()
-        for breakpoint in ['.', '!', '?', ':', ';', '-']:
-            first_part = main_subject.split(breakpoint)[0]
-            if len(first_part) > 30:  # Ensure we have a meaningful chunk
-                main_subject = first_part
-                break
-        
-        # Construct targeted queries for different types of resources
-        academic_query = f"{main_subject} academic papers research journals scholarly articles"
-        educational_query = f"{main_subject} educational resources learning materials tutorials course"
-        book_query = f"{main_subject} recommended books textbooks reading list"
-        video_query = f"{main_subject} educational videos lectures explanations"
+
+def normalize_query(query: str) -> str:
+    """Normalize a search query for cache keys: Unicode-fold, lowercase, drop punctuation, collapse spaces."""
+    text = unicodedata.normalize("NFKC", query).lower()
+    text = re.sub(r"[^\w\s]", " ", text)
+    return " ".join(text.split())
+
+
+def get_search_cache_stats() -> Dict[str, Any]:
+    """Return hit/miss counters and disk usage of the search-result cache."""
+    return _search_cache.stats()
+
+def _main_subject(topic: str) -> str:
+    """Clean and extract the main subject from the topic."""
+    # Remove common filler words and extract key concepts
+    topic = topic.strip()
+    
+    # Extract main subject - use up to 100 chars but try to find natural breakpoints
+    main_subject = topic[:100].strip()
+    for breakpoint in ['.', '!', '?', ':', ';', '-']:
+        first_part = main_subject.split(breakpoint)[0]
+        if len(first_part) > 30:  # Ensure we have a meaningful chunk
+            main_subject = first_part
+            break
+    return main_subject
+
+
+def _build_queries(main_subject: str) -> List[Tuple[str, str]]:
+    """Construct targeted (label, query) pairs for different types of resources."""
+    academic_query = f"{main_subject} academic papers research journals scholarly articles"
+    educational_query = f"{main_subject} educational resources learning materials tutorials course"
+    book_query = f"{main_subject} recommended books textbooks reading list"
+    video_query = f"{main_subject} educational videos lectures explanations"
+    return [
+        ("academic", academic_query),
+        ("educational", educational_query),
+        ("book", book_query),
+        ("video", video_query),
+    ]
+
+
+def _fallback_query(main_subject: str) -> str:
+    return f"{main_subject} learning resources"
+
+
+def _rank_resources(results: List[Dict]) -> List[Dict]:
+    """Deduplicate, score and return the top 5 educational resources."""
+    # Combine and deduplicate results
+    seen_urls = set()
+    resources = []
+    
+    # Score and rank results
+    for result in results:
+        url = result.get("url", "")
+        title = result.get("title", "Untitled")
+        content = result.get("content", "")
         
-        # Perform searches with different queries to get diverse results
-        results = []
-        try:
-            results.extend(search.invoke(academic_query))
-        except Exception:
-            pass
-            
-        try:
-            results.extend(search.invoke(educational_query))
-        except Exception:
-            pass
-            
-        try:
-            results.extend(search.invoke(book_query))
-        except Exception:
-            pass
+        # Skip if we've already seen this URL or if it's empty
+        if url in seen_urls or not url:
+            continue
             
-        try:
-            results.extend(search.invoke(video_query))
-        except Exception:
-            pass
+        # Skip results that are likely not educational resources
+        lower_title = title.lower()
+        lower_content = content.lower()
         
-        # If we have no results, try a more general search
-        if not results:
-            try:
-                results = search.invoke(f"{main_subject} learning resources")
-            except Exception:
-                pass
+        # Skip social media and video platforms unless they're educational
+        skip_domains = ['facebook.com', 'twitter.com', 'instagram.com']
+        if any(domain in url.lower() for domain in skip_domains):
+            if not ('education' in lower_content or 'learn' in lower_content or 'course' in lower_content):
+                continue
         
-        # Combine and deduplicate results
-        seen_urls = set()
-        resources = []
+        # Calculate relevance score based on educational terms in title and content
+        edu_terms = ['learn', 'course', 'education', 'tutorial', 'guide', 'book', 'paper', 'research', 'study', 'academic']
+        score = 0
         
-        # Score and rank results
-        for result in results:
-            url = result.get("url", "")
-            title = result.get("title", "Untitled")
-            content = result.get("content", "")
-            
-            # Skip if we've already seen this URL or if it's empty
-            if url in seen_urls or not url:
-                continue
-                
-            # Skip results that are likely not educational resources
-            lower_title = title.lower()
-            lower_content = content.lower()
-            
-            # Skip social media and video platforms unless they're educational
-            skip_domains = ['facebook.com', 'twitter.com', 'instagram.com']
-            if any(domain in url.lower() for domain in skip_domains):
-                if not ('education' in lower_content or 'learn' in lower_content or 'course' in lower_content):
-                    continue
-            
-            # Calculate relevance score based on educational terms in title and content
-            edu_terms = ['learn', 'course', 'education', 'tutorial', 'guide', 'book', 'paper', 'research', 'study', 'academic']
-            score = 0
-            
-            # Check title for educational terms
-            for term in edu_terms:
-                if term in lower_title:
-                    score += 3  # Title matches are more important
-                if term in lower_content:
-                    score += 1
-            
-            # Add to resources with score
-            seen_urls.add(url)
-            resource = {
-                "title": title,
-                "url": url,
-                "content": content,
-                "score": score
-            }
-            resources.append(resource)
+        # Check title for educational terms
+        for term in edu_terms:
+            if term in lower_title:
+                score += 3  # Title matches are more important
+            if term in lower_content:
+                score += 1
+        
+        # Add to resources with score
+        seen_urls.add(url)
+        resource = {
+            "title": title,
+            "url": url,
+            "content": content,
+            "score": score
+        }
+        resources.append(resource)
+    
+    # Sort by relevance score
+    resources.sort(key=lambda x: x.get("score", 0), reverse=True)
+    
+    # Remove score field before returning
+    for resource in resources:
+        if "score" in resource:
+            del resource["score"]
+    
+    # Return the top 5 most relevant resources
+    return resources[:5]
+
+
+def _timed_invoke(search, query: str) -> Tuple[List[Dict], float]:
+    started = time.monotonic()
+    with span("tavily.search", "tool", query=query):
+        response = search.invoke(query)
+    # Tavily returns an error string instead of raising on some HTTP failures
+    items = response if isinstance(response, list) else []
+    if items:
+        _search_cache.set(normalize_query(query), items)
+    return items, time.monotonic() - started
+
+
+def _cached_queries(queries: List[Tuple[str, str]]) -> Tuple[Dict[str, List[Dict]], Dict[str, Dict[str, Any]], List[Tuple[str, str]]]:
+    """Serve queries from the search cache; return cached results, their timings and the misses."""
+    results: Dict[str, List[Dict]] = {}
+    timings: Dict[str, Dict[str, Any]] = {}
+    misses: List[Tuple[str, str]] = []
+    for label, query in queries:
+        cached = _search_cache.get(normalize_query(query))
+        if cached:
+            results[label] = cached
+            timings[label] = {"status": "cached", "seconds": 0.0, "results": len(cached)}
+            add_count("search_cache_hits")
+        else:
+            misses.append((label, query))
+    return results, timings, misses
+
+
+def _run_queries(search, queries: List[Tuple[str, str]], timeout: float) -> Tuple[Dict[str, List[Dict]], Dict[str, Dict[str, Any]]]:
+    """Run labelled queries concurrently until ``timeout``; return results and timings per label."""
+    results, timings, misses = _cached_queries(queries)
+    if not misses:
+        return results, timings
+    futures = {_search_executor.submit(in_context(_timed_invoke), search, query): label for label, query in misses}
+    done, pending = wait(futures, timeout=max(0.0, timeout))
+
+    for future in done:
+        label = futures[future]
+        try:
+            items, elapsed = future.result()
+            results[label] = items
+            timings[label] = {"status": "ok", "seconds": round(elapsed, 3), "results": len(items)}
+        except Exception as e:
+            timings[label] = {"status": "error", "error": str(e)}
+    for future in pending:
+        # Not-yet-started queries are cancelled; running ones finish in the background and are ignored
+        future.cancel()
+        timings[futures[future]] = {"status": "timeout", "seconds": round(timeout, 3)}
+    return results, timings
+
+
+def search_related_resources(topic: str, return_timings: bool = False):
+    """Search for educational resources related to a given topic.
+
+    The resource queries run concurrently under a shared deadline (SEARCH_DEADLINE_SECONDS).
+    With ``return_timings`` the per-query timings are returned alongside the resources.
+    """
+    timings: Dict[str, Dict[str, Any]] = {}
+    try:
+        search = get_search_tool()
+        main_subject = _main_subject(topic)
+        started = time.monotonic()
         
-        # Sort by relevance score
-        resources.sort(key=lambda x: x.get("score", 0), reverse=True)
+        # Perform searches with different queries to get diverse results
+        queries = _build_queries(main_subject)
+        by_label, timings = _run_queries(search, queries, SEARCH_DEADLINE)
+        # Merge in query order so dedup and ranking behave as with sequential queries
+        results = []
+        for label, _ in queries:
+            results.extend(by_label.get(label, []))
         
-        # Remove score field before returning
-        for resource in resources:
-            if "score" in resource:
-                del resource["score"]
+        # If we have no results, try a more general search within what is left of the deadline
+        remaining = SEARCH_DEADLINE - (time.monotonic() - started)
+        if not results and remaining > 0:
+            set_attribute("search_fallback", True)
+            fallback, fallback_timings = _run_queries(search, [("fallback", _fallback_query(main_subject))], remaining)
+            results = fallback.get("fallback", [])
+            timings.update(fallback_timings)
         
-        # Return the top 5 most relevant resources
-        return resources[:5]
+        resources = _rank_resources(results)
     except Exception as e:
         # Return empty list instead of raising exception to prevent workflow failure
         print(f"Error searching related resources: {str(e)}")
-        return []
\ No newline at end of file
+        resources = []
+    return (resources, timings) if return_timings else resources
+
+
+async def _atimed_invoke(search, query: str) -> Tuple[List[Dict], float]:
+    started = time.monotonic()
+    with span("tavily.search", "tool", query=query):
+        response = await search.ainvoke(query)
+    items = response if isinstance(response, list) else []
+    if items:
+        # Gzip file I/O: keep it off the shared event loop
+        await asyncio.get_running_loop().run_in_executor(_search_executor, _search_cache.set, normalize_query(query), items)
+    return items, time.monotonic() - started
+
+
+async def _arun_queries(search, queries: List[Tuple[str, str]], timeout: float) -> Tuple[Dict[str, List[Dict]], Dict[str, Dict[str, Any]]]:
+    """Async variant of _run_queries; stragglers are cancelled once the deadline passes."""
+    # Cache lookups read gzip files from disk, so they run on the search pool rather than the event loop
+    results, timings, misses = await asyncio.get_running_loop().run_in_executor(_search_executor, in_context(_cached_queries), queries)
+    if not misses:
+        return results, timings
+    tasks = {asyncio.ensure_future(_atimed_invoke(search, query)): label for label, query in misses}
+    done, pending = await asyncio.wait(tasks, timeout=max(0.0, timeout))
+
+    for task in done:
+        label = tasks[task]
+        try:
+            items, elapsed = task.result()
+            results[label] = items
+            timings[label] = {"status": "ok", "seconds": round(elapsed, 3), "results": len(items)}
+        except Exception as e:
+            timings[label] = {"status": "error", "error": str(e)}
+    for task in pending:
+        task.cancel()
+        timings[tasks[task]] = {"status": "timeout", "seconds": round(timeout, 3)}
+    return results, timings
+
+
+async def asearch_related_resources(topic: str, return_timings: bool = False):
+    """Async variant of search_related_resources; the resource queries run concurrently."""
+    timings: Dict[str, Dict[str, Any]] = {}
+    try:
+        search = get_search_tool()
+        main_subject = _main_subject(topic)
+        started = time.monotonic()
+
+        queries = _build_queries(main_subject)
+        by_label, timings = await _arun_queries(search, queries, SEARCH_DEADLINE)
+        results = []
+        for label, _ in queries:
+            results.extend(by_label.get(label, []))
+
+        remaining = SEARCH_DEADLINE - (time.monotonic() - started)
+        if not results and remaining > 0:
+            set_attribute("search_fallback", True)
+            fallback, fallback_timings = await _arun_queries(search, [("fallback", _fallback_query(main_subject))], remaining)
+            results = fallback.get("fallback", [])
+            timings.update(fallback_timings)
+
+        resources = _rank_resources(results)
+    except Exception as e:
+        print(f"Error searching related resources: {str(e)}")
+        resources = []
+    return (resources, timings) if return_timings else resources
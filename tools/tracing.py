@@ -0,0 +1,294 @@
+import os
+import json
+import asyncio
+import time
+import uuid
+import threading
+import functools
+import contextvars
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+from langchain_core.callbacks import BaseCallbackHandler
+
+
+# Append every finished workflow trace to this file (empty = no export)
+TRACE_EXPORT_PATH = os.getenv("TRACE_EXPORT_PATH", "")
+# "jsonl" writes one span per line; "otlp" writes one OTLP/JSON ExportTraceServiceRequest per line
+TRACE_EXPORT_FORMAT = os.getenv("TRACE_EXPORT_FORMAT", "jsonl").strip().lower()
+SERVICE_NAME = "ytlearn"
+
+_current_trace: contextvars.ContextVar[Optional["Trace"]] = contextvars.ContextVar("current_trace", default=None)
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    """One timed operation: a workflow run, a node, a tool call or an LLM call."""
+
+    __slots__ = ("name", "kind", "span_id", "parent_id", "start_ns", "duration_ms", "attributes", "status", "_t0")
+
+    def __init__(self, name: str, kind: str, parent_id: Optional[str], attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.kind = kind
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.duration_ms: Optional[float] = None
+        self.attributes: Dict[str, Any] = dict(attributes or {})
+        self.status = "ok"
+        self._t0 = time.perf_counter()
+
+    def finish(self) -> None:
+        if self.duration_ms is None:
+            self.duration_ms = round((time.perf_counter() - self._t0) * 1000, 2)
+
+    def elapsed_ms(self) -> float:
+        return round((time.perf_counter() - self._t0) * 1000, 2)
+
+    def to_dict(self, trace_id: str) -> Dict[str, Any]:
+        return {
+            "trace_id": trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "start_ns": self.start_ns,
+            "duration_ms": self.duration_ms,
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class Trace:
+    """Spans recorded for one workflow run; safe to fill from worker threads and concurrent tasks."""
+
+    def __init__(self, name: str = "workflow", **attributes: Any):
+        self.name = name
+        self.trace_id = uuid.uuid4().hex
+        self.attributes = attributes
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+    def add(self, span: Span) -> None:
+        with self._lock:
+            self.spans.append(span)
+
+    def rows(self) -> List[Dict[str, Any]]:
+        """Finished spans in start order, indented by depth, for a timings table."""
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s.start_ns)
+        depth: Dict[str, int] = {}
+        rows = []
+        for s in spans:
+            depth[s.span_id] = depth.get(s.parent_id, -1) + 1 if s.parent_id else 0
+            details = ", ".join(f"{k}={v}" for k, v in s.attributes.items() if k not in ("prompt_tokens", "completion_tokens"))
+            rows.append({
+                "span": "  " * depth[s.span_id] + s.name,
+                "kind": s.kind,
+                "ms": s.duration_ms,
+                "prompt_tokens": s.attributes.get("prompt_tokens"),
+                "completion_tokens": s.attributes.get("completion_tokens"),
+                "status": s.status,
+                "details": details,
+            })
+        return rows
+
+    def to_jsonl(self) -> str:
+        with self._lock:
+            return "".join(json.dumps(s.to_dict(self.trace_id), ensure_ascii=False, default=str) + "\n" for s in self.spans)
+
+    def to_otlp(self) -> Dict[str, Any]:
+        """The trace as an OTLP/JSON ExportTraceServiceRequest."""
+        with self._lock:
+            spans = list(self.spans)
+        return {"resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+            "scopeSpans": [{
+                "scope": {"name": "ytlearn.tracing"},
+                "spans": [{
+                    "traceId": self.trace_id,
+                    "spanId": s.span_id,
+                    "parentSpanId": s.parent_id or "",
+                    "name": s.name,
+                    "kind": 3 if s.kind in ("llm", "tool") else 1,  # CLIENT for outbound calls, else INTERNAL
+                    "startTimeUnixNano": str(s.start_ns),
+                    "endTimeUnixNano": str(s.start_ns + int((s.duration_ms or 0) * 1_000_000)),
+                    "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in {"span.kind": s.kind, **s.attributes}.items()],
+                    "status": {"code": 2 if s.status == "error" else 1},
+                } for s in spans],
+            }],
+        }]}
+
+    def export(self, path: Optional[str] = None, fmt: Optional[str] = None) -> None:
+        """Append the trace to ``path`` (default TRACE_EXPORT_PATH); a failed export never breaks the run."""
+        path = path or TRACE_EXPORT_PATH
+        if not path:
+            return
+        try:
+            payload = json.dumps(self.to_otlp(), default=str) + "\n" if (fmt or TRACE_EXPORT_FORMAT) == "otlp" else self.to_jsonl()
+            with open(path, "a", encoding="utf-8") as fh:
+                fh.write(payload)
+        except Exception as e:
+            print(f"Error exporting trace: {str(e)}")
+
+
+def new_trace(name: str = "workflow", **attributes: Any) -> Optional[Trace]:
+    """A trace to record into when traces are exported, otherwise None (tracing off)."""
+    return Trace(name, **attributes) if TRACE_EXPORT_PATH else None
+
+
+@contextmanager
+def activate(trace: Optional[Trace]) -> Iterator[Optional[Trace]]:
+    """Record spans opened in this context (and tasks/threads started from it) into ``trace``."""
+    if trace is None:
+        yield None
+        return
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+@contextmanager
+def span(name: str, kind: str = "internal", **attributes: Any) -> Iterator[Optional[Span]]:
+    """Time the enclosed block as a child of the current span; a no-op without an active trace."""
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+    parent = _current_span.get()
+    current = Span(name, kind, parent.span_id if parent else None, attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.status = "error"
+        current.attributes["error"] = str(e)[:200] or type(e).__name__
+        raise
+    finally:
+        _current_span.reset(token)
+        current.finish()
+        trace.add(current)
+
+
+def traced(name: str, kind: str = "tool") -> Callable:
+    """Decorator recording each call of a sync or async function as a span."""
+
+    def decorate(func: Callable) -> Callable:
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(name, kind):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name, kind):
+                return func(*args, **kwargs)
+        return wrapper
+
+    return decorate
+
+
+def set_attribute(key: str, value: Any) -> None:
+    """Set an attribute on the current span (e.g. a cache hit or a fallback trigger)."""
+    current = _current_span.get()
+    if current is not None:
+        current.attributes[key] = value
+
+
+def add_count(key: str, amount: int = 1) -> None:
+    """Increment a counter attribute on the current span."""
+    current = _current_span.get()
+    if current is not None:
+        current.attributes[key] = current.attributes.get(key, 0) + amount
+
+
+def in_context(func: Callable) -> Callable:
+    """Bind ``func`` to the caller's context so executor threads record into the same trace and span."""
+    return functools.partial(contextvars.copy_context().run, func)
+
+
+def _usage(response: Any) -> Dict[str, int]:
+    for generations in getattr(response, "generations", None) or []:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                return {"prompt_tokens": usage.get("input_tokens", 0), "completion_tokens": usage.get("output_tokens", 0)}
+    usage = (getattr(response, "llm_output", None) or {}).get("token_usage") or {}
+    if usage:
+        return {"prompt_tokens": usage.get("prompt_tokens", 0), "completion_tokens": usage.get("completion_tokens", 0)}
+    return {}
+
+
+class TracingCallbackHandler(BaseCallbackHandler):
+    """Records every LLM call as a span under the node that made it, with token counts and time to first token."""
+
+    run_inline = True  # Called in the caller's context, so the current trace and span are visible
+
+    def __init__(self):
+        self._open: Dict[Any, Any] = {}
+        self._lock = threading.Lock()
+
+    def _start(self, run_id: Any, serialized: Optional[Dict[str, Any]], kwargs: Dict[str, Any]) -> None:
+        trace = _current_trace.get()
+        if trace is None:
+            return
+        params = kwargs.get("invocation_params") or {}
+        model = params.get("model") or params.get("model_name") or (serialized or {}).get("name") or "llm"
+        parent = _current_span.get()
+        attributes = {"model": model}
+        if kwargs.get("tags"):
+            attributes["tags"] = ",".join(kwargs["tags"])
+        with self._lock:
+            self._open[run_id] = (trace, Span(f"llm.{model}", "llm", parent.span_id if parent else None, attributes))
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._start(run_id, serialized, kwargs)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._start(run_id, serialized, kwargs)
+
+    def on_llm_new_token(self, token, *, run_id, **kwargs):
+        entry = self._open.get(run_id)
+        if entry is not None and "first_token_ms" not in entry[1].attributes:
+            entry[1].attributes["first_token_ms"] = entry[1].elapsed_ms()
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        with self._lock:
+            entry = self._open.pop(run_id, None)
+        if entry is None:
+            return
+        trace, llm_span = entry
+        llm_span.attributes.update(_usage(response))
+        llm_span.finish()
+        trace.add(llm_span)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        with self._lock:
+            entry = self._open.pop(run_id, None)
+        if entry is None:
+            return
+        trace, llm_span = entry
+        llm_span.status = "error"
+        llm_span.attributes["error"] = str(error)[:200]
+        llm_span.finish()
+        trace.add(llm_span)
+
+
+_handler = TracingCallbackHandler()
+
+
+def get_tracing_handler() -> TracingCallbackHandler:
+    return _handler
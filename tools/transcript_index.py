@@ -0,0 +1,207 @@
+import os
+import re
+import math
+import hashlib
+import threading
+from collections import Counter, OrderedDict
+from typing import Dict, List, Optional, Tuple
+from tools.transcript_store import TranscriptSegments
+
+
+# Chunk size for the index, BM25 parameters, and how many transcript indexes stay in memory
+INDEX_CHUNK_CHARS = int(os.getenv("TRANSCRIPT_INDEX_CHUNK_CHARS", 1200))
+INDEX_CACHE_SIZE = int(os.getenv("TRANSCRIPT_INDEX_CACHE_SIZE", 32))
+BM25_K1 = 1.5
+BM25_B = 0.75
+# Number of video-wide key terms used as the salience query
+SALIENCE_TERMS = 40
+# Weight of the redundancy penalty when filling the budget beyond one passage per region
+DIVERSITY_WEIGHT = 0.5
+
+_STOPWORDS = frozenset("""
+a about above after again all also am an and any are as at be because been before being below between both
+but by can could did do does doing down during each few for from further get got had has have having he her
+here hers him his how i if in into is it its itself just know like me more most my no nor not now of off on
+once only or other our out over own really right same she should so some such than that the their them then
+there these they this those through to too um uh under until up very was we well were what when where which
+while who whom why will with would yeah you your going gonna want okay oh thing things kind sort lot actually
+""".split())
+
+_WORD_RE = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens without stopwords or one-character words."""
+    return [w for w in _WORD_RE.findall(text.lower()) if len(w) > 1 and w not in _STOPWORDS]
+
+
+def _chunk_spans(text: str, chunk_chars: int) -> List[Tuple[int, int]]:
+    """Split ``text`` into (start, end) spans of about ``chunk_chars``, preferring sentence then word boundaries."""
+    spans: List[Tuple[int, int]] = []
+    start = 0
+    length = len(text)
+    while start < length:
+        end = min(start + chunk_chars, length)
+        if end < length:
+            window = text[start + chunk_chars // 2:end]
+            cut = max(window.rfind(". "), window.rfind("? "), window.rfind("! "))
+            if cut != -1:
+                end = start + chunk_chars // 2 + cut + 1
+            else:
+                space = text.rfind(" ", start, end)
+                if space > start:
+                    end = space
+        spans.append((start, end))
+        start = end
+        while start < length and text[start] == " ":
+            start += 1
+    return spans
+
+
+class TranscriptIndex:
+    """In-memory BM25 index over fixed-size transcript chunks."""
+
+    def __init__(self, text: str, chunk_chars: int = INDEX_CHUNK_CHARS):
+        self.text = text
+        self.spans = _chunk_spans(text, chunk_chars)
+        self.term_counts: List[Counter] = [Counter(tokenize(text[s:e])) for s, e in self.spans]
+        self.lengths = [sum(c.values()) for c in self.term_counts]
+        self.avg_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0.0
+        doc_freq: Counter = Counter()
+        for counts in self.term_counts:
+            doc_freq.update(counts.keys())
+        n = len(self.spans)
+        self.idf: Dict[str, float] = {t: math.log(1 + (n - df + 0.5) / (df + 0.5)) for t, df in doc_freq.items()}
+        self._salience: Optional[List[float]] = None
+
+    def __len__(self) -> int:
+        return len(self.spans)
+
+    def chunk(self, i: int) -> str:
+        start, end = self.spans[i]
+        return self.text[start:end]
+
+    def score(self, query_terms: List[str], i: int) -> float:
+        """BM25 score of chunk ``i`` for the given query terms."""
+        counts = self.term_counts[i]
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[i] / (self.avg_length or 1))
+        total = 0.0
+        for term in query_terms:
+            tf = counts.get(term, 0)
+            if tf:
+                total += self.idf.get(term, 0.0) * tf * (BM25_K1 + 1) / (tf + norm)
+        return total
+
+    def search(self, query: str, k: int = 5) -> List[Tuple[int, float]]:
+        """Top ``k`` (chunk index, score) pairs for a free-text query."""
+        terms = tokenize(query)
+        scored = [(i, self.score(terms, i)) for i in range(len(self.spans))]
+        scored = [item for item in scored if item[1] > 0]
+        scored.sort(key=lambda item: item[1], reverse=True)
+        return scored[:k]
+
+    def key_terms(self, k: int = SALIENCE_TERMS) -> List[str]:
+        """Video-wide key terms: frequent overall, but not spread evenly through every chunk."""
+        totals: Counter = Counter()
+        for counts in self.term_counts:
+            totals.update(counts)
+        weighted = {t: math.log(1 + cf) * self.idf.get(t, 0.0) for t, cf in totals.items() if cf > 1}
+        return sorted(weighted, key=weighted.get, reverse=True)[:k]
+
+    def salience(self) -> List[float]:
+        """Per-chunk salience: BM25 score against the video's key terms (computed once)."""
+        if self._salience is None:
+            terms = self.key_terms()
+            self._salience = [self.score(terms, i) for i in range(len(self.spans))]
+        return self._salience
+
+    def _overlap(self, i: int, j: int) -> float:
+        a, b = self.term_counts[i], self.term_counts[j]
+        if not a or not b:
+            return 0.0
+        shared = sum(min(a[t], b[t]) * self.idf.get(t, 0.0) for t in a.keys() & b.keys())
+        size = min(sum(c * self.idf.get(t, 0.0) for t, c in a.items()), sum(c * self.idf.get(t, 0.0) for t, c in b.items()))
+        return shared / size if size else 0.0
+
+    def select_passages(self, budget_chars: int) -> List[int]:
+        """Pick chunk indexes that fit ``budget_chars``, spread across the video and favouring salient, non-redundant ones.
+
+        The transcript is split into as many equal regions as passages fit the budget and the most
+        salient chunk of each region is taken; leftover budget goes to the chunks with the best
+        salience minus overlap with what is already selected.
+        """
+        n = len(self.spans)
+        if n == 0:
+            return []
+        salience = self.salience()
+        top = max(salience) or 1.0
+        sizes = [end - start for start, end in self.spans]
+        avg_size = sum(sizes) / n
+        regions = max(1, min(n, int(budget_chars // max(avg_size, 1))))
+
+        selected: List[int] = []
+        used = 0
+        for r in range(regions):
+            lo, hi = r * n // regions, max((r + 1) * n // regions, r * n // regions + 1)
+            best = max(range(lo, hi), key=lambda i: salience[i])
+            if used + sizes[best] <= budget_chars:
+                selected.append(best)
+                used += sizes[best]
+
+        def gain(i: int) -> float:
+            redundancy = max((self._overlap(i, j) for j in selected), default=0.0)
+            return salience[i] / top - DIVERSITY_WEIGHT * redundancy
+
+        taken = set(selected)
+        while True:
+            fitting = [i for i in range(n) if i not in taken and used + sizes[i] <= budget_chars]
+            if not fitting:
+                break
+            best = max(fitting, key=gain)
+            selected.append(best)
+            taken.add(best)
+            used += sizes[best]
+        return sorted(selected)
+
+
+_index_cache: "OrderedDict[str, TranscriptIndex]" = OrderedDict()
+_index_lock = threading.Lock()
+
+
+def get_transcript_index(text: str) -> TranscriptIndex:
+    """Return the index for a transcript, building it once and keeping recent ones in an LRU."""
+    key = hashlib.sha1(text.encode("utf-8")).hexdigest()
+    with _index_lock:
+        index = _index_cache.get(key)
+        if index is not None:
+            _index_cache.move_to_end(key)
+            return index
+    index = TranscriptIndex(text)
+    with _index_lock:
+        _index_cache[key] = index
+        while len(_index_cache) > INDEX_CACHE_SIZE:
+            _index_cache.popitem(last=False)
+    return index
+
+
+def _timestamp(seconds: float) -> str:
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, secs = divmod(rest, 60)
+    return f"{hours}:{minutes:02d}:{secs:02d}" if hours else f"{minutes}:{secs:02d}"
+
+
+def select_transcript_passages(text: str, budget_chars: int, segments: Optional[TranscriptSegments] = None) -> str:
+    """Return transcript material that fits ``budget_chars``: the whole text when short, otherwise
+    salient, diverse passages from across the video in order (prefixed with timestamps when known)."""
+    if len(text) <= budget_chars:
+        return text
+    index = get_transcript_index(text)
+    # Leave room for the separators and timestamp labels
+    chosen = index.select_passages(int(budget_chars * 0.95))
+    passages = []
+    for i in chosen:
+        start, _ = index.spans[i]
+        label = f"[{_timestamp(segments.time_at_char(start))}] " if segments is not None and len(segments) else ""
+        passages.append(label + index.chunk(i))
+    return "\n\n".join(passages)
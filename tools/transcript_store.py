@@ -0,0 +1,129 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from io import StringIO
+from typing import Any, Dict, Iterable, Optional, Sequence
+
+
+class TranscriptSegments:
+    """Columnar transcript: one cleaned text buffer plus per-segment offset/start/duration arrays.
+
+    ``offsets`` holds the character offset where each segment starts in ``text`` followed by a
+    final end sentinel, so segment ``i`` is ``text[offsets[i]:offsets[i + 1]]``. ``starts`` and
+    ``durations`` are in seconds.
+    """
+
+    __slots__ = ("_text", "_parts", "offsets", "starts", "durations")
+
+    def __init__(self, text: Optional[str], offsets: Sequence[int], starts: Sequence[float], durations: Sequence[float], parts: Optional[StringIO] = None):
+        self._text = text
+        self._parts = parts
+        self.offsets = offsets if isinstance(offsets, array) else array("q", offsets)
+        self.starts = starts if isinstance(starts, array) else array("d", starts)
+        self.durations = durations if isinstance(durations, array) else array("d", durations)
+
+    @classmethod
+    def from_snippets(cls, snippets: Iterable[Any]) -> "TranscriptSegments":
+        """Build the store from FetchedTranscriptSnippet-like objects (``text``, ``start``, ``duration``).
+
+        Whitespace cleanup (newlines, runs of spaces) happens per snippet while writing into a
+        single buffer, so the full transcript is never copied between cleanup passes.
+        """
+        parts = StringIO()
+        offsets = array("q")
+        starts = array("d")
+        durations = array("d")
+        position = 0
+        for snippet in snippets:
+            piece = " ".join(str(getattr(snippet, "text", "") or "").split())
+            if not piece:
+                continue
+            if position:
+                parts.write(" ")
+                position += 1
+            offsets.append(position)
+            starts.append(float(getattr(snippet, "start", 0.0) or 0.0))
+            durations.append(float(getattr(snippet, "duration", 0.0) or 0.0))
+            parts.write(piece)
+            position += len(piece)
+        offsets.append(position)
+        return cls(None, offsets, starts, durations, parts=parts)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "TranscriptSegments":
+        """Rebuild from ``to_dict`` output; a bare transcript string becomes a single segment."""
+        text = data.get("transcript") or ""
+        offsets = data.get("offsets")
+        if not offsets:
+            return cls(text, array("q", [0, len(text)]), array("d", [0.0]), array("d", [0.0]))
+        return cls(text, array("q", offsets), array("d", data.get("starts") or []), array("d", data.get("durations") or []))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "transcript": self.text,
+            "offsets": self.offsets.tolist(),
+            "starts": [round(s, 3) for s in self.starts],
+            "durations": [round(d, 3) for d in self.durations],
+        }
+
+    def _asdict(self) -> Dict[str, Any]:
+        """Constructor keyword arguments; lets LangGraph checkpoint serializers store the segments.
+
+        The text is left out: workflow state already holds it as ``video_transcript``, so a
+        checkpoint stores the transcript once. Restored segments are re-attached with ``bind``.
+        """
+        return {"text": None, "offsets": self.offsets.tolist(), "starts": self.starts.tolist(), "durations": self.durations.tolist()}
+
+    def bind(self, text: str) -> Optional["TranscriptSegments"]:
+        """These segments over ``text`` (the state's ``video_transcript``), or None if they index a different transcript."""
+        if not self.offsets or self.offsets[-1] != len(text or ""):
+            return None
+        if self._text is text:
+            return self
+        return TranscriptSegments(text, self.offsets, self.starts, self.durations)
+
+    @property
+    def text(self) -> str:
+        """The full transcript string, materialized from the write buffer on first access."""
+        if self._text is None:
+            self._text = self._parts.getvalue() if self._parts is not None else ""
+            self._parts = None
+        return self._text
+
+    @property
+    def duration(self) -> float:
+        if not self.starts:
+            return 0.0
+        return self.starts[-1] + self.durations[-1]
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def segment_at_time(self, seconds: float) -> int:
+        """Index of the segment playing at ``seconds`` (clamped to the valid range)."""
+        if not self.starts:
+            return 0
+        return min(max(bisect_right(self.starts, seconds) - 1, 0), len(self.starts) - 1)
+
+    def segment_at_char(self, position: int) -> int:
+        """Index of the segment containing character ``position`` of ``text``."""
+        if not self.starts:
+            return 0
+        return min(max(bisect_right(self.offsets, position) - 1, 0), len(self.starts) - 1)
+
+    def time_at_char(self, position: int) -> float:
+        """Start time (seconds) of the segment containing character ``position``."""
+        return self.starts[self.segment_at_char(position)] if self.starts else 0.0
+
+    def slice_time(self, start: float, end: float) -> str:
+        """Text of every segment overlapping the ``[start, end)`` time range."""
+        if not self.starts or end <= start:
+            return ""
+        first = self.segment_at_time(start)
+        if self.starts[first] + self.durations[first] <= start and first + 1 < len(self.starts):
+            first += 1  # ``start`` falls in a gap after this segment
+        last = bisect_left(self.starts, end)
+        return self.text[self.offsets[first]:self.offsets[max(last, first + 1)]].strip()
+
+    def slice_chars(self, start: int, end: int) -> str:
+        """Character window ``[start, end)`` of the transcript."""
+        return self.text[start:end]
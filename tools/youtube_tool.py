@@ -3,6 +3,23 @@ import yt_dlp
 from youtube_transcript_api import YouTubeTranscriptApi
 from urllib.parse import urlparse, parse_qs
 import re
+from typing import Any, Dict, List, Optional
+from tools.cache import DiskCache
+from tools.transcript_store import TranscriptSegments
+from tools.tracing import set_attribute, traced
+
+
+# Persistent transcript cache keyed by (video ID, language); set TRANSCRIPT_CACHE_MAX_MB=0 to disable
+_transcript_cache = DiskCache(
+    "transcripts",
+    ttl_seconds=float(os.getenv("TRANSCRIPT_CACHE_TTL_SECONDS", 7 * 24 * 3600)),
+    max_bytes=int(float(os.getenv("TRANSCRIPT_CACHE_MAX_MB", 256)) * 1024 * 1024),
+)
+
+
+def get_transcript_cache_stats() -> Dict[str, Any]:
+    """Return hit/miss counters and disk usage of the transcript cache."""
+    return _transcript_cache.stats()
 
 
 def extract_video_id(url: str) -> str:
@@ -28,6 +45,43 @@ def extract_video_id(url: str) -> str:
         raise Exception(f"Error extracting video ID: {str(e)}")
 
 
+def extract_playlist_id(value: str) -> Optional[str]:
+    """Return the playlist ID for a playlist URL or bare playlist ID, or None for anything else.
+
+    Watch URLs that merely carry a ``list=`` parameter are treated as single videos.
+    """
+    value = value.strip()
+    if re.fullmatch(r'(PL|UU|LL|FL|OL|RD)[a-zA-Z0-9_-]{10,}', value):
+        return value
+    parsed_url = urlparse(value)
+    if parsed_url.hostname in ('www.youtube.com', 'youtube.com', 'm.youtube.com') and parsed_url.path == '/playlist':
+        playlist_ids = parse_qs(parsed_url.query).get('list')
+        if playlist_ids:
+            return playlist_ids[0]
+    return None
+
+
+def get_playlist_video_urls(playlist_id: str) -> List[str]:
+    """List the watch URLs of every video in a playlist using yt-dlp's flat extraction."""
+    try:
+        ydl_opts = {
+            'quiet': True,
+            'no_warnings': True,
+            'extract_flat': 'in_playlist',  # Entries only; no per-video format resolution
+        }
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            info = ydl.extract_info(f"https://www.youtube.com/playlist?list={playlist_id}", download=False)
+        urls = []
+        for entry in info.get('entries') or []:
+            video_id = entry.get('id') if entry else None
+            if video_id:
+                urls.append(f"https://www.youtube.com/watch?v={video_id}")
+        return urls
+    except Exception as e:
+        raise Exception(f"Error listing playlist videos: {str(e)}")
+
+
+@traced("yt_dlp.title")
 def get_video_title(url: str) -> str:
     """Get YouTube video title using yt-dlp."""
     try:
@@ -56,12 +110,27 @@ def get_video_title(url: str) -> str:
             raise Exception(f"Error getting video title: {str(e)}")
 
 
-def get_video_transcript(url: str) -> str:
-    """Get YouTube video transcript using the latest API methods with fetch()."""
+def get_video_transcript(url: str, language: str = "en") -> str:
+    """Get YouTube video transcript as one cleaned string (see get_video_transcript_segments)."""
+    return get_video_transcript_segments(url, language).text
+
+
+@traced("transcript_api.fetch")
+def get_video_transcript_segments(url: str, language: str = "en") -> TranscriptSegments:
+    """Get YouTube video transcript segments with their timestamps using the latest API methods with fetch().
+
+    Transcripts are served from the on-disk cache when the same video and language were fetched before.
+    """
     try:
         video_id = extract_video_id(url)
         if not video_id:
             raise ValueError("Invalid YouTube URL")
+
+        cache_key = f"{video_id}:{language}"
+        cached = _transcript_cache.get(cache_key)
+        set_attribute("cache_hit", bool(cached and cached.get("transcript")))
+        if cached and cached.get("transcript"):
+            return TranscriptSegments.from_dict(cached)
         
         # Get the list of available transcripts
         try:
@@ -72,28 +141,28 @@ def get_video_transcript(url: str) -> str:
         
         transcript_data = None
         
-        # Strategy 1: Try to find manually created English transcripts first
+        # Strategy 1: Try to find manually created transcripts in the requested language first
         for transcript in transcript_list:
-            if transcript.language_code.startswith('en') and not transcript.is_generated:
+            if transcript.language_code.startswith(language) and not transcript.is_generated:
 
                 transcript_data = transcript.fetch()
                 break
         
-        # Strategy 2: Try auto-generated English transcripts
+        # Strategy 2: Try auto-generated transcripts in the requested language
         if not transcript_data:
             for transcript in transcript_list:
-                if transcript.language_code.startswith('en') and transcript.is_generated:
+                if transcript.language_code.startswith(language) and transcript.is_generated:
     
                     transcript_data = transcript.fetch()
                     break
         
-        # Strategy 3: Try to translate any available transcript to English
+        # Strategy 3: Try to translate any available transcript to the requested language
         if not transcript_data:
             for transcript in transcript_list:
                 try:
                     if transcript.is_translatable:
 
-                        transcript_data = transcript.translate('en').fetch()
+                        transcript_data = transcript.translate(language).fetch()
                         break
                 except Exception as e:
 
@@ -118,20 +187,16 @@ def get_video_transcript(url: str) -> str:
         if not transcript_data or len(transcript_data) == 0:
             raise ValueError("No transcript data available for this video")
             
-        # Join transcript entries and clean up
-        # The transcript_data contains FetchedTranscriptSnippet objects with .text attribute
-        transcript = " ".join([entry.text for entry in transcript_data])
-        
-        # Advanced cleanup
-        transcript = transcript.replace('\n', ' ')
-        transcript = re.sub(r'\s+', ' ', transcript)  # Replace multiple spaces with single space
-        transcript = transcript.strip()
-        
-        if len(transcript) < 10:
+        # Collapse whitespace per snippet while building one text buffer with per-segment offsets and timestamps
+        # The transcript_data contains FetchedTranscriptSnippet objects with .text, .start and .duration
+        segments = TranscriptSegments.from_snippets(transcript_data)
+
+        if len(segments.text) < 10:
             raise ValueError("Transcript is too short or empty")
-        
 
-        return transcript
+        _transcript_cache.set(cache_key, {"video_id": video_id, "language": language, **segments.to_dict()})
+
+        return segments
         
     except Exception as e:
         raise Exception(f"Error getting video transcript: {str(e)}")
\ No newline at end of file